@@ -10,6 +10,21 @@ interface Question {
   time_limit: number;
 }
 
+interface WordCloud {
+  question_id: number;
+  responses: number;
+  terms: { term: string; count: number }[];
+  approximate: boolean;
+}
+
+interface StageLatency {
+  count: number;
+  mean_ms: number;
+  p50_ms: number;
+  p95_ms: number;
+  max_ms: number;
+}
+
 interface Quiz {
   id: string;
   title: string;
@@ -28,6 +43,10 @@ export default function SessionPanel() {
   const [timerActive, setTimerActive] = useState<boolean>(false);
   const [leaderboard, setLeaderboard] = useState<LeaderboardEntry[]>([]);
   const [showLeaderboard, setShowLeaderboard] = useState(true);
+  const [presence, setPresence] = useState({ connected: 0, answered: 0 });
+  const [wordCloud, setWordCloud] = useState<WordCloud | null>(null);
+  // Answer latency per server worker: worker -> stage -> figures
+  const [latency, setLatency] = useState<Record<string, Record<string, StageLatency>>>({});
   const [sessionStats, setSessionStats] = useState({
     totalParticipants: 0,
     totalQuestions: 0,
@@ -179,10 +198,27 @@ export default function SessionPanel() {
         console.log(`Error: ${msg.error}`);
       }
       
+      if (msg.type === "probe") {
+        // The server disconnects clients that stop acking these
+        ws.send({ action: "probe_ack", seq: msg.seq });
+      }
+
       if (msg.type === "host_join_success") {
         console.log("✅ Host joined successfully");
       }
       
+      if (msg.type === "presence") {
+        setPresence({ connected: msg.connected, answered: msg.answered });
+      }
+
+      if (msg.type === "wordcloud") {
+        setWordCloud(msg);
+      }
+
+      if (msg.type === "latency" && msg.worker) {
+        setLatency(prev => ({ ...prev, [msg.worker]: msg.stages }));
+      }
+      
       if (msg.type === "score_update") {
         console.log("📊 Scoreboard updated:", msg.scoreboard);
         
@@ -249,6 +285,7 @@ export default function SessionPanel() {
     }
 
     console.log("📤 Teacher pushing question:", selectedQuestion);
+    setWordCloud(null);
     
     wsClient.send({ 
       action: "host_push_question", 
@@ -354,6 +391,40 @@ export default function SessionPanel() {
               {status}
             </span>
           </p>
+          {isConnected && (
+            <p><strong>Students:</strong> {presence.connected} connected / {presence.answered} answered</p>
+          )}
+
+          {/* Answer latency (server stages, per worker) */}
+          {isConnected && Object.keys(latency).length > 0 && (
+            <details style={{ marginTop: "10px" }}>
+              <summary><strong>Answer latency</strong></summary>
+              <table style={{ fontSize: "0.85rem", marginTop: "5px", borderCollapse: "collapse" }}>
+                <thead>
+                  <tr>
+                    <th style={{ textAlign: "left", paddingRight: "10px" }}>Worker / stage</th>
+                    <th style={{ paddingRight: "10px" }}>Count</th>
+                    <th style={{ paddingRight: "10px" }}>p50 ms</th>
+                    <th style={{ paddingRight: "10px" }}>p95 ms</th>
+                    <th>Max ms</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {Object.entries(latency).flatMap(([worker, stages]) =>
+                    Object.entries(stages).map(([stage, figures]) => (
+                      <tr key={`${worker}-${stage}`}>
+                        <td style={{ paddingRight: "10px" }}>{worker} / {stage}</td>
+                        <td style={{ textAlign: "right", paddingRight: "10px" }}>{figures.count}</td>
+                        <td style={{ textAlign: "right", paddingRight: "10px" }}>{figures.p50_ms}</td>
+                        <td style={{ textAlign: "right", paddingRight: "10px" }}>{figures.p95_ms}</td>
+                        <td style={{ textAlign: "right" }}>{figures.max_ms}</td>
+                      </tr>
+                    ))
+                  )}
+                </tbody>
+              </table>
+            </details>
+          )}
 
           {/* Session Controls */}
           {isConnected && (
@@ -506,6 +577,37 @@ export default function SessionPanel() {
             Push Selected Question
           </button>
 
+          {/* Word Cloud (top terms, sent about once a second) */}
+          {isConnected && wordCloud && wordCloud.question_id === selectedQuestion && (
+            <div style={{
+              marginTop: "20px",
+              padding: "15px",
+              backgroundColor: "#f8f9fa",
+              border: "1px solid #dee2e6",
+              borderRadius: "8px",
+              textAlign: "center"
+            }}>
+              <h4 style={{ margin: "0 0 10px 0" }}>
+                Word Cloud ({wordCloud.responses} responses{wordCloud.approximate ? ", approximate" : ""})
+              </h4>
+              <div style={{ display: "flex", flexWrap: "wrap", justifyContent: "center", gap: "8px 16px" }}>
+                {wordCloud.terms.map(({ term, count }) => (
+                  <span
+                    key={term}
+                    title={`${count}`}
+                    style={{
+                      fontSize: `${14 + 28 * (count / (wordCloud.terms[0]?.count || 1))}px`,
+                      fontWeight: "bold",
+                      color: "#007bff"
+                    }}
+                  >
+                    {term}
+                  </span>
+                ))}
+              </div>
+            </div>
+          )}
+
           {/* Teacher Leaderboard */}
           {isConnected && (
             <div style={{ marginTop: "20px" }}>
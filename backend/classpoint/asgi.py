@@ -1,17 +1,26 @@
 import os
-import django
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "classpoint.settings")
-django.setup()  # <-- this line is crucial!
 
-import quizzes.routing  # must come *after* django.setup()
+# Sets Django up (apps, models) and builds the HTTP handler. The URLconf, and
+# with it DRF, SimpleJWT and the admin, is only imported on the first HTTP
+# request or by the warm-up.
+django_asgi_app = get_asgi_application()
+
+# Everything below needs the app registry, so it comes after setup
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+import quizzes.routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(quizzes.routing.websocket_urlpatterns)
     ),
 })
+
+# Importing this module touches no database: the worker warm-up runs from
+# `manage.py serve` (quizzes/warmup.py), before daphne binds its socket
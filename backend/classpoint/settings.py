@@ -140,6 +140,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -152,7 +153,9 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # SimpleAdminConfig skips admin autodiscovery at startup; classpoint/urls.py
+    # runs it when the URLconf is first loaded, so websocket workers never pay for it
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -251,13 +254,135 @@ CSRF_TRUSTED_ORIGINS = [
 # ASGI
 ASGI_APPLICATION = "classpoint.asgi.application"
 
-# Channels layers — in-memory (development only)
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [("redis", 6379)],  # matches your Docker service name
-        },
+# Channel layers. Consumers only enqueue (see quizzes/outbound.py), so a modest
+# per-channel capacity is enough; short expiry drops stale frames.
+# Broadcasts go through Redis so every server process sees them. With a single
+# server process they are delivered in process instead (quizzes/layers.py)
+# without a Redis round trip. CLASSPOINT_CHANNEL_LAYER=auto (the default) picks
+# the local layer only when WEB_CONCURRENCY=1 says there is one process; unset
+# or larger it keeps Redis, because behind several processes the local layer
+# would lose broadcasts silently. local|redis force the choice. The local
+# layer also needs REST views served by that same daphne process, since they
+# broadcast too.
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY") or 0)  # 0: not known
+CLASSPOINT_CHANNEL_LAYER = os.environ.get("CLASSPOINT_CHANNEL_LAYER", "auto")
+REDIS_CHANNEL_LAYER = {
+    "BACKEND": "channels_redis.core.RedisChannelLayer",
+    "CONFIG": {
+        "hosts": [("redis", 6379)],  # matches your Docker service name
+        "capacity": 300,
+        "expiry": 10,
     },
 }
-
+LOCAL_CHANNEL_LAYER = {
+    "BACKEND": "quizzes.layers.LocalChannelLayer",
+    "CONFIG": {"capacity": 300, "expiry": 10},
+}
+if CLASSPOINT_CHANNEL_LAYER == "local" or (CLASSPOINT_CHANNEL_LAYER == "auto" and WEB_CONCURRENCY == 1):
+    CHANNEL_LAYERS = {"default": LOCAL_CHANNEL_LAYER}
+else:
+    CHANNEL_LAYERS = {"default": REDIS_CHANNEL_LAYER}
+
+
+# Session finalization: where raw answers of ended sessions go.
+# "" keeps them in the answers table, "table" moves them to ArchivedAnswer,
+# "file" moves them to gzip-compressed CSV files under CLASSPOINT_ARCHIVE_DIR.
+# With session actors on, `manage.py finalize_sessions` does the moving once
+# every worker's final checkpoint is in, so run it periodically.
+CLASSPOINT_ANSWER_ARCHIVE = ""
+CLASSPOINT_ARCHIVE_DIR = BASE_DIR / "archive"
+
+# Seconds a rendered quiz / question / session payload stays in the cache.
+# Entries are keyed by content version, so edits never serve stale data.
+CLASSPOINT_CONTENT_CACHE_TIMEOUT = 3600
+
+# Per-session actors own live session state in memory and checkpoint it to
+# the database every CLASSPOINT_ACTOR_CHECKPOINT_SECONDS. Workers share answers
+# through the session group, so several daphne workers stay consistent.
+# Answers are acknowledged before the checkpoint saves them: if a worker dies,
+# the answers it took since its last checkpoint (up to
+# CLASSPOINT_ACTOR_CHECKPOINT_SECONDS' worth) are lost, unless
+# CLASSPOINT_EVENT_LOG is on, in which case the next actor replays them.
+CLASSPOINT_SESSION_ACTORS = True
+CLASSPOINT_ACTOR_CHECKPOINT_SECONDS = 2.0
+CLASSPOINT_ACTOR_IDLE_SECONDS = 30
+# Extra seconds after a question's time limit before late answers are refused
+CLASSPOINT_ANSWER_GRACE_SECONDS = 2
+# How long a worker remembers the reply to an answer's msg_id, so a client
+# resending it after a reconnect gets the same reply instead of a regrade
+CLASSPOINT_ANSWER_DEDUPE_SECONDS = 300
+
+# Per-socket outbound queue: frames waiting before a client counts as slow,
+# and how long the oldest frame (or an unacked probe) may wait before we
+# disconnect it. Probes are sent every CLASSPOINT_WS_PROBE_SECONDS; clients
+# that answer them with "probe_ack" are held to the delay limit.
+CLASSPOINT_WS_QUEUE_MAX_FRAMES = 64
+CLASSPOINT_WS_SLOW_CLIENT_SECONDS = 10.0
+CLASSPOINT_WS_PROBE_SECONDS = 5.0
+
+# WebSocket rate limits: action -> (tokens per second, burst). Applied per
+# socket and, for join/answer, per participant bound to the socket. Unlisted
+# actions use "default".
+# Set CLASSPOINT_WS_RATE_LIMIT_REDIS (e.g. "redis://redis:6379/1") to share the
+# per-participant buckets between workers.
+CLASSPOINT_WS_RATE_LIMITS = {
+    "answer": (2, 5),
+    "join": (1, 3),
+    "host_join": (0.5, 3),
+    "host_push_question": (1, 5),
+    "ping": (1, 5),
+    "default": (5, 10),
+}
+CLASSPOINT_WS_RATE_LIMIT_REDIS = None
+# Rejections in a row before a socket is closed as abusive
+CLASSPOINT_WS_ABUSE_STRIKES = 50
+
+# Presence ("N connected / M answered" frames to the host): at most one frame
+# per interval per worker. A student counts as connected while their socket
+# sent anything (probe_acks and pings are heartbeats) within the TTL. Workers'
+# counts are merged at the host socket; set CLASSPOINT_PRESENCE_REDIS to keep
+# them in one shared store instead. Either way, entries of vanished workers
+# expire after the TTL.
+CLASSPOINT_PRESENCE_INTERVAL_SECONDS = 1.0
+CLASSPOINT_PRESENCE_TTL_SECONDS = 45
+CLASSPOINT_PRESENCE_REDIS = None
+CLASSPOINT_PRESENCE_TTL_SECONDS = 45
+
+# Answer latency breakdown (quizzes/latency.py): each worker sends its figures
+# for a session to the host at most once per interval.
+CLASSPOINT_LATENCY_INTERVAL_SECONDS = 5.0
+
+# Word cloud questions: the host gets the CLASSPOINT_WORDCLOUD_TOP most frequent
+# terms at most once per interval. Each worker counts at most
+# CLASSPOINT_WORDCLOUD_CAPACITY distinct terms per session (rarer ones share
+# counters, so their counts become approximate).
+CLASSPOINT_WORDCLOUD_INTERVAL_SECONDS = 1.0
+CLASSPOINT_WORDCLOUD_TOP = 50
+CLASSPOINT_WORDCLOUD_CAPACITY = 500
+
+# Question pipelining: when a question opens, send the next question's payload
+# ahead so advancing only needs a tiny activate frame. Needs a client that
+# understands question_prefetch / question_activate frames.
+CLASSPOINT_QUESTION_PREFETCH = False
+
+# Append-only per-session event log (joins, pushes, answers, closes) used to
+# recover live state after a restart and for offline replay:
+# "" = off, "file" = gzip JSON lines under CLASSPOINT_EVENT_LOG_DIR,
+# "redis" = one Redis stream per session at CLASSPOINT_EVENT_LOG_REDIS.
+CLASSPOINT_EVENT_LOG = ""
+CLASSPOINT_EVENT_LOG_DIR = BASE_DIR / "eventlog"
+CLASSPOINT_EVENT_LOG_REDIS = "redis://redis:6379/1"
+
+# Worker warm-up (quizzes/warmup.py), run by `manage.py serve` before daphne
+# accepts traffic: preloads answer keys and session payloads of up to
+# CLASSPOINT_WARMUP_SESSIONS running sessions. CLASSPOINT_WARMUP_URLCONF also
+# imports the HTTP URLconf (DRF, SimpleJWT, admin) up front instead of on the
+# first HTTP request.
+CLASSPOINT_WARMUP = True
+CLASSPOINT_WARMUP_SESSIONS = 500
+CLASSPOINT_WARMUP_URLCONF = False
+
+# Session analytics (quizzes/analytics.py) are cached until the session's next
+# saved answer. With a per-process cache (the default) other workers can serve
+# a result up to this many seconds old.
+CLASSPOINT_ANALYTICS_CACHE_SECONDS = 30
@@ -18,6 +18,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+# Admin autodiscovery is deferred to here (see SimpleAdminConfig in settings)
+admin.autodiscover()
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("quizzes.api_urls")),
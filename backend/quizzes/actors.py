@@ -0,0 +1,776 @@
+# backend/quizzes/actors.py
+"""
+Per-session actors.
+
+One `SessionActor` per live session PIN and worker owns that session's live
+state: participants and scores, accepted answers, the open question and its
+timer. Every mutation goes through the actor's mailbox and is handled by a
+single asyncio task, so concurrent answers are serialized in memory instead of
+racing each other through the database. Answers are scored in memory by the
+quiz's scoring policy (scoring.py), against the time the open question was
+opened on this worker and the participant's streak held in the roster. The
+database becomes a checkpoint:
+new/changed answers and score deltas are flushed in bulk every
+CLASSPOINT_ACTOR_CHECKPOINT_SECONDS, on session end and when the actor stops.
+Answers are acknowledged before that, so a worker crash loses the answers
+taken since its last checkpoint unless the event log (below) is on.
+Checkpoints take the session row lock and write nothing once the session's
+answers have been archived; at session end each actor only refreshes the
+results snapshot and archiving is left to the finalize_sessions sweep, after
+every worker's actor has written its final checkpoint.
+
+With CLASSPOINT_EVENT_LOG on, the actor also records what happens (joins,
+pushes, answers, closes) in the session's event log with each checkpoint, and
+a starting actor replays that log to reopen the current question and re-apply
+answers no checkpoint saved (see eventlog.py). Unsaved answers of another
+actor that is still logging are applied in memory only, since that actor
+saves them itself, and its question timer is left to it; both are taken over
+if it goes quiet (`_handle_adopt`).
+
+Workers stay consistent with each other through the session group: answers
+graded elsewhere (another worker's actor or the REST fallback) arrive as
+`answers` events on `score.update` messages and are applied with
+`observe_answer`, without being persisted a second time.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import latency
+from .analytics import bump_answers_version
+from .eventlog import EventBuffer, answer_fields, event_log_backend, read_events, replay
+from .grading import (
+    GradeResult, InvalidAnswer, check_answer, get_answer_key, get_question_keys,
+    response_columns, response_from_columns,
+)
+from .livestate import LiveRoster
+from .models import Answer, Participant, Question, Quiz, Session, SessionResult
+from .scoreboard import session_group_name
+from .scoring import DEFAULT_POLICY, policy_from_row
+
+logger = logging.getLogger(__name__)
+
+# How many foreign answer event ids each actor remembers for de-duplication
+SEEN_EVENTS_LIMIT = 4096
+# Checkpoints with more distinct score deltas than this update scores with one CASE per batch
+SCORE_UPDATE_GROUPS = 8
+
+
+def actors_enabled():
+    return getattr(settings, "CLASSPOINT_SESSION_ACTORS", True)
+
+
+def live_window():
+    """Seconds without a logged event after which another actor is taken for gone."""
+    return 3 * getattr(settings, "CLASSPOINT_ACTOR_CHECKPOINT_SECONDS", 2.0)
+
+
+def answer_event(result, origin=None):
+    """
+    Serializable description of a graded answer, attached to `score.update`
+    group messages so other workers' actors can apply it.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "origin": origin,
+        "participant_id": result.participant_id,
+        "question_id": result.question_id,
+        **response_columns(result.response),
+        "is_correct": result.is_correct,
+        "points": result.points,
+        "score_delta": result.score_delta,
+    }
+
+
+def _event_response(event):
+    """The response of an `answers` / log event (older events only have choice_id)."""
+    return response_from_columns(event.get("choice_id"), event.get("choice_ids"), event.get("value", ""))
+
+
+@dataclass
+class LiveAnswer:
+    """An answer waiting for the next checkpoint."""
+    response: object  # see grading.response_columns
+    is_correct: bool
+    points: int
+    answered_at: object  # aware datetime
+    graded: Optional[float] = None  # time.perf_counter() when graded here (None when recovered)
+    persisted: Optional[asyncio.Future] = None  # see GradeResult.persisted
+
+
+class SessionActor:
+    """
+    Owns one session's live state inside this worker. Use the async methods;
+    they enqueue a message and wait for the actor task to handle it.
+    """
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.actor_id = uuid.uuid4().hex
+        self.mailbox = asyncio.Queue()
+        self.refcount = 0
+        self.ready = None  # future of start(), set by acquire_actor
+        self.task = None
+        self.stop_handle = None
+
+        # Session state (filled by _load)
+        self.session_id = None
+        self.quiz_id = None
+        self.content_version = None
+        self.is_active = False
+        self.policy = DEFAULT_POLICY  # scoring.ScoringPolicy of the quiz
+
+        self.roster = LiveRoster()  # participants, scores and answers (livestate.py)
+
+        self.current_question = None
+        self.question_opened_at = None   # time.monotonic() when opened
+        self.question_time_limit = None
+        self.closed_questions = set()
+        self.timer_handle = None
+        self.owns_timer = False
+        self.ended = False
+
+        # Pending checkpoint
+        self.dirty_answers = {}
+        self.score_deltas = defaultdict(int)
+        self.flush_lock = asyncio.Lock()
+
+        self.seen_events = OrderedDict()
+        self.events = None         # EventBuffer when the event log is on
+        self.log_seq = 0           # seq of the last answer logged
+        self.saved_seq = 0         # ... of the last one a checkpoint saved
+        self.marked_seq = 0        # ... announced with a "checkpoint" event
+        self.provisional = {}      # (participant_id, question_id) -> (event, delta), see _recover_from_log
+        self.timer_wait = None     # recovered question whose timer a live actor holds
+        self.adopt_handle = None
+        self._scoreboard = None
+        self._key = None
+        self._question_keys = None
+        self._key_version = None
+
+    # ------- Public API (called by consumers) -------
+
+    async def start(self):
+        recovered = await database_sync_to_async(self._load)()
+        if recovered is not None:
+            self._restore_question(recovered)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+        if self.provisional or self.timer_wait is not None:
+            self._schedule_adopt()
+
+    async def join(self, participant_id):
+        """The participant's display name if they belong to this session, else None."""
+        return await self._ask("join", participant_id)
+
+    async def submit_answer(self, participant_id, choice_id=None, question_id=None, choice_ids=None, value=None):
+        """Grade a response given as for grading.check_answer; returns a GradeResult."""
+        return await self._ask("answer", participant_id, choice_id, question_id, choice_ids, value)
+
+    async def push_question(self, question_payload):
+        return await self._ask("push_question", question_payload)
+
+    async def end(self):
+        return await self._ask("end")
+
+    async def sync(self):
+        """Wait until everything queued so far has been handled."""
+        return await self._ask("sync")
+
+    def observe_answer(self, event):
+        """Apply an answer graded elsewhere (fire-and-forget, de-duplicated)."""
+        if event.get("origin") == self.actor_id:
+            return
+        self.mailbox.put_nowait(("observe_answer", (event,), None))
+
+    def observe_question(self, question_id, origin):
+        if origin == self.actor_id:
+            return
+        self.mailbox.put_nowait(("observe_question", (question_id,), None))
+
+    def scoreboard(self):
+        """Current scoreboard, best first. Rebuilt only after a change."""
+        if self._scoreboard is None:
+            self._scoreboard = self.roster.scoreboard()
+        return self._scoreboard
+
+    # ------- Mailbox loop -------
+
+    async def _ask(self, kind, *args):
+        future = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait((kind, args, future))
+        return await future
+
+    async def _run(self):
+        interval = getattr(settings, "CLASSPOINT_ACTOR_CHECKPOINT_SECONDS", 2.0)
+        next_checkpoint = time.monotonic() + interval
+        while True:
+            timeout = max(0.0, next_checkpoint - time.monotonic())
+            try:
+                kind, args, future = await asyncio.wait_for(self.mailbox.get(), timeout)
+            except asyncio.TimeoutError:
+                await self.checkpoint()
+                next_checkpoint = time.monotonic() + interval
+                continue
+
+            if kind == "stop":
+                await self.checkpoint(final=True)
+                if future is not None:
+                    future.set_result(None)
+                return
+
+            try:
+                result = await getattr(self, f"_handle_{kind}")(*args)
+            except Exception as exc:
+                logger.exception("Session actor %s failed handling %s", self.pin, kind)
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+
+    # ------- Handlers (run one at a time on the actor task) -------
+
+    async def _handle_join(self, participant_id):
+        try:
+            participant_id = int(participant_id)
+        except (TypeError, ValueError):
+            return None
+        if not await self._ensure_participant(participant_id):
+            return None
+        name = self.roster.name(participant_id)
+        self._log("join", participant_id=participant_id, name=name)
+        return name
+
+    async def _handle_answer(self, participant_id, choice_id, question_id=None, choice_ids=None, value=None):
+        started = time.perf_counter()
+        try:
+            participant_id = int(participant_id)
+            choice_id = int(choice_id) if choice_id is not None else None
+            question_id = int(question_id) if question_id is not None else None
+        except (TypeError, ValueError):
+            return GradeResult(participant_id=participant_id, error="invalid_ids")
+
+        result = GradeResult(
+            participant_id=participant_id, choice_id=choice_id,
+            session_id=self.session_id, pin=self.pin, started_at=started,
+        )
+        if not self.is_active:
+            result.error = "session_ended"
+            return result
+        if not await self._ensure_participant(participant_id):
+            result.error = "participant_not_found"
+            return result
+
+        answer_key, question_keys = await self._answer_keys()
+        try:
+            question_id, response, is_correct = check_answer(
+                answer_key, question_keys, choice_id, question_id, choice_ids, value
+            )
+        except InvalidAnswer as exc:
+            result.error = exc.code
+            return result
+        result.question_id = question_id
+        result.response = response
+        result.choice_id = response_columns(response)["choice_id"]
+        result.is_correct = is_correct
+        if question_id in self.closed_questions:
+            result.error = "question_closed"
+            return result
+
+        previous = self.roster.answer(participant_id, question_id)
+        result.created = previous is None
+        if previous is not None and previous[0] == response:
+            result.points = previous[2]
+            return result
+
+        elapsed = time_limit = None
+        if question_id == self.current_question and self.question_opened_at is not None:
+            elapsed = time.monotonic() - self.question_opened_at
+            time_limit = self.question_time_limit
+        streak = self.roster.advance_streak(participant_id, question_id, is_correct)
+        result.points = self.policy.score(is_correct, elapsed, time_limit, streak)
+        result.score_delta = result.points - (previous[2] if previous is not None else 0)
+
+        self._apply(participant_id, question_id, response, is_correct, result.points, result.score_delta)
+        # A re-answer before the checkpoint is saved together with the answer it replaces
+        pending = self.dirty_answers.get((participant_id, question_id))
+        if pending is not None and pending.persisted is not None:
+            result.persisted = pending.persisted
+        else:
+            result.persisted = asyncio.get_running_loop().create_future()
+        self.dirty_answers[(participant_id, question_id)] = LiveAnswer(
+            response, is_correct, result.points, timezone.now(), time.perf_counter(), result.persisted
+        )
+        self.score_deltas[participant_id] += result.score_delta
+        if self.events is not None:
+            self.log_seq += 1
+            self._log("answer", seq=self.log_seq, **answer_fields(result, self.actor_id))
+        return result
+
+    async def _handle_observe_answer(self, event):
+        event_id = event.get("id")
+        if event_id in self.seen_events:
+            return
+        self.seen_events[event_id] = True
+        if len(self.seen_events) > SEEN_EVENTS_LIMIT:
+            self.seen_events.popitem(last=False)
+
+        participant_id = event["participant_id"]
+        if not await self._ensure_participant(participant_id):
+            return
+        question_id, is_correct = event["question_id"], event["is_correct"]
+        # Same answers in the same order as the grading actor, so the same streak
+        self.roster.advance_streak(participant_id, question_id, is_correct)
+        self._apply(
+            participant_id, question_id, _event_response(event), is_correct,
+            event.get("points", int(is_correct)), event["score_delta"],
+        )
+
+    async def _handle_push_question(self, payload):
+        # Pick up teacher edits made since the session started (off the answer path)
+        row = await database_sync_to_async(
+            lambda: Quiz.objects.filter(pk=self.quiz_id).values_list(
+                "content_version", "scoring", "points", "streak_bonus"
+            ).first()
+        )()
+        if row is not None:
+            self.content_version, self.policy = row[0], policy_from_row(*row[1:])
+        self._open_question(payload["id"], payload.get("time_limit"))
+        self.owns_timer = True
+        self.timer_wait = None
+        self._log("push", question_id=payload["id"], time_limit=payload.get("time_limit"))
+        return payload
+
+    async def _handle_observe_question(self, question_id):
+        row = await database_sync_to_async(
+            lambda: Question.objects.filter(pk=question_id).values_list(
+                "time_limit", "quiz__scoring", "quiz__points", "quiz__streak_bonus"
+            ).first()
+        )()
+        time_limit = None
+        if row is not None:
+            time_limit, self.policy = row[0], policy_from_row(*row[1:])
+        self._open_question(question_id, time_limit)
+        self.owns_timer = False
+        self.timer_wait = None
+
+    async def _handle_close_question(self, question_id):
+        self.closed_questions.add(question_id)
+        if self.current_question == question_id:
+            self.current_question = None
+        if self.owns_timer:
+            # Only the worker that opened the question announces the close
+            self._log("close", question_id=question_id)
+            await get_channel_layer().group_send(
+                session_group_name(self.pin),
+                {"type": "question.closed", "question_id": question_id},
+            )
+
+    async def _handle_sync(self):
+        return None
+
+    async def _handle_adopt(self):
+        """
+        Second look at what recovery left to a live actor: the answers it has
+        not saved by now and the timer of the question it pushed become ours
+        once it has stopped logging.
+        """
+        self.adopt_handle = None
+        state = await asyncio.to_thread(lambda: replay(read_events(self.session_id)))
+        window = live_window()
+        for key, (event, delta) in list(self.provisional.items()):
+            if not state.unsaved(event):
+                del self.provisional[key]
+            elif not state.is_live(event["origin"], window):
+                del self.provisional[key]
+                self._adopt(*key, event, delta)
+                logger.info("Session %s: took over an answer of stopped actor %s", self.pin, event["origin"])
+        if self.timer_wait is not None:
+            if self.current_question != self.timer_wait:
+                self.timer_wait = None
+            elif not state.is_live(state.question_origin, window):
+                self._take_timer()
+        if self.provisional or self.timer_wait is not None:
+            self._schedule_adopt()
+
+    async def _handle_end(self):
+        from .archive import finalize_session
+
+        if self.ended or self.session_id is None:
+            return
+        self.ended = True
+        self.is_active = False
+        self._cancel_timer()
+        self._log("end")
+        await self.checkpoint()
+        # Rebuild the results snapshot now that this worker's answers are in the
+        # table. Not archived here: other workers may still be checkpointing
+        await database_sync_to_async(
+            lambda: finalize_session(Session.objects.get(pk=self.session_id), archive="", refresh=True)
+        )()
+
+    # ------- State helpers -------
+
+    def _load(self):
+        row = Session.objects.filter(pin=self.pin).values_list(
+            "id", "quiz_id", "quiz__content_version", "is_active",
+            "quiz__scoring", "quiz__points", "quiz__streak_bonus",
+        ).first()
+        if row is None:
+            return
+        self.session_id, self.quiz_id, self.content_version, self.is_active = row[:4]
+        self.policy = policy_from_row(*row[4:])
+
+        participants = (
+            Participant.objects.filter(session_id=self.session_id)
+            .order_by("joined_at", "id")
+            .values_list("id", "name", "score")
+        )
+        for pid, name, score in participants:
+            self.roster.add(pid, name, score)
+
+        for pid, qid, cid, cids, value, is_correct, points in Answer.objects.filter(
+            participant__session_id=self.session_id
+        ).values_list(
+            "participant_id", "question_id", "choice_id", "choice_ids", "value", "is_correct", "points"
+        ).iterator(chunk_size=5000):
+            if pid in self.roster:
+                self.roster.set_answer(pid, qid, response_from_columns(cid, cids, value), is_correct, points)
+        if self.policy.streak_bonus:
+            self.roster.rebuild_streaks(
+                Question.objects.filter(quiz_id=self.quiz_id)
+                .order_by("order", "id").values_list("id", flat=True)
+            )
+
+        if event_log_backend():
+            self.events = EventBuffer(self.session_id)
+            if self.is_active:
+                return self._recover_from_log()
+        return None
+
+    def _recover_from_log(self):
+        """
+        Replay the event log over the state loaded from the database and
+        re-apply the answers no checkpoint saved. Those of an actor that is
+        still logging are only applied in memory (it saves them with its next
+        checkpoint; `_handle_adopt` checks it did), the others are queued for
+        our next checkpoint. Returns the ReplayState so `start` can reopen the
+        question that was open.
+        """
+        state = replay(read_events(self.session_id))
+        window = live_window()
+        for (pid, qid), event in state.answers.items():
+            if pid not in self.roster or not state.unsaved(event):
+                continue
+            current = self.roster.answer(pid, qid)
+            response = _event_response(event)
+            if current is not None and current[0] == response:
+                continue
+            points = event.get("points", int(event["is_correct"]))
+            delta = points - (current[2] if current is not None else 0)
+            self._apply(pid, qid, response, event["is_correct"], points, delta)
+            if state.is_live(event["origin"], window):
+                self.provisional[(pid, qid)] = (event, delta)
+            else:
+                self._adopt(pid, qid, event, delta)
+        self.closed_questions |= state.closed_questions
+        if self.dirty_answers:
+            logger.info("Session %s: re-applied %d answers from the event log", self.pin, len(self.dirty_answers))
+        return state
+
+    def _adopt(self, participant_id, question_id, event, delta):
+        """Queue a recovered answer and its score delta for our next checkpoint."""
+        response = _event_response(event)
+        current = self.roster.answer(participant_id, question_id)
+        if current is not None and current[0] == response:
+            # (once replaced, the newer answer's row is saved by whoever graded it)
+            self.dirty_answers[(participant_id, question_id)] = LiveAnswer(
+                response, event["is_correct"], event.get("points", int(event["is_correct"])),
+                datetime.fromtimestamp(event["t"], tz=dt_timezone.utc),
+            )
+        self.score_deltas[participant_id] += delta
+
+    def _schedule_adopt(self):
+        self.adopt_handle = asyncio.get_running_loop().call_later(
+            live_window(), self.mailbox.put_nowait, ("adopt", (), None)
+        )
+
+    def _restore_question(self, state):
+        """Reopen the question that was open when the log was last written."""
+        if state.current_question is None:
+            return
+        remaining = state.remaining_time()
+        grace = getattr(settings, "CLASSPOINT_ANSWER_GRACE_SECONDS", 2)
+        if remaining is not None and remaining + grace <= 0:
+            self.closed_questions.add(state.current_question)
+            return
+        self._open_question(state.current_question, remaining)
+        self.question_opened_at = time.monotonic() - (time.time() - state.opened_at)
+        self.question_time_limit = state.time_limit
+        # While the actor that holds its timer runs, that actor announces the close
+        if state.is_live(state.question_origin, live_window()):
+            self.timer_wait = state.current_question
+        else:
+            self._take_timer()
+
+    def _take_timer(self):
+        self.owns_timer = True
+        self.timer_wait = None
+        self._log("timer", question_id=self.current_question)
+
+    def _log(self, kind, **fields):
+        if self.events is not None:
+            self.events.add(kind, **{"origin": self.actor_id, **fields})
+
+    def _log_progress(self):
+        """Announce answers saved since the last checkpoint event, or that we still run."""
+        if self.saved_seq > self.marked_seq:
+            self._log("checkpoint", seq=self.saved_seq)
+            self.marked_seq = self.saved_seq
+        elif not self.events.pending and (
+            self.dirty_answers or (self.owns_timer and self.current_question is not None and self.question_time_limit)
+        ):
+            self._log("alive")
+
+    async def _ensure_participant(self, participant_id):
+        """Known participant of this session? Fetches late joiners once."""
+        if participant_id in self.roster:
+            return True
+        if self.session_id is None:
+            return False
+        row = await database_sync_to_async(
+            lambda: Participant.objects.filter(pk=participant_id, session_id=self.session_id)
+            .values_list("name", "score").first()
+        )()
+        if row is None:
+            return False
+        self.roster.add(participant_id, row[0], row[1])
+        self._scoreboard = None
+        return True
+
+    async def _answer_keys(self):
+        """The quiz's choice and question keys for the current content version (DB only on change)."""
+        if self._key_version != self.content_version:
+            quiz_id, version = self.quiz_id, self.content_version
+            self._key, self._question_keys = await database_sync_to_async(
+                lambda: (get_answer_key(quiz_id, version), get_question_keys(quiz_id, version))
+            )()
+            self._key_version = version
+        return self._key, self._question_keys
+
+    def _apply(self, participant_id, question_id, response, is_correct, points, score_delta):
+        self.roster.set_answer(participant_id, question_id, response, is_correct, points)
+        if score_delta:
+            self.roster.add_score(participant_id, score_delta)
+            self._scoreboard = None
+
+    def _open_question(self, question_id, time_limit):
+        self._cancel_timer()
+        self.current_question = question_id
+        self.question_opened_at = time.monotonic()
+        self.question_time_limit = time_limit
+        self.closed_questions.discard(question_id)
+        if time_limit:
+            grace = getattr(settings, "CLASSPOINT_ANSWER_GRACE_SECONDS", 2)
+            self.timer_handle = asyncio.get_running_loop().call_later(
+                time_limit + grace,
+                self.mailbox.put_nowait, ("close_question", (question_id,), None),
+            )
+
+    def _cancel_timer(self):
+        if self.timer_handle is not None:
+            self.timer_handle.cancel()
+            self.timer_handle = None
+
+    # ------- Checkpointing -------
+
+    async def checkpoint(self, final=False):
+        """
+        Flush pending answers and score deltas to the database in bulk. With
+        the event log on, pending events are appended first; the answers this
+        saves are announced in the log by the next checkpoint (this one when
+        `final`).
+        """
+        if self.events is not None:
+            self._log_progress()
+            await self.events.flush()
+        if self.dirty_answers or any(self.score_deltas.values()):
+            await self._flush_state()
+        if final and self.events is not None:
+            self._log_progress()
+            await self.events.flush()
+
+    async def _flush_state(self):
+        answers, self.dirty_answers = self.dirty_answers, {}
+        deltas, self.score_deltas = self.score_deltas, defaultdict(int)
+        logged = self.log_seq  # every answer logged so far is in the log and in `answers`
+        async with self.flush_lock:
+            try:
+                began = time.perf_counter()
+                saved = await database_sync_to_async(self._persist)(self.session_id, answers, deltas)
+                if not saved:
+                    logger.warning(
+                        "Session %s answers were archived; dropped %d unsaved answer(s)", self.pin, len(answers)
+                    )
+                self.saved_seq = logged
+                done = time.perf_counter()
+                for live in answers.values():
+                    if live.persisted is not None and not live.persisted.done():
+                        live.persisted.set_result(done if saved else None)
+                latency.record(self.pin, checkpoint=done - began)
+                latency.record_all(
+                    self.pin, "persist",
+                    [done - live.graded for live in answers.values() if live.graded is not None],
+                )
+            except Exception:
+                logger.exception("Checkpoint failed for session %s; will retry", self.pin)
+                for key, live in answers.items():
+                    self.dirty_answers.setdefault(key, live)
+                for pid, delta in deltas.items():
+                    self.score_deltas[pid] += delta
+
+    @staticmethod
+    def _persist(session_id, answers, deltas):
+        """Write one checkpoint; False (and nothing written) once the answers are archived."""
+        by_delta = defaultdict(list)
+        for pid, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(pid)
+        with transaction.atomic():
+            # Same lock as finalize_session, so archiving never races a checkpoint
+            Session.objects.select_for_update().filter(pk=session_id).first()
+            if SessionResult.objects.filter(session_id=session_id).exclude(answers_archived="").exists():
+                return False
+            if answers:
+                Answer.objects.bulk_create(
+                    [
+                        Answer(
+                            participant_id=pid, question_id=qid, **response_columns(live.response),
+                            is_correct=live.is_correct, points=live.points, answered_at=live.answered_at,
+                        )
+                        for (pid, qid), live in answers.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["participant", "question"],
+                    update_fields=["choice", "choice_ids", "value", "is_correct", "points"],
+                    batch_size=500,
+                )
+            if len(by_delta) <= SCORE_UPDATE_GROUPS:
+                # One UPDATE per distinct delta (flat scoring: just +points / -points)
+                for delta, pids in by_delta.items():
+                    Participant.objects.filter(pk__in=pids).update(score=Greatest(F("score") + delta, 0))
+            else:
+                # Speed scoring gives nearly every participant their own delta
+                changed = [(pid, delta) for pid, delta in deltas.items() if delta]
+                for start in range(0, len(changed), 500):
+                    batch = changed[start:start + 500]
+                    Participant.objects.filter(pk__in=[pid for pid, _ in batch]).update(
+                        score=Greatest(
+                            Case(*(When(pk=pid, then=F("score") + delta) for pid, delta in batch)), 0
+                        )
+                    )
+        if answers:
+            bump_answers_version(session_id)
+        return True
+
+    async def stop(self):
+        if self.task is None or self.task.done():
+            return
+        self._cancel_timer()
+        if self.adopt_handle is not None:
+            self.adopt_handle.cancel()
+            self.adopt_handle = None
+        future = asyncio.get_running_loop().create_future()
+        self.mailbox.put_nowait(("stop", (), future))
+        await future
+
+
+# -------------------------
+# Per-worker registry
+# -------------------------
+_actors = {}    # pin -> SessionActor, from the moment it starts loading
+_stopping = {}  # pin -> future done when that PIN's last actor has stopped
+
+
+async def acquire_actor(pin):
+    """
+    Get (starting if needed) the actor for `pin`; pair with release_actor.
+    Sockets of one PIN share the actor's start; nothing is held across PINs,
+    so a slow load or checkpoint of one session never delays another.
+    """
+    actor = _actors.get(pin)
+    if actor is None:
+        actor = _actors[pin] = SessionActor(pin)
+        actor.ready = asyncio.ensure_future(_start(actor, _stopping.get(pin)))
+    actor.refcount += 1
+    if actor.stop_handle is not None:
+        actor.stop_handle.cancel()
+        actor.stop_handle = None
+    try:
+        await asyncio.shield(actor.ready)
+    except BaseException:
+        release_actor(actor)
+        raise
+    return actor
+
+
+async def _start(actor, previous):
+    # A new actor only loads after the previous one's final checkpoint
+    if previous is not None:
+        await previous
+    try:
+        await actor.start()
+    except BaseException:
+        if _actors.get(actor.pin) is actor:
+            del _actors[actor.pin]
+        raise
+
+
+def live_actor(pin):
+    """This worker's started actor for `pin` while sockets hold it, else None."""
+    actor = _actors.get(pin)
+    if actor is None or actor.refcount <= 0 or not actor.ready.done() or actor.ready.exception():
+        return None
+    return actor
+
+
+def release_actor(actor):
+    """Drop one reference; idle actors checkpoint and stop after a grace period."""
+    actor.refcount -= 1
+    if actor.refcount > 0:
+        return
+    idle = getattr(settings, "CLASSPOINT_ACTOR_IDLE_SECONDS", 30)
+    actor.stop_handle = asyncio.get_running_loop().call_later(
+        idle, lambda: asyncio.ensure_future(_stop_idle(actor))
+    )
+
+
+async def _stop_idle(actor):
+    pin = actor.pin
+    if actor.refcount > 0 or _actors.get(pin) is not actor:
+        return
+    # Sockets arriving from now on start a fresh actor, which waits for `stopped`
+    del _actors[pin]
+    stopped = _stopping[pin] = asyncio.get_running_loop().create_future()
+    try:
+        await asyncio.wait([actor.ready])
+        await actor.stop()
+    except Exception:
+        logger.exception("Session actor %s failed to stop", pin)
+    finally:
+        stopped.set_result(None)
+        if _stopping.get(pin) is stopped:
+            del _stopping[pin]
@@ -0,0 +1,128 @@
+# backend/quizzes/aggregates.py
+"""
+Cross-session quiz analytics.
+
+A quiz replayed by many classes gets one `QuestionAggregate` row per question
+holding running totals (sessions, attempts, correct answers, per-choice
+counts, and seconds from each question opening to its answers, summed over
+the attempts whose open time is known). Every finalized session adds its
+`SessionResult.question_stats` once (`SessionResult.aggregated` records that
+it did); a refreshed snapshot first subtracts the stats it replaces. The quiz
+analytics endpoint then reads one row per question instead of every Answer
+of every session. `manage.py aggregate_quiz_stats` catches up on snapshots
+that were never applied and can rebuild a quiz's totals from scratch.
+"""
+from django.db import transaction
+
+from .models import Question, QuestionAggregate, Session, SessionResult
+
+AGGREGATE_FIELDS = ("sessions", "attempts", "correct", "choice_counts", "timed_attempts", "response_seconds")
+
+
+def apply_session_stats(quiz_id, question_stats, sign=1):
+    """
+    Add (sign=1) or subtract (sign=-1) one session's question_stats to its
+    quiz's totals. Questions deleted since the session are skipped.
+    """
+    if not question_stats:
+        return
+    stats = {entry["question_id"]: entry for entry in question_stats}
+    with transaction.atomic():
+        existing = set(Question.objects.filter(pk__in=stats, quiz_id=quiz_id).values_list("id", flat=True))
+        QuestionAggregate.objects.bulk_create(
+            [QuestionAggregate(question_id=qid, quiz_id=quiz_id) for qid in existing],
+            ignore_conflicts=True,
+        )
+        # Row locks in a fixed order, so concurrent session ends of one quiz queue up
+        rows = list(
+            QuestionAggregate.objects.select_for_update()
+            .filter(question_id__in=existing)
+            .order_by("question_id")
+        )
+        for row in rows:
+            entry = stats[row.question_id]
+            row.sessions = max(0, row.sessions + sign)
+            row.attempts = max(0, row.attempts + sign * entry.get("attempts", 0))
+            row.correct = max(0, row.correct + sign * entry.get("correct", 0))
+            if "timed_attempts" in entry:
+                # Older snapshots timed answers from session start; they add no response time
+                row.timed_attempts = max(0, row.timed_attempts + sign * entry["timed_attempts"])
+                row.response_seconds = max(0.0, row.response_seconds + sign * entry["response_seconds"])
+            counts = dict(row.choice_counts)
+            for choice_id, count in entry.get("choice_counts", {}).items():
+                total = counts.get(choice_id, 0) + sign * count
+                if total > 0:
+                    counts[choice_id] = total
+                else:
+                    counts.pop(choice_id, None)
+            row.choice_counts = counts
+        QuestionAggregate.objects.bulk_update(rows, AGGREGATE_FIELDS)
+
+
+def aggregate_pending(quiz_id=None, batch_size=200):
+    """Apply every finalized snapshot not yet in the totals; returns how many."""
+    pending = SessionResult.objects.filter(aggregated=False)
+    if quiz_id is not None:
+        pending = pending.filter(session__quiz_id=quiz_id)
+    pending = pending.order_by("session_id").values_list("session_id", "session__quiz_id")
+    count = 0
+    while True:
+        batch = list(pending[:batch_size])
+        if not batch:
+            return count
+        for session_id, session_quiz_id in batch:
+            with transaction.atomic():
+                # Same lock as finalize_session, then re-check the flag under it
+                Session.objects.select_for_update().filter(pk=session_id).first()
+                stats = (
+                    SessionResult.objects.filter(pk=session_id, aggregated=False)
+                    .values_list("question_stats", flat=True).first()
+                )
+                if stats is None:
+                    continue
+                apply_session_stats(session_quiz_id, stats)
+                SessionResult.objects.filter(pk=session_id).update(aggregated=True)
+                count += 1
+
+
+def rebuild_quiz(quiz_id):
+    """Recompute a quiz's totals from all its snapshots."""
+    with transaction.atomic():
+        QuestionAggregate.objects.filter(quiz_id=quiz_id).delete()
+        SessionResult.objects.filter(session__quiz_id=quiz_id).update(aggregated=False)
+        return aggregate_pending(quiz_id)
+
+
+def quiz_analytics(quiz):
+    """Per-question totals in quiz order (one query)."""
+    rows = (
+        Question.objects.filter(quiz=quiz)
+        .order_by("order", "id")
+        .values_list(
+            "id", "order", "text", "aggregate__sessions", "aggregate__attempts", "aggregate__correct",
+            "aggregate__choice_counts", "aggregate__timed_attempts", "aggregate__response_seconds",
+            "aggregate__updated_at",
+        )
+    )
+    questions = []
+    sessions = 0
+    updated_at = None
+    for qid, order, text, n_sessions, attempts, correct, choice_counts, timed, seconds, updated in rows:
+        attempts = attempts or 0
+        correct = correct or 0
+        sessions = max(sessions, n_sessions or 0)
+        if updated is not None and (updated_at is None or updated > updated_at):
+            updated_at = updated
+        questions.append({
+            "question_id": qid,
+            "order": order,
+            "text": text,
+            "sessions": n_sessions or 0,
+            "attempts": attempts,
+            "correct": correct,
+            "percent_correct": round(100.0 * correct / attempts, 3) if attempts else None,
+            "choice_counts": choice_counts or {},
+            # From the question opening (see Session.question_opened_at)
+            "mean_response_seconds": round(seconds / timed, 3) if timed else None,
+        })
+    return {"quiz_id": str(quiz.pk), "sessions": sessions, "updated_at": updated_at, "questions": questions}
@@ -0,0 +1,355 @@
+# backend/quizzes/analytics.py
+"""
+Post-question analytics for one session.
+
+A session's answers are read once, as columns (participant, question,
+correctness, seconds from `Session.started_at` to the answer), and every
+statistic is computed over those columns:
+
+  - percent correct per question and overall
+  - time-to-answer distribution (mean, quartiles, p90, histogram)
+  - discrimination index per question: share correct in the top 27% of
+    participants (by total correct) minus share correct in the bottom 27%
+
+NumPy is used when it is installed and imported on first use (it is slow to
+import and the live path never needs it); otherwise a pure-Python
+implementation produces the same numbers.
+
+Results are cached per session under an answers version that every write
+path bumps (`bump_answers_version`), so a cached result is served until the
+next answer lands in the database. With the default per-process cache other
+workers only notice after CLASSPOINT_ANALYTICS_CACHE_SECONDS.
+"""
+import math
+from bisect import bisect_right
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import FloatField, Func
+
+from .archive import iter_archived_answers
+from .models import Answer, Participant, SessionResult
+
+# Share of participants in each of the upper / lower discrimination groups
+DISCRIMINATION_GROUP = 0.27
+HISTOGRAM_BINS = 10
+
+_numpy = None
+
+
+def numpy_module():
+    """NumPy, or None when it is not installed (optional dependency)."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+# -------------------------
+# Cache versioning
+# -------------------------
+def _version_key(session_id):
+    return f"analytics:session:{session_id}:answers"
+
+
+def answers_version(session_id):
+    return cache.get(_version_key(session_id), 0)
+
+
+def bump_answers_version(session_id):
+    """Call after answers of a session were written (invalidates its analytics)."""
+    key = _version_key(session_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+def cached_session_analytics(session):
+    key = f"analytics:session:{session.id}:v{answers_version(session.id)}"
+    data = cache.get(key)
+    if data is None:
+        data = session_analytics(session)
+        cache.set(key, data, getattr(settings, "CLASSPOINT_ANALYTICS_CACHE_SECONDS", 30))
+    return data
+
+
+# -------------------------
+# Columns
+# -------------------------
+class EpochSeconds(Func):
+    """A datetime column as float seconds since the Unix epoch, computed in the database."""
+
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="EXTRACT(EPOCH FROM %(expressions)s)::double precision", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)", **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def fetch_columns(session):
+    """
+    The session's answers as parallel sequences: participant ids, question
+    ids, correctness and seconds since the session started. The live table is
+    read in one query with timestamps converted by the database, so no
+    datetime objects are built per row.
+    """
+    start = session.started_at.timestamp()
+    result = SessionResult.objects.filter(session=session).only("answers_archived", "archive_path").first()
+    if result is not None and result.answers_archived:
+        rows = [
+            (pid, qid, is_correct, _timestamp(answered_at) - start)
+            for pid, qid, _, is_correct, answered_at, *_ in iter_archived_answers(result)
+        ]
+        return tuple(zip(*rows)) or ((), (), (), ())
+
+    queryset = (
+        Answer.objects.filter(participant__session=session)
+        .order_by()
+        .values_list("participant_id", "question_id", "is_correct", EpochSeconds("answered_at"))
+    )
+    # Plain cursor: the rows need no model conversion, and skipping the ORM's
+    # per-chunk handling roughly halves the fetch for large sessions
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return (), (), (), ()
+    participants, questions, correct, epochs = zip(*rows)
+    return participants, questions, correct, [t - start for t in epochs]
+
+
+def _timestamp(value):
+    if isinstance(value, str):  # archive files store ISO strings
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def session_analytics(session):
+    """Analytics for `session` (see module docstring) as a JSON-ready dict."""
+    question_rows = list(session.quiz.questions.order_by("order", "id").values_list("id", "order", "text"))
+    participant_ids = sorted(Participant.objects.filter(session=session).values_list("id", flat=True))
+    columns = fetch_columns(session)
+
+    np = numpy_module()
+    compute = _compute_numpy if np is not None else _compute_python
+    overall, per_question = compute([qid for qid, _, _ in question_rows], participant_ids, *columns)
+    return {
+        "session_id": session.id,
+        "engine": "numpy" if np is not None else "python",
+        "participants": len(participant_ids),
+        **overall,
+        "questions": [
+            {"question_id": qid, "order": order, "text": text, **stats}
+            for (qid, order, text), stats in zip(question_rows, per_question)
+        ],
+    }
+
+
+def _group_size(participants):
+    if participants < 2:
+        return 0
+    return max(1, round(participants * DISCRIMINATION_GROUP))
+
+
+def _round(value):
+    return None if value is None else round(float(value), 3)
+
+
+def _question_stats(attempts, correct, upper, lower, group, distribution):
+    return {
+        "attempts": int(attempts),
+        "correct": int(correct),
+        "percent_correct": _round(100.0 * correct / attempts) if attempts else None,
+        "discrimination": _round((upper - lower) / group) if group else None,
+        "time_to_answer": distribution,
+    }
+
+
+# -------------------------
+# NumPy
+# -------------------------
+def _compute_numpy(question_ids, participant_ids, participants, questions, correct, seconds):
+    np = numpy_module()
+    qids = np.asarray(question_ids, dtype=np.int64)
+    pids = np.asarray(participant_ids, dtype=np.int64)
+    q_order = np.argsort(qids, kind="stable")
+    sorted_qids = qids[q_order]
+
+    a_question = np.asarray(questions, dtype=np.int64)
+    a_participant = np.asarray(participants, dtype=np.int64)
+    a_correct = np.asarray(correct, dtype=np.int8)
+    a_seconds = np.asarray(seconds, dtype=np.float64)
+
+    # Map ids to positions, dropping answers to removed questions / participants
+    if len(qids) and len(pids):
+        q_pos = np.searchsorted(sorted_qids, a_question).clip(0, len(qids) - 1)
+        p_pos = np.searchsorted(pids, a_participant).clip(0, len(pids) - 1)
+        keep = (sorted_qids[q_pos] == a_question) & (pids[p_pos] == a_participant)
+    else:
+        q_pos = p_pos = np.zeros(len(a_question), dtype=np.int64)
+        keep = np.zeros(len(a_question), dtype=bool)
+    q_index = q_order[q_pos[keep]]
+    p_index = p_pos[keep]
+    a_correct = a_correct[keep]
+    a_seconds = a_seconds[keep]
+
+    n_questions, n_participants = len(qids), len(pids)
+    attempts = np.bincount(q_index, minlength=n_questions)
+    correct_per_q = np.bincount(q_index, weights=a_correct, minlength=n_questions)
+
+    totals = np.bincount(p_index, weights=a_correct, minlength=n_participants)
+    ranking = np.argsort(-totals, kind="stable")
+    group = _group_size(n_participants)
+    upper_mask = np.zeros(n_participants, dtype=bool)
+    lower_mask = np.zeros(n_participants, dtype=bool)
+    if group:
+        upper_mask[ranking[:group]] = True
+        lower_mask[ranking[-group:]] = True
+    hits = a_correct.astype(bool)
+    upper = np.bincount(q_index[hits & upper_mask[p_index]], minlength=n_questions)
+    lower = np.bincount(q_index[hits & lower_mask[p_index]], minlength=n_questions)
+
+    # Sort answers by question, then time, and slice per question
+    order = np.lexsort((a_seconds, q_index))
+    q_sorted, s_sorted = q_index[order], a_seconds[order]
+    bounds = np.searchsorted(q_sorted, np.arange(n_questions + 1))
+
+    per_question = [
+        _question_stats(
+            attempts[i], correct_per_q[i], upper[i], lower[i], group,
+            _distribution_numpy(s_sorted[bounds[i]:bounds[i + 1]]),
+        )
+        for i in range(n_questions)
+    ]
+    total = len(a_correct)
+    overall = {
+        "answers": int(total),
+        "percent_correct": _round(100.0 * a_correct.sum() / total) if total else None,
+        "time_to_answer": _distribution_numpy(np.sort(a_seconds)),
+    }
+    return overall, per_question
+
+
+def _distribution_numpy(values):
+    """Distribution of already sorted seconds."""
+    if not len(values):
+        return None
+    np = numpy_module()
+    p25, median, p75, p90 = np.percentile(values, [25, 50, 75, 90])
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        "mean": _round(values.mean()),
+        "median": _round(median),
+        "p25": _round(p25),
+        "p75": _round(p75),
+        "p90": _round(p90),
+        "min": _round(values[0]),
+        "max": _round(values[-1]),
+        "histogram": {"edges": [_round(e) for e in edges], "counts": [int(c) for c in counts]},
+    }
+
+
+# -------------------------
+# Pure Python fallback
+# -------------------------
+def _compute_python(question_ids, participant_ids, participants, questions, correct, seconds):
+    q_position = {qid: i for i, qid in enumerate(question_ids)}
+    p_position = {pid: i for i, pid in enumerate(participant_ids)}
+    n_questions, n_participants = len(question_ids), len(participant_ids)
+
+    rows = []  # (question index, participant index, correct, seconds)
+    totals = [0] * n_participants
+    for pid, qid, hit, secs in zip(participants, questions, correct, seconds):
+        qi, pi = q_position.get(qid), p_position.get(pid)
+        if qi is None or pi is None:
+            continue
+        rows.append((qi, pi, hit, secs))
+        totals[pi] += hit
+
+    group = _group_size(n_participants)
+    ranking = sorted(range(n_participants), key=lambda i: -totals[i])
+    upper_set = set(ranking[:group]) if group else set()
+    lower_set = set(ranking[-group:]) if group else set()
+
+    attempts = [0] * n_questions
+    correct_per_q = [0] * n_questions
+    upper = [0] * n_questions
+    lower = [0] * n_questions
+    times = [[] for _ in range(n_questions)]
+    for qi, pi, hit, secs in rows:
+        attempts[qi] += 1
+        times[qi].append(secs)
+        if hit:
+            correct_per_q[qi] += 1
+            upper[qi] += pi in upper_set
+            lower[qi] += pi in lower_set
+
+    per_question = [
+        _question_stats(
+            attempts[i], correct_per_q[i], upper[i], lower[i], group,
+            _distribution_python(sorted(times[i])),
+        )
+        for i in range(n_questions)
+    ]
+    total = len(rows)
+    hits = sum(correct_per_q)
+    overall = {
+        "answers": total,
+        "percent_correct": _round(100.0 * hits / total) if total else None,
+        "time_to_answer": _distribution_python(sorted(secs for _, _, _, secs in rows)),
+    }
+    return overall, per_question
+
+
+def _percentile(values, q):
+    """Linear interpolation between closest ranks (NumPy's default)."""
+    position = (len(values) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _histogram(values, bins):
+    low, high = values[0], values[-1]
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    edges = [low + width * i for i in range(bins)] + [high]
+    counts = [0] * bins
+    for value in values:
+        # Right-most bin is closed, like numpy.histogram
+        counts[min(bisect_right(edges, value) - 1, bins - 1)] += 1
+    return edges, counts
+
+
+def _distribution_python(values):
+    """Distribution of already sorted seconds."""
+    if not values:
+        return None
+    edges, counts = _histogram(values, HISTOGRAM_BINS)
+    return {
+        "mean": _round(sum(values) / len(values)),
+        "median": _round(_percentile(values, 50)),
+        "p25": _round(_percentile(values, 25)),
+        "p75": _round(_percentile(values, 75)),
+        "p90": _round(_percentile(values, 90)),
+        "min": _round(values[0]),
+        "max": _round(values[-1]),
+        "histogram": {"edges": [_round(e) for e in edges], "counts": counts},
+    }
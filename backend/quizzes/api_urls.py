@@ -4,7 +4,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     RegisterView, QuizViewSet, QuestionCreateView, QuestionViewSet,  # ADD QuestionViewSet
     SessionCreateView, SessionDetailView, ParticipantJoinView,
-    AnswerCreateView, SessionActionView, SessionScoresView
+    AnswerCreateView, AnswerBatchView, SessionActionView, SessionScoresView,
+    SessionExportView, QuizExportView, MetricsView, SessionAnalyticsView,
+    QuizAnalyticsView,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -18,6 +20,13 @@ urlpatterns = [
     path("auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 
+    # results export (streaming CSV / Parquet)
+    path("quizzes/<uuid:quiz_id>/export/", QuizExportView.as_view(), name="quiz-export"),
+    path("sessions/<int:session_id>/export/", SessionExportView.as_view(), name="session-export"),
+
+    # cross-session quiz analytics (before the router's quizzes/<pk>/ routes)
+    path("quizzes/<uuid:quiz_id>/analytics/", QuizAnalyticsView.as_view(), name="quiz-analytics"),
+
     # quizzes & questions (viewset) - included via router
     path("", include(router.urls)),
 
@@ -31,7 +40,14 @@ urlpatterns = [
 
     # answers (REST fallback)
     path("answers/create/", AnswerCreateView.as_view(), name="answer-create"),
+    path("answers/batch/", AnswerBatchView.as_view(), name="answer-batch"),
 
     # scores
     path("sessions/<int:session_id>/scores/", SessionScoresView.as_view(), name="session-scores"),
+
+    # analytics
+    path("sessions/<int:session_id>/analytics/", SessionAnalyticsView.as_view(), name="session-analytics"),
+
+    # live-path metrics (staff only)
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
\ No newline at end of file
@@ -0,0 +1,264 @@
+# backend/quizzes/archive.py
+"""
+Session finalization.
+
+When a session ends we write one compact `SessionResult` row (leaderboard,
+per-question stats and per-participant answer vectors), add its per-question
+stats to the quiz's running totals (see aggregates.py) and, optionally, move
+the raw Answer rows out of the hot table, either into `ArchivedAnswer` or
+into a gzip-compressed CSV file on local disk.
+"""
+import csv
+import gzip
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .aggregates import apply_session_stats
+from .models import Answer, ArchivedAnswer, Choice, Participant, Session, SessionResult
+
+# Rows moved per round trip when archiving answers
+ARCHIVE_BATCH_SIZE = 2000
+
+ARCHIVE_FILE_COLUMNS = (
+    "participant_id", "question_id", "choice_id", "is_correct", "answered_at", "choice_ids", "value",
+)
+
+
+def finalize_session(session, archive=None, refresh=False):
+    """
+    Write the results snapshot for `session` and optionally archive its answers.
+    `archive` is one of "", "table" or "file"; defaults to
+    settings.CLASSPOINT_ANSWER_ARCHIVE. Safe to call more than once; with
+    `refresh=True` an existing snapshot is rebuilt as long as the answers
+    have not been archived yet (e.g. after a live session actor's final
+    checkpoint landed).
+    """
+    if archive is None:
+        archive = getattr(settings, "CLASSPOINT_ANSWER_ARCHIVE", "")
+
+    result = SessionResult.objects.filter(session=session).first()
+    if result is None or (refresh and not result.answers_archived):
+        with transaction.atomic():
+            # Serialize finalizes of this session (view, actor, sweep) so the
+            # quiz totals see each snapshot exactly once; then re-check
+            Session.objects.select_for_update().filter(pk=session.pk).first()
+            result = SessionResult.objects.filter(session=session).first()
+            if result is None or (refresh and not result.answers_archived):
+                result = _write_result(session, result)
+
+    if archive and not result.answers_archived:
+        with transaction.atomic():
+            # Session actors' checkpoints take this lock too and stop writing
+            # once the answers are archived, so none land mid-move
+            Session.objects.select_for_update().filter(pk=session.pk).first()
+            result.refresh_from_db(fields=["answers_archived"])
+            if not result.answers_archived:
+                archive_answers(result, archive)
+    return result
+
+
+def _write_result(session, previous):
+    fresh = build_session_result(session)
+    if previous is not None:
+        fresh.created_at = previous.created_at
+        if previous.aggregated:
+            # Take the old snapshot back out of the quiz totals first
+            apply_session_stats(session.quiz_id, previous.question_stats, sign=-1)
+    apply_session_stats(session.quiz_id, fresh.question_stats)
+    fresh.aggregated = True
+    fresh.save()
+    return fresh
+
+
+def build_session_result(session):
+    """
+    Build (without saving) the SessionResult for `session` from the live tables.
+    One query each for participants, questions, correct choices and answers.
+    """
+    participants = list(
+        Participant.objects.filter(session=session)
+        .order_by("-score", "joined_at")
+        .values_list("id", "name", "score")
+    )
+    questions = list(
+        session.quiz.questions.order_by("order", "id").values_list("id", "order", "text")
+    )
+    position = {qid: i for i, (qid, _, _) in enumerate(questions)}
+
+    correct_ids = {qid: [] for qid in position}
+    for qid, cid in Choice.objects.filter(
+        question__quiz_id=session.quiz_id, is_correct=True
+    ).values_list("question_id", "id"):
+        correct_ids[qid].append(cid)
+
+    stats = [
+        {
+            "question_id": qid,
+            "order": order,
+            "text": text,
+            "correct_choice_ids": correct_ids[qid],
+            "attempts": 0,
+            "correct": 0,
+            "choice_counts": {},
+            # Seconds from the question's first push to each answer, summed over
+            # the attempts whose question has a recorded open time
+            "timed_attempts": 0,
+            "response_seconds": 0.0,
+        }
+        for qid, order, text in questions
+    ]
+    vectors = {str(pid): [None] * len(questions) for pid, _, _ in participants}
+
+    answer_count = 0
+    opened = {int(qid): parse_datetime(at) for qid, at in (session.question_opened_at or {}).items()}
+    answers = Answer.objects.filter(participant__session=session).values_list(
+        "participant_id", "question_id", "choice_id", "choice_ids", "value", "is_correct", "answered_at"
+    )
+    for pid, qid, cid, cids, value, is_correct, answered_at in answers.iterator(chunk_size=ARCHIVE_BATCH_SIZE):
+        i = position.get(qid)
+        if i is None:
+            # Question was removed from the quiz after it was answered
+            continue
+        answer_count += 1
+        entry = stats[i]
+        entry["attempts"] += 1
+        if is_correct:
+            entry["correct"] += 1
+        # Choices picked (numeric / text answers have none to count)
+        counts = entry["choice_counts"]
+        for key in (cid,) if cid is not None else cids or ():
+            counts[str(key)] = counts.get(str(key), 0) + 1
+        opened_at = opened.get(qid)
+        if opened_at is not None:
+            entry["timed_attempts"] += 1
+            entry["response_seconds"] += max(0.0, (answered_at - opened_at).total_seconds())
+        vector = vectors.get(str(pid))
+        if vector is not None:
+            vector[i] = cid if cid is not None else cids if cids is not None else value
+
+    leaderboard = [
+        {"id": pid, "session": session.id, "name": name, "score": score or 0}
+        for pid, name, score in participants
+    ]
+    return SessionResult(
+        session=session,
+        leaderboard=leaderboard,
+        question_stats=stats,
+        answer_vectors=vectors,
+        participant_count=len(participants),
+        answer_count=answer_count,
+    )
+
+
+def archive_answers(result, mode):
+    """
+    Move the session's Answer rows to cold storage and record where they went.
+    """
+    if mode == SessionResult.ARCHIVE_TABLE:
+        _archive_to_table(result.session)
+        result.answers_archived = SessionResult.ARCHIVE_TABLE
+        result.save(update_fields=["answers_archived"])
+    elif mode == SessionResult.ARCHIVE_FILE:
+        path = _archive_to_file(result.session)
+        result.answers_archived = SessionResult.ARCHIVE_FILE
+        result.archive_path = str(path)
+        result.save(update_fields=["answers_archived", "archive_path"])
+    else:
+        raise ValueError(f"Unknown answer archive mode: {mode!r}")
+
+
+def iter_archived_answers(result):
+    """
+    Yield (participant_id, question_id, choice_id, is_correct, answered_at,
+    choice_ids, value) for a session whose answers were moved out of the hot
+    table. `answered_at` is an ISO string when read back from an archive file.
+    """
+    if result.answers_archived == SessionResult.ARCHIVE_TABLE:
+        yield from (
+            ArchivedAnswer.objects.filter(session_id=result.session_id)
+            .order_by("answered_at")
+            .values_list(
+                "participant_id", "question_id", "choice_id", "is_correct", "answered_at", "choice_ids", "value"
+            )
+            .iterator(chunk_size=ARCHIVE_BATCH_SIZE)
+        )
+    elif result.answers_archived == SessionResult.ARCHIVE_FILE:
+        with gzip.open(result.archive_path, "rt", newline="") as fh:
+            reader = csv.reader(fh)
+            next(reader, None)  # header
+            for row in reader:
+                # Files written before choice_ids / value existed have 5 columns
+                pid, qid, cid, is_correct, answered_at, cids, value = (row + ["", ""])[:7]
+                yield (
+                    int(pid), int(qid), int(cid) if cid else None, is_correct == "1", answered_at,
+                    [int(c) for c in cids.split(";")] if cids else None, value,
+                )
+
+
+def _answer_batches(session):
+    """
+    Yield lists of (id, participant_id, question_id, choice_id, is_correct,
+    answered_at, choice_ids, value) using keyset pagination, so no cursor
+    stays open while we write elsewhere.
+    """
+    qs = Answer.objects.filter(participant__session=session).order_by("id")
+    last_id = 0
+    while True:
+        batch = list(
+            qs.filter(id__gt=last_id).values_list(
+                "id", "participant_id", "question_id", "choice_id", "is_correct", "answered_at",
+                "choice_ids", "value",
+            )[:ARCHIVE_BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1][0]
+
+
+def _archive_to_table(session):
+    with transaction.atomic():
+        for batch in _answer_batches(session):
+            ArchivedAnswer.objects.bulk_create(
+                [
+                    ArchivedAnswer(
+                        session=session,
+                        participant_id=pid,
+                        question_id=qid,
+                        choice_id=cid,
+                        choice_ids=cids,
+                        value=value,
+                        is_correct=is_correct,
+                        answered_at=answered_at,
+                    )
+                    for _, pid, qid, cid, is_correct, answered_at, cids, value in batch
+                ]
+            )
+        Answer.objects.filter(participant__session=session).delete()
+
+
+def _archive_to_file(session):
+    archive_dir = Path(getattr(settings, "CLASSPOINT_ARCHIVE_DIR", settings.BASE_DIR / "archive"))
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"session_{session.id}.csv.gz"
+    tmp_path = path.with_suffix(".tmp")
+
+    with gzip.open(tmp_path, "wt", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(ARCHIVE_FILE_COLUMNS)
+        for batch in _answer_batches(session):
+            writer.writerows(
+                (
+                    pid, qid, cid, int(is_correct), answered_at.isoformat(),
+                    ";".join(map(str, cids)) if cids is not None else "", value,
+                )
+                for _, pid, qid, cid, is_correct, answered_at, cids, value in batch
+            )
+    # Only drop the hot rows once the file is completely on disk
+    os.replace(tmp_path, path)
+    Answer.objects.filter(participant__session=session).delete()
+    return path
@@ -0,0 +1,187 @@
+# backend/quizzes/bulk.py
+"""
+Bulk quiz import / export.
+
+A quiz document is the whole quiz in one payload:
+
+    {
+      "title": "Fractions",
+      "description": "",
+      "questions": [
+        {"text": "1/2 + 1/4 = ?", "time_limit": 30,
+         "choices": [{"text": "3/4", "is_correct": true}, {"text": "2/6"}]},
+        {"text": "3 x 0.5 = ?", "question_type": "numeric",
+         "correct_value": 1.5, "tolerance": 0}
+      ]
+    }
+
+Questions default to "single"; "numeric" questions carry `correct_value` and
+`tolerance`, "text" questions `accepted_answers`.
+
+The CSV variant has one row per (choice) question:
+
+    question,time_limit,correct,choice_1,choice_2,...
+    "1/2 + 1/4 = ?",30,1,3/4,2/6
+
+`correct` holds the 1-based position(s) of the correct choice(s), separated
+by ";". Imports write the quiz, all questions and all choices with
+`bulk_create` inside a single transaction (three INSERT statements for a
+typical bank instead of one per row).
+"""
+import csv
+import io
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Choice, Question, Quiz
+from .serializers import validate_answer_key
+
+CSV_FIXED_COLUMNS = ("question", "time_limit", "correct")
+
+# Rows per INSERT statement
+BULK_BATCH_SIZE = 1000
+
+
+class ChoiceDocumentSerializer(serializers.Serializer):
+    text = serializers.CharField(max_length=255)
+    is_correct = serializers.BooleanField(default=False)
+
+
+class QuestionDocumentSerializer(serializers.Serializer):
+    text = serializers.CharField(max_length=500)
+    time_limit = serializers.IntegerField(min_value=1, default=30)
+    order = serializers.IntegerField(min_value=0, required=False)
+    question_type = serializers.ChoiceField(choices=Question.TYPE_CHOICES, default=Question.SINGLE)
+    correct_value = serializers.FloatField(allow_null=True, default=None)
+    tolerance = serializers.FloatField(min_value=0, default=0)
+    accepted_answers = serializers.ListField(child=serializers.CharField(max_length=255), default=list)
+    choices = ChoiceDocumentSerializer(many=True, default=list)
+
+    def validate(self, attrs):
+        validate_answer_key(attrs["question_type"], attrs["correct_value"], attrs["accepted_answers"])
+        return attrs
+
+
+class QuizDocumentSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True, default="")
+    questions = QuestionDocumentSerializer(many=True)
+
+
+def parse_quiz_csv(text, title):
+    """
+    Turn the CSV variant into a quiz document dict (validated later by
+    QuizDocumentSerializer).
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None)
+    if not header or tuple(h.strip().lower() for h in header[:3]) != CSV_FIXED_COLUMNS:
+        raise serializers.ValidationError(
+            {"file": f"CSV must start with columns: {', '.join(CSV_FIXED_COLUMNS)}"}
+        )
+
+    questions = []
+    for line_no, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        row = row + [""] * (3 - len(row))
+        text, time_limit, correct = (cell.strip() for cell in row[:3])
+        choice_texts = [cell.strip() for cell in row[3:] if cell.strip()]
+        try:
+            correct_positions = {int(p) for p in correct.split(";") if p.strip()}
+        except ValueError:
+            raise serializers.ValidationError(
+                {"file": f"Line {line_no}: 'correct' must be choice positions like 1 or 1;3"}
+            )
+        questions.append({
+            "text": text,
+            "time_limit": time_limit or 30,
+            "choices": [
+                {"text": choice, "is_correct": i in correct_positions}
+                for i, choice in enumerate(choice_texts, start=1)
+            ],
+        })
+    return {"title": title, "questions": questions}
+
+
+def import_quiz_document(document, user):
+    """
+    Create a quiz from a validated quiz document in one transaction.
+    Returns the new Quiz.
+    """
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            title=document["title"],
+            description=document.get("description", ""),
+            created_by=user,
+        )
+        questions = Question.objects.bulk_create(
+            [
+                Question(
+                    quiz=quiz,
+                    text=q["text"],
+                    time_limit=q["time_limit"],
+                    order=q.get("order", position),
+                    question_type=q.get("question_type", Question.SINGLE),
+                    correct_value=q.get("correct_value"),
+                    tolerance=q.get("tolerance", 0),
+                    accepted_answers=q.get("accepted_answers", []),
+                )
+                for position, q in enumerate(document["questions"])
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question=question, text=c["text"], is_correct=c["is_correct"])
+                for question, q in zip(questions, document["questions"])
+                for c in q["choices"]
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+    return quiz
+
+
+def export_quiz_document(quiz):
+    """
+    Return the quiz as a document dict (same shape the importer accepts).
+    Two queries: questions, then all their choices.
+    """
+    questions = quiz.questions.order_by("order", "id").prefetch_related("choices")
+    return {
+        "title": quiz.title,
+        "description": quiz.description,
+        "questions": [
+            {
+                "text": q.text,
+                "time_limit": q.time_limit,
+                "order": q.order,
+                "question_type": q.question_type,
+                "correct_value": q.correct_value,
+                "tolerance": q.tolerance,
+                "accepted_answers": q.accepted_answers,
+                "choices": [
+                    {"text": c.text, "is_correct": c.is_correct}
+                    for c in sorted(q.choices.all(), key=lambda c: c.id)
+                ],
+            }
+            for q in questions
+        ],
+    }
+
+
+def export_quiz_csv(quiz):
+    """Return the quiz in the CSV variant as a string."""
+    document = export_quiz_document(quiz)
+    width = max((len(q["choices"]) for q in document["questions"]), default=0)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(list(CSV_FIXED_COLUMNS) + [f"choice_{i}" for i in range(1, width + 1)])
+    for q in document["questions"]:
+        correct = ";".join(
+            str(i) for i, c in enumerate(q["choices"], start=1) if c["is_correct"]
+        )
+        writer.writerow([q["text"], q["time_limit"], correct] + [c["text"] for c in q["choices"]])
+    return buf.getvalue()
@@ -0,0 +1,95 @@
+# backend/quizzes/caching.py
+"""
+Conditional GETs and rendered-response caching for quiz content.
+
+Every Quiz carries a `content_version` that is bumped (together with
+`updated_at`) whenever the quiz, one of its questions or one of its choices
+changes. Views build their ETag from that version with one cheap query, answer
+304 when the client already has it, and otherwise serve the serialized payload
+from the cache under a version-keyed entry, so stale entries are never read
+and simply age out.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .models import Quiz
+
+
+def content_cache_timeout():
+    return getattr(settings, "CLASSPOINT_CONTENT_CACHE_TIMEOUT", 3600)
+
+
+def session_content_key(session_id, content_version, ended_at):
+    """Version part of a session payload's ETag and cache key."""
+    state = int(ended_at.timestamp()) if ended_at else "live"
+    return f"{session_id}-v{content_version}-{state}"
+
+
+def bump_content_version(quiz_id):
+    """
+    Mark a quiz's content as changed. Call after any write to the quiz, its
+    questions or its choices (including bulk operations, which skip save()).
+    """
+    Quiz.objects.filter(pk=quiz_id).update(
+        content_version=F("content_version") + 1, updated_at=timezone.now()
+    )
+
+
+class ConditionalContentMixin:
+    """
+    Adds ETag / Last-Modified handling and a version-keyed cache of
+    serialized data to a DRF view.
+
+    `get_content_validators()` returns `(etag, last_modified, cache_key)` from
+    a cheap query, or None to fall back to the normal, uncached path (e.g. so
+    a missing object still 404s). By default it reads `content_fields` (the
+    quiz's content version and updated_at, as lookups from the view's model)
+    of the object the URL names, within `get_queryset()`; views override it
+    for lists or for extra state.
+    """
+
+    content_fields = ("content_version", "updated_at")
+
+    def get_content_validators(self):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = self.get_queryset()
+        try:
+            row = queryset.filter(**{self.lookup_field: pk}).values_list(*self.content_fields).first()
+        except (ValidationError, ValueError):
+            return None
+        if row is None:
+            return None
+        version, updated_at = row
+        name = queryset.model._meta.model_name
+        return f"{name}-{pk}-v{version}", updated_at, f"content:{name}:{pk}:v{version}"
+
+    def cached_content_response(self, render):
+        """
+        `render` is a zero-argument callable returning the serialized data;
+        it only runs on a cache miss.
+        """
+        validators = self.get_content_validators()
+        if validators is None:
+            return None
+        etag, last_modified, cache_key = validators
+        etag = quote_etag(etag)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if response is None:
+            data = cache.get(cache_key)
+            if data is None:
+                data = render()
+                cache.set(cache_key, data, content_cache_timeout())
+            response = Response(data)
+
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
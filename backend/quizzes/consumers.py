@@ -1,12 +1,54 @@
 # backend/quizzes/consumers.py
+import asyncio
 import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from .models import Quiz, Question, Choice, Session, Participant, Answer
+from .actors import acquire_actor, actors_enabled, answer_event, release_actor
+from .grading import GradeResult, bound_participant_context, grade_answer
+from . import idempotency, latency, prefetch
+from .outbound import OutboundQueue
+from .prefetch import prefetch_enabled
+from .presence import acquire_presence, merge_workers, presence_store, release_presence
+from .scoreboard import build_scoreboard as build_session_scoreboard, host_group_name
+from .throttling import ABUSE_CLOSE_CODE, HOST_ONLY_ACTIONS, SocketThrottle
+from .wordcloud import acquire_wordcloud, release_wordcloud
 
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def student_question_payload(q):
+    """What students see of a question: no correctness information."""
+    # Use the correct related name here
+    choices = list(q.choices.all().values("id", "text"))
+
+    return {
+        "id": q.id,
+        "text": q.text,
+        "question_type": q.question_type,
+        "choices": choices,
+        "time_limit": getattr(q, "time_limit", None),
+    }
+
+
+@dataclass(frozen=True)
+class SocketIdentity:
+    """Who a socket is, verified once at join / host_join."""
+    role: str                  # "student" or "host"
+    session_id: int
+    participant_id: Optional[int] = None
+    name: str = ""
 
 
 class SessionConsumer(AsyncWebsocketConsumer):
@@ -16,7 +58,6 @@ class SessionConsumer(AsyncWebsocketConsumer):
     """
 
     async def connect(self):
-        from .models import Session, Participant, Answer, Choice, Question
         self.pin = self.scope["url_route"]["kwargs"].get("pin")
         if not self.pin:
             await self.close(code=4001)
@@ -26,9 +67,24 @@ class SessionConsumer(AsyncWebsocketConsumer):
 
         # Optionally get the user (if using Django auth or middleware that sets scope['user'])
         self.user = self.scope.get("user", None)
+        # Bound by a successful join / host_join; later actions are checked against it
+        self.identity = None
+        self.throttle = SocketThrottle()
+        # Live session state for this PIN is owned by a per-worker actor
+        self.actor = await acquire_actor(self.pin) if actors_enabled() else None
+        # Connected / answered counts for the host
+        self.presence = acquire_presence(self.pin)
+        # Host sockets: connected participants per worker (see presence.merge_workers)
+        self.presence_workers = {}
+        # Top terms of word cloud questions for the host
+        self.wordcloud = acquire_wordcloud(self.pin)
+        # Question ids whose payload this socket already received ahead of time
+        self.prefetched = set()
         # Accept connection and add to group
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        # Bounded per-socket send queue; handlers enqueue, a writer task sends
+        self.outbound = OutboundQueue(self.send, self.close)
 
         # Optionally send current session state (e.g., scoreboard or current question)
         await self.send_current_state()
@@ -37,28 +93,59 @@ class SessionConsumer(AsyncWebsocketConsumer):
         # Remove from group
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if getattr(self, "identity", None) is not None and self.identity.role == "host":
+            await self.channel_layer.group_discard(host_group_name(self.pin), self.channel_name)
+        if getattr(self, "outbound", None) is not None:
+            self.outbound.stop()
+        if getattr(self, "presence", None) is not None:
+            self.presence.remove(self.channel_name)
+            release_presence(self.presence)
+            self.presence = None
+        if getattr(self, "wordcloud", None) is not None:
+            self.wordcloud.unsubscribe(self.channel_name)
+            release_wordcloud(self.wordcloud)
+            self.wordcloud = None
+        if getattr(self, "actor", None) is not None:
+            release_actor(self.actor)
+            self.actor = None
 
     async def receive(self, text_data=None, bytes_data=None):
         """
         Expected incoming JSON messages with at least { "action": "<str>", ... }
         Actions handled:
           - "ping" (echo)
+          - "probe_ack" { seq }  # reply to the outbound queue's "probe" frames
           - "join" { participant_id }  # NEW: student join action
           - "host_join" { token, session_pin }  
-          - "answer" { participant_id, choice_id }
+          - "answer" { participant_id, choice_id } or, for multi-select,
+            numeric and text questions, { question_id, choice_ids | value };
+            acknowledged with an "answer_ack" frame carrying server
+            timestamps, followed by "answer_persisted" when a session actor
+            saves it later (see process_answer). With a client-generated
+            "msg_id", resends of the answer get the same reply
           - "host_push_question" { question_id }  # host only
         """
         if text_data is None:
             return
+        received = time.perf_counter()
 
         try:
             data = json.loads(text_data)
         except json.JSONDecodeError:
-            await self.send_json({"error": "invalid_json"})
+            if await self.check_allowed(None):
+                await self.send_json({"error": "invalid_json"})
             return
+        if not isinstance(data, dict):
+            data = {}
 
         action = data.get("action")
-        
+        # Anything a socket sends shows it is alive; "ping" and "probe_ack"
+        # are the heartbeats
+        self.presence.seen(self.channel_name)
+        # Rate limits and role checks happen before any DB work
+        if not await self.check_allowed(action):
+            return
+
         # NEW: Handle student join action
         if action == "join":
             participant_id = data.get("participant_id")
@@ -66,9 +153,21 @@ class SessionConsumer(AsyncWebsocketConsumer):
                 await self.send_json({"error": "missing_participant_id"})
                 return
 
+            if self.identity is not None and self.identity.role == "host":
+                await self.send_json({"error": "join_failed", "detail": "Socket is bound to the host"})
+                return
+
             # Validate participant exists and belongs to this session
-            is_valid_participant = await self.validate_participant_join(participant_id, self.pin)
-            if is_valid_participant:
+            if self.actor is not None:
+                name = await self.actor.join(participant_id)
+                identity = name is not None and SocketIdentity(
+                    "student", self.actor.session_id, int(participant_id), name
+                )
+            else:
+                identity = await self.validate_participant_join(participant_id, self.pin)
+            if identity:
+                self.identity = identity
+                self.presence.add(self.channel_name, identity.participant_id)
                 await self.send_json({"type": "join_success"})
                 print(f"✅ Student participant {participant_id} joined session {self.pin}")
             else:
@@ -83,9 +182,21 @@ class SessionConsumer(AsyncWebsocketConsumer):
                 return
 
             # Validate host token and session ownership
-            is_valid_host = await self.validate_host_join(token, session_pin)
-            if is_valid_host:
+            # The token must own the session this socket is connected to
+            identity = str(session_pin) == self.pin and await self.validate_host_join(token, session_pin)
+            if identity:
+                self.identity = identity
+                # Presence frames ("N connected / M answered") go to hosts only
+                await self.channel_layer.group_add(host_group_name(self.pin), self.channel_name)
                 await self.send_json({"type": "host_join_success"})
+                await self.presence_update(await self.presence.counts())
+                if presence_store() is None:
+                    # Other workers report their connected students right away
+                    await self.channel_layer.group_send(self.group_name, {"type": "presence.refresh"})
+                await self.latency_update(
+                    {"worker": latency.WORKER_ID, "stages": latency.session_summary(self.pin)}
+                )
+                self.wordcloud.subscribe(self.channel_name, self.send_wordcloud)
                 print(f"✅ Host successfully joined session {session_pin}")
             else:
                 await self.send_json({"error": "host_join_failed", "detail": "Invalid token or session ownership"})
@@ -95,28 +206,44 @@ class SessionConsumer(AsyncWebsocketConsumer):
             await self.send_json({"action": "pong"})
             return
 
+        if action == "probe_ack":
+            self.outbound.ack(data.get("seq"))
+            return
+
         if action == "answer":
-            participant_id = data.get("participant_id")
-            choice_id = data.get("choice_id")
-            if participant_id is None or choice_id is None:
+            response = {
+                field: data.get(field) for field in ("choice_id", "question_id", "choice_ids", "value")
+            }
+            if response["choice_id"] is None and response["question_id"] is None:
                 await self.send_json({"error": "missing_fields"})
                 return
-
-            # Save the answer and update scores (DB ops run in sync wrappers)
-            saved = await self.save_answer_and_update_score(participant_id, choice_id)
-            if not saved:
-                await self.send_json({"error": "save_failed"})
+            # Answers are always recorded for the participant bound at join
+            if self.identity is None or self.identity.role != "student":
+                await self.send_json({"error": "not_joined"})
+                return
+            participant_id = self.identity.participant_id
+            claimed = data.get("participant_id")
+            if claimed is not None and str(claimed) != str(participant_id):
+                await self.send_json({"error": "participant_mismatch"})
                 return
 
-            # Broadcast updated scoreboard to the session group
-            scoreboard = await self.build_scoreboard(self.pin)
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "score.update",  # maps to method score_update
-                    "scoreboard": scoreboard,
-                },
-            )
+            msg_id = data.get("msg_id")
+            if msg_id is None:
+                await self.send_json(await self.process_answer(participant_id, response, received))
+                return
+            # A resend (e.g. after a reconnect) gets the original reply, without regrading
+            msg_id = str(msg_id)[:idempotency.MAX_MSG_ID_LENGTH]
+            replayed = await idempotency.begin(self.pin, participant_id, msg_id)
+            if replayed is not None:
+                await self.send_json({**replayed, "duplicate": True})
+                return
+            try:
+                frame = await self.process_answer(participant_id, response, received, msg_id)
+            except BaseException:
+                idempotency.abandon(self.pin, participant_id, msg_id)
+                raise
+            idempotency.finish(self.pin, participant_id, msg_id, frame)
+            await self.send_json(frame)
             return
 
         if action == "host_push_question":
@@ -125,79 +252,339 @@ class SessionConsumer(AsyncWebsocketConsumer):
             if question_id is None:
                 await self.send_json({"error": "missing_question_id"})
                 return
-
-            # Optionally authorize host here (e.g., check self.user is session owner)
-            question_payload = await self.get_question_payload(question_id)
+            opened_at = timezone.now()
+
+            origin = getattr(self.actor, "actor_id", None)
+            prefetched = None
+            if prefetch_enabled():
+                try:
+                    prefetched = prefetch.lookup(self.pin, int(question_id))
+                except (TypeError, ValueError):
+                    pass
+            if prefetched is not None:
+                # Clients already hold the payload: activating it is a tiny frame.
+                # The actor's push re-reads the quiz's scoring, so it is queued
+                # (ahead of any answer to the question) but awaited only after
+                # the frame went out
+                pushed = self.actor and asyncio.ensure_future(self.actor.push_question(prefetched))
+                await self.channel_layer.group_send(
+                    self.group_name,
+                    {"type": "question.activate", "question_id": prefetched["id"], "origin": origin},
+                )
+                if pushed:
+                    await pushed
+
+            # Off the critical path when prefetched: only re-sent if edited since
+            question_payload = await self.get_question_payload(question_id, self.identity.session_id)
             if question_payload is None:
-                await self.send_json({"error": "question_not_found"})
+                if prefetched is None:
+                    await self.send_json({"error": "question_not_found"})
                 return
-
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "question.push",  # maps to question_push
-                    "question": question_payload,
-                },
-            )
+            if question_payload != prefetched:
+                if self.actor is not None:
+                    # Opens the question and starts its timer
+                    await self.actor.push_question(question_payload)
+
+                await self.channel_layer.group_send(
+                    self.group_name,
+                    {
+                        "type": "question.push",  # maps to question_push
+                        "question": question_payload,
+                        "origin": origin,
+                    },
+                )
+
+            # Off the critical path: response times in the results count from here
+            await self.record_question_opened(self.identity.session_id, question_payload["id"], opened_at)
+
+            if prefetch_enabled():
+                next_payload = await self.get_next_question_payload(question_payload["id"])
+                if next_payload is not None:
+                    prefetch.remember(self.pin, next_payload)
+                    await self.channel_layer.group_send(
+                        self.group_name,
+                        {"type": "question.prefetch", "question": next_payload},
+                    )
             return
 
         # Unknown action
         await self.send_json({"error": "unknown_action", "action": action})
 
+    async def process_answer(self, participant_id, response, received, msg_id=None):
+        """
+        Grade an answer of the participant bound to this socket and broadcast
+        the new scoreboard. Returns the reply frame: the error frame when the
+        answer was refused, else an "answer_ack" with the server's
+        `received_at`, `graded_at` and `persisted_at` (Unix epoch ms).
+        `received` is the time.perf_counter() reading when the message
+        arrived; `msg_id`, if any, is echoed. Stage timings go to latency.py.
+
+        A session actor writes the answer with its next checkpoint, so its ack
+        has persisted_at null and an "answer_persisted" frame with the
+        checkpoint's time follows (see answer_persisted).
+        """
+        if self.actor is not None:
+            # Graded in memory; persisted by the actor's next checkpoint
+            result = await self.actor.submit_answer(participant_id, **response)
+        else:
+            # Save the answer and update scores (DB ops run in sync wrappers)
+            result = await self.save_answer_and_update_score(
+                participant_id, response, self.identity.session_id
+            )
+        graded = time.perf_counter()
+        started = result.started_at if result.started_at is not None else received
+        echo = {"msg_id": msg_id} if msg_id is not None else {}
+        if not result.ok:
+            latency.record(self.pin, queue=started - received, grade=graded - started)
+            return {"error": "save_failed", "detail": result.error, **echo}
+
+        # Broadcast the answer, and the updated scoreboard if a score moved
+        # (word cloud answers and unchanged re-answers leave it as it was)
+        message = {
+            "type": "score.update",  # maps to method score_update
+            "answers": [answer_event(result, origin=getattr(self.actor, "actor_id", None))],
+        }
+        if not result.score_delta:
+            message["scores_changed"] = False
+        elif self.actor is not None:
+            message["scoreboard"] = self.actor.scoreboard()
+        else:
+            message["scoreboard"] = await database_sync_to_async(build_session_scoreboard)(result.session_id)
+        await self.channel_layer.group_send(self.group_name, message)
+        done = time.perf_counter()
+        latency.record(
+            self.pin, queue=started - received, grade=graded - started,
+            broadcast=done - graded, total=done - received,
+        )
+        graded_at = latency.epoch_ms(graded)
+        ack = {
+            "type": "answer_ack",
+            "question_id": result.question_id,
+            "received_at": latency.epoch_ms(received),
+            "graded_at": graded_at,
+            # The database path commits while grading
+            "persisted_at": graded_at if self.actor is None else None,
+            **echo,
+        }
+        if result.persisted is not None:
+            result.persisted.add_done_callback(lambda persisted: self.answer_persisted(ack, persisted))
+        return ack
+
+    def answer_persisted(self, ack, persisted):
+        """
+        The actor's checkpoint saved an acked answer: tell the client, and
+        fill in `persisted_at` of the ack kept for resends of its msg_id.
+        """
+        if persisted.cancelled() or persisted.result() is None:
+            return
+        ack["persisted_at"] = latency.epoch_ms(persisted.result())
+        frame = {"type": "answer_persisted", "question_id": ack["question_id"], "persisted_at": ack["persisted_at"]}
+        if "msg_id" in ack:
+            frame["msg_id"] = ack["msg_id"]
+        self.outbound.put(json.dumps(frame))
+
     # ------- Group message handlers (called by group_send) -------
 
     async def score_update(self, event):
         """
-        Handler invoked when group_send sends type 'score.update'
+        Handler invoked when group_send sends type 'score.update'.
+        Answers graded elsewhere (other worker, REST fallback) are folded into
+        this worker's actor; a missing scoreboard means "use the actor's".
+        With `scores_changed` false no scoreboard is sent at all.
         """
-        scoreboard = event.get("scoreboard", [])
-        await self.send_json({"type": "score_update", "scoreboard": scoreboard})
+        for answer in event.get("answers", ()):
+            self.presence.answer_seen(answer)
+            self.wordcloud.answer_seen(answer)
+            if self.actor is not None:
+                self.actor.observe_answer(answer)
+        if not event.get("scores_changed", True):
+            return
+        scoreboard = event.get("scoreboard")
+        if scoreboard is None:
+            if self.actor is not None:
+                await self.actor.sync()
+                scoreboard = self.actor.scoreboard()
+            else:
+                scoreboard = await self.build_scoreboard(self.pin)
+        # Only the newest scoreboard matters to a lagging client
+        await self.send_json({"type": "score_update", "scoreboard": scoreboard}, coalesce_key="scoreboard")
 
     async def question_push(self, event):
         """
         Handler invoked when host pushes a question
         """
         question = event.get("question")
+        if question:
+            self.presence.question_opened(question["id"])
+            self.wordcloud.question_opened(question["id"], question.get("question_type"))
+        if self.actor is not None and question:
+            self.actor.observe_question(question["id"], event.get("origin"))
+        await self.send_json({"type": "question", "question": question})
+
+    async def question_prefetch(self, event):
+        """
+        Handler for the next question's payload, sent ahead as inactive
+        """
+        question = event.get("question")
+        prefetch.remember(self.pin, question)
+        self.prefetched.add(question["id"])
+        await self.send_json({"type": "question_prefetch", "question": question})
+
+    async def question_activate(self, event):
+        """
+        Handler for activating a prefetched question. Sockets that missed the
+        prefetch (connected later) get the full question frame instead.
+        """
+        question_id = event.get("question_id")
+        self.presence.question_opened(question_id)
+        question = prefetch.lookup(self.pin, question_id)
+        self.wordcloud.question_opened(question_id, question and question.get("question_type"))
+        if self.actor is not None:
+            self.actor.observe_question(question_id, event.get("origin"))
+        if question_id in self.prefetched:
+            await self.send_json({"type": "question_activate", "question_id": question_id})
+            return
+        if question is None:
+            question = await self.get_question_payload(question_id, pin=self.pin)
         await self.send_json({"type": "question", "question": question})
 
+    async def question_closed(self, event):
+        """
+        Handler invoked when a question's timer runs out
+        """
+        await self.send_json({"type": "question_closed", "question_id": event.get("question_id")})
+
+    async def presence_update(self, event):
+        """
+        Handler for throttled presence counts (host sockets only). Without a
+        shared presence store each worker reports its own students, and the
+        counts are merged here.
+        """
+        connected = event.get("connected", 0)
+        if "worker" in event:
+            connected = merge_workers(self.presence_workers, event)
+        await self.send_json(
+            {
+                "type": "presence",
+                "connected": connected,
+                "answered": event.get("answered", 0),
+                "question_id": event.get("question_id"),
+            },
+            coalesce_key="presence",
+        )
+
+    async def presence_refresh(self, event):
+        """
+        A host joined: have this worker send its presence counts soon
+        (coalesced into one frame per worker)
+        """
+        self.presence.changed()
+
+    async def latency_update(self, event):
+        """
+        Handler for a worker's answer latency breakdown of this session
+        (host sockets only; one frame per worker, see latency.py)
+        """
+        await self.send_json(
+            {"type": "latency", "worker": event.get("worker"), "stages": event.get("stages", {})},
+            coalesce_key=f"latency:{event.get('worker')}",
+        )
+
+    async def send_wordcloud(self, frame):
+        """
+        Top terms of the open word cloud question (host sockets only; sent
+        by this worker's SessionWordCloud, not through the channel layer)
+        """
+        await self.send_json(frame, coalesce_key="wordcloud")
+
+    async def session_end(self, event):
+        """
+        Handler invoked when the teacher ends the session (REST end action).
+        The actor does its final checkpoint and refreshes the results snapshot.
+        """
+        if self.actor is not None:
+            await self.actor.end()
+        prefetch.forget(self.pin)
+        idempotency.forget(self.pin)
+        await self.send_json({"type": "end"})
+
     # ------- Utility helpers -------
 
+    async def check_allowed(self, action):
+        """
+        Apply the socket's rate limits (per socket and per participant) and
+        role checks. Sends the error frame itself and returns False when the
+        message must be dropped; persistent flooders are disconnected.
+        """
+        # Only the participant bound at join draws from a participant bucket:
+        # a claimed participant_id would let anyone drain someone else's
+        participant_id = None
+        if action in ("join", "answer") and self.identity is not None and self.identity.role == "student":
+            participant_id = self.identity.participant_id
+        retry_after = await self.throttle.check(action, participant_id)
+        if retry_after is not None:
+            if self.throttle.abusive:
+                logger.warning("Closing flooding socket on session %s", self.pin)
+                await self.close(code=ABUSE_CLOSE_CODE)
+            else:
+                await self.send_json({"error": "rate_limited", "action": action, "retry_after": round(retry_after, 2)})
+            return False
+        if action in HOST_ONLY_ACTIONS and (self.identity is None or self.identity.role != "host"):
+            await self.send_json({"error": "forbidden", "action": action})
+            return False
+        return True
+
     async def send_current_state(self):
         """
         Optionally send the current session state to newly connected clients.
         For now, send the current scoreboard.
         """
         try:
-            scoreboard = await self.build_scoreboard(self.pin)
-            await self.send_json({"type": "score_update", "scoreboard": scoreboard})
+            if self.actor is not None:
+                scoreboard = self.actor.scoreboard()
+            else:
+                scoreboard = await self.build_scoreboard(self.pin)
+            await self.send_json({"type": "score_update", "scoreboard": scoreboard}, coalesce_key="scoreboard")
         except Exception:
             # Ignore errors on initial state send
             pass
 
-    async def send_json(self, payload):
-        """Helper to send JSON over the socket"""
-        await self.send(text_data=json.dumps(payload))
+    async def send_json(self, payload, coalesce_key=None):
+        """
+        Helper to send JSON over the socket (through the outbound queue).
+        Frames with a `coalesce_key` may be merged or dropped for slow clients.
+        """
+        outbound = getattr(self, "outbound", None)
+        if outbound is None:
+            await self.send(text_data=json.dumps(payload))
+        else:
+            outbound.put(json.dumps(payload), coalesce_key=coalesce_key)
 
     # NEW: Student join validation method
     @database_sync_to_async
     def validate_participant_join(self, participant_id, session_pin):
         """
         Validate that the participant exists and belongs to this session.
+        Returns the SocketIdentity to bind, or None.
         """
         try:
-            participant = Participant.objects.get(id=participant_id)
-            # Verify participant belongs to the session with this PIN
-            if participant.session.pin == session_pin:
-                return True
-            return False
-        except (Participant.DoesNotExist, Session.DoesNotExist):
-            return False
+            row = (
+                Participant.objects.filter(id=participant_id, session__pin=session_pin)
+                .values_list("session_id", "name")
+                .first()
+            )
+        except (TypeError, ValueError):
+            return None
+        if row is None:
+            return None
+        return SocketIdentity("student", row[0], int(participant_id), row[1])
 
     # NEW: Host join validation method
     @database_sync_to_async
     def validate_host_join(self, token, session_pin):
         """
         Validate that the token belongs to the user who owns this session.
+        Returns the SocketIdentity to bind, or None.
         """
         try:
             from rest_framework_simplejwt.tokens import AccessToken
@@ -207,122 +594,85 @@ class SessionConsumer(AsyncWebsocketConsumer):
             user = User.objects.get(id=user_id)
             
             # Verify user owns the session
-            session = Session.objects.get(pin=session_pin)
-            if session.quiz.created_by == user:
-                return True
-            return False
+            session = Session.objects.select_related("quiz").get(pin=session_pin)
+            if session.quiz.created_by_id == user.id:
+                return SocketIdentity("host", session.id, name=user.get_username())
+            return None
         except Exception as e:
             print(f"❌ Host join validation error: {e}")
-            return False
+            return None
 
     # DB operations must use database_sync_to_async wrappers
 
     @database_sync_to_async
-    def save_answer_and_update_score(self, participant_id, choice_id):
+    def save_answer_and_update_score(self, participant_id, response, session_id):
         """
-        Saves an Answer row and updates the Participant.score based on correctness.
-        Returns True if saved, False otherwise.
+        Grade and store the answer via the shared grading core, for the
+        participant bound to this socket (no Participant lookup needed).
+        `response` holds grade_answer's choice_id / question_id / choice_ids /
+        value. Returns the GradeResult (check `.ok`).
         """
-        try:
-            # Convert to integers
-            participant_id = int(participant_id)
-            choice_id = int(choice_id)
-            
-            participant = Participant.objects.get(pk=participant_id)
-            choice = Choice.objects.select_related("question").get(pk=choice_id)
-
-            print(f"🔍 Processing answer: {participant.name} -> {choice.text} (correct: {choice.is_correct})")
-
-            # Use get_or_create to handle unique constraint - FIXED FIELD NAMES
-            answer, created = Answer.objects.get_or_create(
-                participant=participant,
-                question=choice.question,
-                defaults={
-                    'choice': choice,
-                    'is_correct': choice.is_correct  # CHANGED: 'correct' → 'is_correct'
-                }
-            )
-
-            if not created:
-                # Answer already exists - update it
-                print(f"🔄 Updating existing answer")
-                old_correct = answer.is_correct  # CHANGED: answer.correct → answer.is_correct
-                answer.choice = choice
-                answer.is_correct = choice.is_correct  # CHANGED
-                answer.save()
-
-                # Update score if correctness changed
-                if choice.is_correct and not old_correct:
-                    # Changed from wrong to correct
-                    participant.score = (participant.score or 0) + 1
-                    participant.save(update_fields=["score"])
-                    print(f"📈 Score increased: {participant.name} now has {participant.score}")
-                elif not choice.is_correct and old_correct:
-                    # Changed from correct to wrong
-                    participant.score = max(0, (participant.score or 0) - 1)
-                    participant.save(update_fields=["score"])
-                    print(f"📉 Score decreased: {participant.name} now has {participant.score}")
-            else:
-                # New answer
-                print(f"✅ Created new answer")
-                if choice.is_correct:
-                    participant.score = (participant.score or 0) + 1
-                    participant.save(update_fields=["score"])
-                    print(f"📈 Score increased: {participant.name} now has {participant.score}")
-
-            return True
+        started = time.perf_counter()
+        context = bound_participant_context(participant_id, session_id)
+        if context is None:
+            return GradeResult(participant_id=participant_id, error="participant_not_found")
+        result = grade_answer(participant_id, context=context, **response)
+        result.started_at = started
+        if not result.ok:
+            logger.info("Answer rejected (%s): participant %s, response %r", result.error, participant_id, response)
+        return result
 
-        except Participant.DoesNotExist:
-            print(f"❌ Participant {participant_id} not found")
-            return False
-        except Choice.DoesNotExist:
-            print(f"❌ Choice {choice_id} not found")
-            return False
-        except Exception as e:
-            print(f"❌ Unexpected error: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-        
     @database_sync_to_async
     def build_scoreboard(self, pin):
         """
         Build a list of participants and their scores for the session identified by pin.
         Returns a list of dicts sorted by score descending.
         """
-        try:
-            session = Session.objects.get(pin=pin)
-        except Session.DoesNotExist:
+        session_id = Session.objects.filter(pin=pin).values_list("id", flat=True).first()
+        if session_id is None:
             return []
-
-        participants = Participant.objects.filter(session=session).order_by("-score", "joined_at")
-        # produce serializable scoreboard
-        board = [
-            {
-                "participant_id": p.id,
-                "name": p.name if hasattr(p, "name") else getattr(p.user, "username", "anonymous"),
-                "score": p.score or 0,
-            }
-            for p in participants
-        ]
-        return board
+        return build_session_scoreboard(session_id)
 
     @database_sync_to_async
-    def get_question_payload(self, question_id):
+    def get_next_question_payload(self, question_id):
         """
-        Return a serializable question payload with choices.
+        Payload of the question after `question_id` in its quiz (by order),
+        or None for the last one.
         """
-        try:
-            q = Question.objects.get(pk=question_id)
-        except Question.DoesNotExist:
+        current = Question.objects.filter(pk=question_id).values("quiz_id", "order").first()
+        if current is None:
             return None
+        nxt = (
+            Question.objects.filter(quiz_id=current["quiz_id"])
+            .filter(Q(order__gt=current["order"]) | Q(order=current["order"], id__gt=question_id))
+            .order_by("order", "id")
+            .first()
+        )
+        if nxt is None:
+            return None
+        return student_question_payload(nxt)
 
-        # Use the correct related name here
-        choices = list(q.choices.all().values("id", "text"))
+    @database_sync_to_async
+    def record_question_opened(self, session_id, question_id, opened_at):
+        """
+        Remember when the host first pushed a question in this session
+        (Session.question_opened_at); pushing it again keeps the first time.
+        """
+        with transaction.atomic():
+            session = Session.objects.select_for_update().only("question_opened_at").get(pk=session_id)
+            if str(question_id) not in session.question_opened_at:
+                session.question_opened_at[str(question_id)] = opened_at.isoformat()
+                session.save(update_fields=["question_opened_at"])
 
-        return {
-            "id": q.id,
-            "text": q.text,
-            "choices": choices,
-            "time_limit": getattr(q, "time_limit", None),
-        }
\ No newline at end of file
+    @database_sync_to_async
+    def get_question_payload(self, question_id, session_id=None, pin=None):
+        """
+        Return a serializable question payload with choices, or None if the
+        question is not part of the session's quiz (by session id or PIN).
+        """
+        session_filter = {"quiz__sessions__id": session_id} if pin is None else {"quiz__sessions__pin": pin}
+        try:
+            q = Question.objects.get(pk=question_id, **session_filter)
+        except (Question.DoesNotExist, TypeError, ValueError):
+            return None
+        return student_question_payload(q)
\ No newline at end of file
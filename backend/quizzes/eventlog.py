@@ -0,0 +1,263 @@
+# backend/quizzes/eventlog.py
+"""
+Append-only per-session event log (CLASSPOINT_EVENT_LOG).
+
+Live state otherwise only exists as DB rows (lagging a checkpoint) and
+transient group messages, so after a crash nobody knows which question was
+open. Every session records its joins, question pushes, answers, closes and
+its end as small JSON events:
+
+    {"t": <unix time>, "kind": "answer", "participant_id": 7, ...}
+
+Actors buffer events and append them in batches with each checkpoint; the
+REST answer path and end action append directly. Backends:
+  - "file":  one gzip member per batch appended to
+             CLASSPOINT_EVENT_LOG_DIR/session_<id>.jsonl.gz (a multi-member
+             gzip file reads back as one stream)
+  - "redis": one Redis stream per session (XADD in a pipeline), at
+             CLASSPOINT_EVENT_LOG_REDIS
+
+Actor events carry the actor's id as "origin", and its answers a sequence
+number ("seq"). After a checkpoint has saved answers, the actor logs a
+"checkpoint" event with the highest seq saved, so a reader can tell answers
+already in the database from ones only the log has. An actor with nothing
+else to log writes "alive" events while it holds a question timer or unsaved
+answers, so a reader can also tell a running actor from a dead one; an actor
+taking over the timer of a dead one logs "timer".
+
+`replay()` folds events into a `ReplayState`; actors use it to reopen the
+current question and re-apply answers the database missed, and analytics can
+use it offline (see `manage.py replay_session`) without touching the OLTP
+tables.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+from .grading import response_columns
+
+logger = logging.getLogger(__name__)
+
+
+def event_log_backend():
+    return getattr(settings, "CLASSPOINT_EVENT_LOG", "")
+
+
+def answer_fields(result, origin=None):
+    """Event fields for a graded answer (a GradeResult)."""
+    return {
+        "origin": origin,
+        "participant_id": result.participant_id,
+        "question_id": result.question_id,
+        **response_columns(result.response),
+        "is_correct": result.is_correct,
+        "points": result.points,
+        "score_delta": result.score_delta,
+    }
+
+
+# -------------------------
+# Backends
+# -------------------------
+class FileEventStore:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def path(self, session_id):
+        return self.directory / f"session_{session_id}.jsonl.gz"
+
+    def append(self, session_id, events):
+        payload = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in events)
+        member = gzip.compress(payload.encode("utf-8"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # One write() per batch on an O_APPEND descriptor, so batches from
+        # several workers never interleave
+        fd = os.open(self.path(session_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, member)
+        finally:
+            os.close(fd)
+
+    def read(self, session_id):
+        path = self.path(session_id)
+        if not path.exists():
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class RedisEventStore:
+    def __init__(self, url, prefix="classpoint:events:"):
+        import redis  # optional; installed with channels_redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def append(self, session_id, events):
+        pipe = self.client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(self.prefix + str(session_id), {"e": json.dumps(event, separators=(",", ":"))})
+        pipe.execute()
+
+    def read(self, session_id, batch=1000):
+        key = self.prefix + str(session_id)
+        start = "-"
+        while True:
+            entries = self.client.xrange(key, min=start, count=batch)
+            for _, fields in entries:
+                yield json.loads(fields[b"e"])
+            if len(entries) < batch:
+                return
+            start = "(" + entries[-1][0].decode()
+
+
+_store = None
+
+
+def event_store():
+    """The configured store, or None when the event log is off."""
+    global _store
+    backend = event_log_backend()
+    if not backend:
+        return None
+    if _store is None:
+        if backend == "redis":
+            _store = RedisEventStore(settings.CLASSPOINT_EVENT_LOG_REDIS)
+        else:
+            _store = FileEventStore(getattr(settings, "CLASSPOINT_EVENT_LOG_DIR", "eventlog"))
+    return _store
+
+
+def append_events(session_id, events):
+    """Append events now (sync). Failures are logged, never raised into play."""
+    store = event_store()
+    if store is None or not events:
+        return
+    try:
+        store.append(session_id, events)
+    except Exception:
+        logger.exception("Could not append %d events for session %s", len(events), session_id)
+
+
+def log_event(session_id, kind, **fields):
+    """Append one event now (REST path, e.g. the end action)."""
+    append_events(session_id, [{"t": time.time(), "kind": kind, **fields}])
+
+
+def log_answers(results):
+    """Append answers graded outside an actor (REST path), per session."""
+    by_session = {}
+    for result in results:
+        by_session.setdefault(result.session_id, []).append(
+            {"t": time.time(), "kind": "answer", **answer_fields(result)}
+        )
+    for session_id, events in by_session.items():
+        append_events(session_id, events)
+
+
+def read_events(session_id):
+    store = event_store()
+    return iter(()) if store is None else store.read(session_id)
+
+
+class EventBuffer:
+    """Events of one session waiting for the next batch write (used by actors)."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.pending = []
+
+    def add(self, kind, **fields):
+        self.pending.append({"t": time.time(), "kind": kind, **fields})
+
+    async def flush(self):
+        if not self.pending:
+            return
+        events, self.pending = self.pending, []
+        await asyncio.to_thread(append_events, self.session_id, events)
+
+
+# -------------------------
+# Replay
+# -------------------------
+@dataclass
+class ReplayState:
+    names: dict = field(default_factory=dict)      # participant_id -> name
+    scores: dict = field(default_factory=dict)     # participant_id -> score
+    answers: dict = field(default_factory=dict)    # (participant_id, question_id) -> event
+    current_question: int = None
+    question_origin: str = None                    # actor holding its timer
+    opened_at: float = None                        # unix time of the last push
+    time_limit: int = None
+    closed_questions: set = field(default_factory=set)
+    ended: bool = False
+    event_count: int = 0
+    saved_seq: dict = field(default_factory=dict)  # actor id -> highest answer seq it checkpointed
+    last_seen: dict = field(default_factory=dict)  # actor id -> unix time of its latest event
+
+    def unsaved(self, event):
+        """Is this answer only in the log (logged by an actor, not checkpointed yet)?"""
+        origin = event.get("origin")
+        if origin is None:
+            return False  # REST answers are saved before they are logged
+        seq = event.get("seq")
+        return seq is None or seq > self.saved_seq.get(origin, 0)
+
+    def is_live(self, origin, window, now=None):
+        """Did actor `origin` log anything in the last `window` seconds?"""
+        seen = self.last_seen.get(origin)
+        return seen is not None and (now or time.time()) - seen < window
+
+    def remaining_time(self, now=None):
+        """Seconds left on the open question (None if untimed or none open)."""
+        if self.current_question is None or not self.time_limit:
+            return None
+        return self.time_limit - ((now or time.time()) - self.opened_at)
+
+
+def replay(events):
+    """Fold a session's events, in log order, into a ReplayState."""
+    state = ReplayState()
+    for event in events:
+        state.event_count += 1
+        kind = event.get("kind")
+        origin = event.get("origin")
+        if origin is not None:
+            state.last_seen[origin] = max(event["t"], state.last_seen.get(origin, 0))
+        if kind == "join":
+            pid = event["participant_id"]
+            state.names[pid] = event.get("name", "")
+            state.scores.setdefault(pid, 0)
+        elif kind == "push":
+            state.current_question = event["question_id"]
+            state.question_origin = origin
+            state.opened_at = event["t"]
+            state.time_limit = event.get("time_limit")
+            state.closed_questions.discard(event["question_id"])
+        elif kind == "answer":
+            pid = event["participant_id"]
+            state.answers[(pid, event["question_id"])] = event
+            state.scores[pid] = max(0, state.scores.get(pid, 0) + event.get("score_delta", 0))
+        elif kind == "close":
+            state.closed_questions.add(event["question_id"])
+            if state.current_question == event["question_id"]:
+                state.current_question = None
+        elif kind == "timer":
+            # Another actor took over the question's timer from a stopped one
+            if state.current_question == event["question_id"]:
+                state.question_origin = origin
+        elif kind == "checkpoint":
+            state.saved_seq[origin] = max(event["seq"], state.saved_seq.get(origin, 0))
+        elif kind == "end":
+            state.ended = True
+            state.current_question = None
+    return state
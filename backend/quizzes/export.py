@@ -0,0 +1,213 @@
+# backend/quizzes/export.py
+"""
+Streaming results export.
+
+Answers are read with `.iterator()` (server-side cursors on PostgreSQL) and
+written out in fixed-size chunks, so memory stays flat no matter how many
+answers a session or quiz has. Question and choice text are looked up from
+small per-quiz dicts instead of being joined into every row.
+
+Under ASGI (daphne) Django reads a sync iterator to the end before sending
+the first byte, so views wrap the chunks with `aiter_chunks` there: each
+chunk is produced on the request's sync thread (the same database
+connection and cursor) and sent before the next one is read.
+
+Formats:
+  - "csv"      always available
+  - "parquet"  needs the optional `pyarrow` package; one row group per chunk
+"""
+import csv
+import io
+
+from asgiref.sync import sync_to_async
+
+from .archive import iter_archived_answers
+from .models import Answer, Choice, Participant, Question, SessionResult
+
+# Rows fetched per cursor round trip and written per output chunk
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_COLUMNS = (
+    "session_id",
+    "session_pin",
+    "participant_id",
+    "participant_name",
+    "question_id",
+    "question_order",
+    "question_text",
+    "choice_id",
+    "choice_text",
+    "value",
+    "is_correct",
+    "answered_at",
+)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+
+def available_formats():
+    if pyarrow is None:
+        return ["csv"]
+    return list(EXPORT_FORMATS)
+
+
+def iter_export_rows(sessions):
+    """
+    Yield one tuple per answer (see EXPORT_COLUMNS) for each session in
+    `sessions`. All sessions must belong to the same quiz.
+    """
+    questions = None
+    choices = None
+    for session in sessions:
+        if questions is None:
+            questions = {
+                qid: (order, text)
+                for qid, order, text in Question.objects.filter(quiz_id=session.quiz_id)
+                .values_list("id", "order", "text")
+            }
+            choices = dict(
+                Choice.objects.filter(question__quiz_id=session.quiz_id).values_list("id", "text")
+            )
+
+        result = SessionResult.objects.filter(session=session).first()
+        if result is not None and result.answers_archived:
+            names = dict(
+                Participant.objects.filter(session=session).values_list("id", "name")
+            )
+            answers = (
+                (pid, names.get(pid, ""), qid, cid, cids, value, is_correct, answered_at)
+                for pid, qid, cid, is_correct, answered_at, cids, value in iter_archived_answers(result)
+            )
+        else:
+            answers = (
+                Answer.objects.filter(participant__session=session)
+                .order_by("answered_at")
+                .values_list(
+                    "participant_id", "participant__name", "question_id",
+                    "choice_id", "choice_ids", "value", "is_correct", "answered_at",
+                )
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+
+        for pid, name, qid, cid, cids, value, is_correct, answered_at in answers:
+            order, text = questions.get(qid, (None, ""))
+            if not isinstance(answered_at, str):
+                answered_at = answered_at.isoformat()
+            # Multi-select answers list every picked choice's text
+            choice_text = choices.get(cid, "") if cids is None else "; ".join(choices.get(c, "") for c in cids)
+            yield (
+                session.id, session.pin, pid, name, qid, order, text,
+                cid, choice_text, value or "", bool(is_correct), answered_at,
+            )
+
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows):
+    """Yield CSV text, one chunk of EXPORT_CHUNK_SIZE rows at a time."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.pending = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pending += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = bytes(self.pending)
+        self.pending.clear()
+        return data
+
+
+def stream_parquet(rows):
+    """Yield a Parquet file, one row group per chunk. Requires pyarrow."""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    schema = pyarrow.schema([
+        ("session_id", pyarrow.int64()),
+        ("session_pin", pyarrow.string()),
+        ("participant_id", pyarrow.int64()),
+        ("participant_name", pyarrow.string()),
+        ("question_id", pyarrow.int64()),
+        ("question_order", pyarrow.int64()),
+        ("question_text", pyarrow.string()),
+        ("choice_id", pyarrow.int64()),
+        ("choice_text", pyarrow.string()),
+        ("value", pyarrow.string()),
+        ("is_correct", pyarrow.bool_()),
+        ("answered_at", pyarrow.string()),
+    ])
+    sink = _ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="snappy")
+    for chunk in _chunks(rows):
+        columns = list(zip(*chunk))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema,
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over the sync generator `chunks`, one chunk per sync call."""
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while True:
+            chunk = await next_chunk(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Closes the server-side cursor on the thread that opened it
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def stream_export(sessions, fmt="csv"):
+    rows = iter_export_rows(sessions)
+    if fmt == "parquet":
+        return stream_parquet(rows)
+    return stream_csv(rows)
@@ -0,0 +1,375 @@
+# backend/quizzes/grading.py
+"""
+Shared answer-grading core used by both the WebSocket consumer and the REST
+fallback.
+
+Per answer this costs one query for the participant's session context (which
+also carries the quiz's scoring policy), in-process lookups in the quiz's
+answer keys, and one short transaction that upserts the Answer row and
+applies the score delta with an F() expression. There is no question open
+time or streak here, so speed-scored answers get the floor and no answer
+gets a streak bonus (see scoring.py).
+
+Answer keys are built once per (quiz, content version) and memoized in the
+process, so teacher edits produce fresh keys:
+
+  - `get_answer_key`: choice -> (question, is_correct), for choice answers
+  - `get_question_keys`: question -> QuestionKey holding what every question
+    type needs to grade in O(1): the set of correct choice ids (multi), the
+    correct number and tolerance (numeric), the normalized accepted answers
+    (text, looked up by hash)
+
+A response is stored in one Answer row whatever the type: `choice` for a
+single choice, the sorted ids in `choice_ids` for a multi-select, the
+submitted text in `value` for numeric, text and word cloud questions (the
+last are stored but never graded). In memory (actors, events) a response is
+the choice id, a tuple of choice ids or the string.
+"""
+import logging
+import math
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .analytics import bump_answers_version
+from .models import Answer, Choice, Participant, Question, Session
+from .scoring import ScoringPolicy, policy_from_row
+
+logger = logging.getLogger(__name__)
+
+# Longest stored numeric / text response (Answer.value)
+MAX_VALUE_LENGTH = 255
+
+
+@dataclass(frozen=True)
+class ParticipantContext:
+    participant_id: int
+    session_id: int
+    pin: str
+    quiz_id: uuid.UUID
+    content_version: int
+    is_active: bool
+    policy: ScoringPolicy
+
+
+@dataclass
+class GradeResult:
+    participant_id: int
+    choice_id: Optional[int] = None
+    question_id: Optional[int] = None
+    session_id: Optional[int] = None
+    pin: Optional[str] = None
+    answer_id: Optional[int] = None
+    response: object = None  # choice id, tuple of choice ids, or text
+    is_correct: bool = False
+    points: int = 0
+    created: bool = False
+    score_delta: int = 0
+    error: Optional[str] = None
+    started_at: Optional[float] = None  # time.perf_counter() when grading began (latency.py)
+    # Session actors: future of the time.perf_counter() reading when a checkpoint
+    # saved the answer (None if it was dropped instead)
+    persisted: object = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class InvalidAnswer(ValueError):
+    """A submission that cannot be graded; args[0] is the error code."""
+
+    @property
+    def code(self):
+        return self.args[0]
+
+
+def load_participant_context(participant_id):
+    """One query: the participant's session and quiz version, or None."""
+    row = Participant.objects.filter(pk=participant_id).values_list(
+        "session_id", "session__pin", "session__quiz_id",
+        "session__quiz__content_version", "session__is_active",
+        "session__quiz__scoring", "session__quiz__points", "session__quiz__streak_bonus",
+    ).first()
+    if row is None:
+        return None
+    return ParticipantContext(int(participant_id), *row[:5], policy_from_row(*row[5:]))
+
+
+def bound_participant_context(participant_id, session_id):
+    """
+    Context for a participant whose session membership was already verified
+    (e.g. bound to a socket at join): reads only the session row.
+    """
+    row = Session.objects.filter(pk=session_id).values_list(
+        "pin", "quiz_id", "quiz__content_version", "is_active",
+        "quiz__scoring", "quiz__points", "quiz__streak_bonus",
+    ).first()
+    if row is None:
+        return None
+    return ParticipantContext(int(participant_id), session_id, *row[:4], policy_from_row(*row[4:]))
+
+
+# -------------------------
+# Answer keys
+# -------------------------
+@dataclass(frozen=True)
+class QuestionKey:
+    question_type: str
+    correct_choices: frozenset = frozenset()
+    value: Optional[float] = None
+    tolerance: float = 0.0
+    accepted: frozenset = frozenset()  # normalize_text() of each accepted answer
+
+
+def normalize_text(text):
+    """Compared form of a text answer: case-folded, single-spaced, no end punctuation."""
+    return " ".join(str(text).casefold().split()).strip(".,;:!?")
+
+
+@lru_cache(maxsize=512)
+def get_answer_key(quiz_id, content_version):
+    """
+    Return {choice_id: (question_id, is_correct)} for every choice of the quiz.
+    Memoized per (quiz, content version) in this process, so a teacher's edit
+    produces a fresh key. Treat the returned dict as read-only.
+    """
+    return {
+        cid: (qid, is_correct)
+        for cid, qid, is_correct in Choice.objects.filter(question__quiz_id=quiz_id)
+        .values_list("id", "question_id", "is_correct")
+    }
+
+
+@lru_cache(maxsize=512)
+def get_question_keys(quiz_id, content_version):
+    """
+    Return {question_id: QuestionKey} for every question of the quiz, memoized
+    like `get_answer_key` (whose choices it reuses). Read-only.
+    """
+    correct = defaultdict(set)
+    for cid, (qid, is_correct) in get_answer_key(quiz_id, content_version).items():
+        if is_correct:
+            correct[qid].add(cid)
+    return {
+        qid: QuestionKey(
+            question_type=question_type,
+            correct_choices=frozenset(correct.get(qid, ())),
+            value=value,
+            tolerance=abs(tolerance or 0.0),
+            accepted=frozenset(normalize_text(a) for a in accepted or () if str(a).strip()),
+        )
+        for qid, question_type, value, tolerance, accepted in Question.objects.filter(quiz_id=quiz_id)
+        .values_list("id", "question_type", "correct_value", "tolerance", "accepted_answers")
+    }
+
+
+def check_answer(answer_key, question_keys, choice_id=None, question_id=None, choice_ids=None, value=None):
+    """
+    Resolve one submission against the quiz's keys, without queries.
+    A single choice is given as `choice_id`, a multi-select as `question_id`
+    and `choice_ids`, a number or text as `question_id` and `value`. Returns
+    (question_id, response, is_correct); raises InvalidAnswer.
+    """
+    if choice_id is not None:
+        entry = answer_key.get(choice_id)
+        if entry is None:
+            # Unknown choice, or a choice from another quiz
+            raise InvalidAnswer("choice_not_found")
+        if question_id is not None and question_id != entry[0]:
+            raise InvalidAnswer("question_mismatch")
+        question_id, is_correct = entry
+        key = question_keys.get(question_id)
+        if key is None or key.question_type == Question.SINGLE:
+            return question_id, choice_id, is_correct
+        choice_ids = [choice_id]  # one box ticked on a multi-select
+
+    if question_id is None:
+        raise InvalidAnswer("missing_fields")
+    key = question_keys.get(question_id)
+    if key is None:
+        raise InvalidAnswer("question_not_found")
+
+    if key.question_type in (Question.SINGLE, Question.MULTI):
+        if not isinstance(choice_ids, (list, tuple)) or not choice_ids:
+            raise InvalidAnswer("invalid_response")
+        try:
+            selection = tuple(sorted({int(cid) for cid in choice_ids}))
+        except (TypeError, ValueError):
+            raise InvalidAnswer("invalid_ids")
+        for cid in selection:
+            entry = answer_key.get(cid)
+            if entry is None or entry[0] != question_id:
+                raise InvalidAnswer("choice_not_found")
+        if key.question_type == Question.SINGLE:
+            if len(selection) != 1:
+                raise InvalidAnswer("invalid_response")
+            return question_id, selection[0], answer_key[selection[0]][1]
+        return question_id, selection, key.correct_choices == frozenset(selection)
+
+    if value is None or isinstance(value, (bool, list, dict)):
+        raise InvalidAnswer("invalid_response")
+    text = str(value).strip()[:MAX_VALUE_LENGTH]
+    if not text:
+        raise InvalidAnswer("invalid_response")
+    if key.question_type == Question.NUMERIC:
+        try:
+            number = float(text.replace(",", "."))
+        except ValueError:
+            raise InvalidAnswer("invalid_response")
+        if not math.isfinite(number):
+            raise InvalidAnswer("invalid_response")
+        if key.value is None:
+            return question_id, text, False
+        # A little slack so 0.1 + 0.2 still equals 0.3
+        slack = key.tolerance + 1e-9 * max(1.0, abs(key.value))
+        return question_id, text, abs(number - key.value) <= slack
+    if key.question_type == Question.WORDCLOUD:
+        # Collected for the host's word cloud (wordcloud.py), never correct
+        return question_id, text, False
+    return question_id, text, normalize_text(text) in key.accepted
+
+
+def response_columns(response):
+    """The Answer columns holding a response (see module docstring)."""
+    if isinstance(response, tuple):
+        return {"choice_id": None, "choice_ids": list(response), "value": ""}
+    if isinstance(response, str):
+        return {"choice_id": None, "choice_ids": None, "value": response}
+    return {"choice_id": response, "choice_ids": None, "value": ""}
+
+
+def response_from_columns(choice_id, choice_ids, value):
+    """Inverse of `response_columns`."""
+    if choice_id is not None:
+        return choice_id
+    if choice_ids is not None:
+        return tuple(choice_ids)
+    return value
+
+
+# -------------------------
+# Grading
+# -------------------------
+def grade_answer(participant_id, choice_id=None, context=None, question_id=None, choice_ids=None, value=None):
+    """
+    Record `participant_id`'s answer and adjust their score. The response is
+    given as for `check_answer`; if `question_id` is given along with
+    `choice_id`, the choice must belong to it.
+    Re-answering a question replaces the previous response; the score moves
+    by the difference in points. Returns a GradeResult (check `.ok`).
+    """
+    try:
+        participant_id = int(participant_id)
+        choice_id = int(choice_id) if choice_id is not None else None
+        question_id = int(question_id) if question_id is not None else None
+    except (TypeError, ValueError):
+        return GradeResult(participant_id=participant_id, error="invalid_ids")
+
+    if context is None:
+        context = load_participant_context(participant_id)
+    if context is None:
+        return GradeResult(participant_id=participant_id, choice_id=choice_id, error="participant_not_found")
+
+    result = GradeResult(
+        participant_id=participant_id,
+        choice_id=choice_id,
+        session_id=context.session_id,
+        pin=context.pin,
+    )
+    if not context.is_active:
+        result.error = "session_ended"
+        return result
+
+    try:
+        question_id, response, is_correct = check_answer(
+            get_answer_key(context.quiz_id, context.content_version),
+            get_question_keys(context.quiz_id, context.content_version),
+            choice_id, question_id, choice_ids, value,
+        )
+    except InvalidAnswer as exc:
+        result.error = exc.code
+        return result
+    columns = response_columns(response)
+    result.question_id = question_id
+    result.response = response
+    result.choice_id = columns["choice_id"]
+    result.is_correct = is_correct
+    result.points = points = context.policy.score(is_correct)
+
+    with transaction.atomic():
+        previous = (
+            Answer.objects.select_for_update()
+            .filter(participant_id=participant_id, question_id=question_id)
+            .values_list("id", "choice_id", "choice_ids", "value", "points")
+            .first()
+        )
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    answer = Answer.objects.create(
+                        participant_id=participant_id,
+                        question_id=question_id,
+                        is_correct=is_correct,
+                        points=points,
+                        **columns,
+                    )
+                result.answer_id = answer.id
+                result.created = True
+                old_points = 0
+            except IntegrityError:
+                # A concurrent submission inserted first; fall through to update it
+                previous = (
+                    Answer.objects.select_for_update()
+                    .filter(participant_id=participant_id, question_id=question_id)
+                    .values_list("id", "choice_id", "choice_ids", "value", "points")
+                    .get()
+                )
+        changed = result.created
+        if previous is not None:
+            result.answer_id, old_choice_id, old_choice_ids, old_value, old_points = previous
+            if response_from_columns(old_choice_id, old_choice_ids, old_value) != response:
+                Answer.objects.filter(pk=result.answer_id).update(
+                    is_correct=is_correct, points=points, **columns
+                )
+                changed = True
+            else:
+                # Same response again: keep the points it was first given
+                points = result.points = old_points
+
+        result.score_delta = points - old_points
+        if result.score_delta:
+            Participant.objects.filter(pk=participant_id).update(
+                score=Greatest(F("score") + result.score_delta, 0)
+            )
+
+    if changed:
+        bump_answers_version(context.session_id)
+    logger.debug(
+        "Graded participant=%s question=%s response=%r correct=%s delta=%s",
+        participant_id, question_id, response, is_correct, result.score_delta,
+    )
+    return result
+
+
+def grade_answers(participant_id, submissions, context=None):
+    """
+    Grade several answers from one participant (e.g. an offline queue being
+    flushed). Each submission is a choice id or a dict of `grade_answer`
+    keyword arguments (choice_id, question_id, choice_ids, value). The
+    participant context is loaded once for the whole batch.
+    """
+    if context is None:
+        context = load_participant_context(participant_id)
+    return [
+        grade_answer(participant_id, context=context, **submission)
+        if isinstance(submission, dict)
+        else grade_answer(participant_id, submission, context=context)
+        for submission in submissions
+    ]
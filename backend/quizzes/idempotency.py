@@ -0,0 +1,107 @@
+# backend/quizzes/idempotency.py
+"""
+Idempotent answer submissions.
+
+Student clients tag each answer with a `msg_id` and resend answers that were
+not acknowledged after a reconnect. Each worker remembers, per PIN, the
+frame it answered each (participant, msg_id) with, and a resend gets that
+frame back (marked "duplicate") before any grading or database work. A
+resend that arrives while the original is still being graded waits for it.
+
+Entries are kept for CLASSPOINT_ANSWER_DEDUPE_SECONDS and at most
+ENTRIES_PER_SESSION per session (least recently used first out), and
+dropped when the session ends. Like prefetched payloads, they outlive the
+sockets of a session, so a class that drops off the Wi-Fi all at once still
+finds its answers on reconnect. A
+resend that reaches another worker is graded again, which is harmless:
+re-answering with the same response changes nothing.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+# Remembered answers per session, and sessions per worker
+ENTRIES_PER_SESSION = 4096
+SESSIONS_LIMIT = 1024
+# Longest msg_id accepted (longer ones are cut)
+MAX_MSG_ID_LENGTH = 64
+
+_sessions = OrderedDict()  # pin -> OrderedDict((participant_id, msg_id) -> (expires, frame or Future))
+
+
+def dedupe_ttl():
+    return getattr(settings, "CLASSPOINT_ANSWER_DEDUPE_SECONDS", 300)
+
+
+def _session(pin):
+    entries = _sessions.get(pin)
+    if entries is None:
+        entries = _sessions[pin] = OrderedDict()
+        if len(_sessions) > SESSIONS_LIMIT:
+            _sessions.popitem(last=False)
+    else:
+        _sessions.move_to_end(pin)
+    return entries
+
+
+async def begin(pin, participant_id, msg_id):
+    """
+    The frame an earlier submission of this message was answered with, or
+    None if it is new: then the caller processes it and must call `finish`
+    (or `abandon`).
+    """
+    key = (participant_id, msg_id)
+    while True:
+        entries = _session(pin)
+        entry = entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            break
+        entries.move_to_end(key)
+        result = entry[1]
+        if isinstance(result, asyncio.Future):
+            # Still being graded: shield it so a dropped duplicate cannot cancel the original
+            result = await asyncio.shield(result)
+        if result is not None:
+            metrics.incr("ws.duplicate_answers")
+            return result
+        # The original was abandoned: look again (another resend may have taken over)
+    entries[key] = (time.monotonic() + dedupe_ttl(), asyncio.get_running_loop().create_future())
+    entries.move_to_end(key)
+    while len(entries) > ENTRIES_PER_SESSION:
+        _, (_, stale) = entries.popitem(last=False)
+        _release(stale)
+    return None
+
+
+def finish(pin, participant_id, msg_id, frame):
+    """Remember `frame` as the answer to the message (wakes waiting resends)."""
+    entries = _session(pin)
+    key = (participant_id, msg_id)
+    entry = entries.get(key)
+    if entry is not None and isinstance(entry[1], asyncio.Future) and not entry[1].done():
+        entry[1].set_result(frame)
+    entries[key] = (time.monotonic() + dedupe_ttl(), frame)
+
+
+def abandon(pin, participant_id, msg_id):
+    """Forget a message that failed unexpectedly, so a resend is processed again."""
+    entries = _sessions.get(pin)
+    entry = entries.pop((participant_id, msg_id), None) if entries is not None else None
+    if entry is not None:
+        _release(entry[1])
+
+
+def _release(result):
+    """Wake resends waiting on an entry that is going away (they process it themselves)."""
+    if isinstance(result, asyncio.Future) and not result.done():
+        result.set_result(None)
+
+
+def forget(pin):
+    """Drop a session's entries (when it ends); waiting resends process their message themselves."""
+    for _, result in _sessions.pop(pin, {}).values():
+        _release(result)
@@ -0,0 +1,211 @@
+# backend/quizzes/latency.py
+"""
+Answer latency breakdown.
+
+Every answer over the WebSocket is timed in stages (seconds measured with
+time.perf_counter on the worker that received it):
+
+  - "queue":      received -> grading starts (waiting in the session actor's
+                  mailbox, or for a thread to run the database path)
+  - "grade":      grading itself (in memory for actors; the answer and score
+                  transaction on the database path)
+  - "broadcast":  the score.update group_send (channel layer fan-out)
+  - "total":      received -> ack queued for the socket
+  - "persist":    graded -> written by the actor's checkpoint (actors only;
+                  the database path persists while grading)
+  - "checkpoint": each actor checkpoint's database write
+
+so slowness can be pinned on the executor (queue), the database (grade on
+the database path, persist, checkpoint) or fan-out (broadcast).
+
+Each stage keeps a count, sum, maximum and a histogram over fixed buckets, per
+session and for the whole worker. The whole-worker figures are served by
+/api/metrics/; the session's go to its host sockets as "latency" frames, at
+most once per CLASSPOINT_LATENCY_INTERVAL_SECONDS per worker (each worker
+reports the answers it received, tagged with WORKER_ID).
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .scoreboard import host_group_name
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("queue", "grade", "broadcast", "total", "persist", "checkpoint")
+# Histogram bucket upper bounds in milliseconds (the last bucket is open)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Sessions whose figures each worker keeps
+SESSIONS_LIMIT = 1024
+
+# Tells the host which worker a frame came from
+WORKER_ID = uuid.uuid4().hex[:8]
+
+_lock = threading.Lock()
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, seconds):
+        ms = seconds * 1000.0
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (ms)."""
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return None
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class LatencyStats:
+    """Stage statistics of one session (or of the whole worker)."""
+
+    def __init__(self, pin=None):
+        self.pin = pin
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.last_sent = 0.0
+        self.flush_handle = None
+
+    def summary(self):
+        return {stage: stats.summary() for stage, stats in self.stages.items() if stats.count}
+
+    def changed(self):
+        """Schedule a host frame, at most one per interval (trailing edge)."""
+        if self.flush_handle is not None or self.pin is None:
+            return
+        interval = getattr(settings, "CLASSPOINT_LATENCY_INTERVAL_SECONDS", 5.0)
+        delay = max(0.0, self.last_sent + interval - time.monotonic())
+        loop = asyncio.get_running_loop()
+        self.flush_handle = loop.call_later(delay, lambda: _background(self.flush()))
+
+    async def flush(self):
+        self.flush_handle = None
+        self.last_sent = time.monotonic()
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            with _lock:
+                stages = self.summary()
+            await channel_layer.group_send(
+                host_group_name(self.pin),
+                {"type": "latency.update", "worker": WORKER_ID, "stages": stages},
+            )
+
+
+_worker = LatencyStats()
+_sessions = OrderedDict()  # pin -> LatencyStats
+
+
+def epoch_ms(perf_time):
+    """A time.perf_counter() reading as Unix epoch milliseconds (for frames)."""
+    return round((time.time() - time.perf_counter() + perf_time) * 1000.0, 3)
+
+
+def record(pin, **stages):
+    """Add one measurement (seconds) per given stage, e.g. record(pin, grade=0.002)."""
+    with _lock:
+        session = _session(pin)
+        for stage, seconds in stages.items():
+            if seconds is not None:
+                session.stages[stage].add(seconds)
+                _worker.stages[stage].add(seconds)
+    _schedule(session)
+
+
+def record_all(pin, stage, values):
+    """Add many measurements (seconds) of one stage."""
+    with _lock:
+        session = _session(pin)
+        session_stats, worker_stats = session.stages[stage], _worker.stages[stage]
+        for seconds in values:
+            session_stats.add(seconds)
+            worker_stats.add(seconds)
+    _schedule(session)
+
+
+def _session(pin):
+    session = _sessions.get(pin)
+    if session is None:
+        session = _sessions[pin] = LatencyStats(pin)
+        if len(_sessions) > SESSIONS_LIMIT:
+            _, dropped = _sessions.popitem(last=False)
+            if dropped.flush_handle is not None:
+                dropped.flush_handle.cancel()
+    else:
+        _sessions.move_to_end(pin)
+    return session
+
+
+def _schedule(session):
+    try:
+        session.changed()
+    except RuntimeError:  # no running event loop (e.g. a management command)
+        pass
+
+
+def session_summary(pin):
+    with _lock:
+        session = _sessions.get(pin)
+        return session.summary() if session is not None else {}
+
+
+def snapshot():
+    """This worker's figures: overall and per session (for /api/metrics/)."""
+    with _lock:
+        return {
+            "worker": WORKER_ID,
+            "stages": _worker.summary(),
+            "sessions": {pin: session.summary() for pin, session in _sessions.items()},
+        }
+
+
+def reset():
+    global _worker
+    with _lock:
+        _worker = LatencyStats()
+        for session in _sessions.values():
+            if session.flush_handle is not None:
+                session.flush_handle.cancel()
+        _sessions.clear()
+
+
+def _background(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    task.add_done_callback(_log_failure)
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Latency update failed", exc_info=task.exception())
@@ -0,0 +1,140 @@
+# backend/quizzes/layers.py
+"""
+In-process channel layer for single-worker deployments.
+
+With one daphne process every consumer of a session lives in the same event
+loop, so a broadcast does not need Redis: `LocalChannelLayer.group_send`
+puts the message straight onto each member channel's queue. There is no
+msgpack encoding, no network round trip and no per-member decoding. Also
+unlike channels' InMemoryChannelLayer (meant for tests), it does not
+deep-copy the message per member, start a task per member, or scan every
+channel for expired messages on each send.
+
+A group message is deep-copied once; each member then gets its own shallow
+copy of it. Members can change the received dict itself, but the values
+inside it are shared with every other member: the scoreboard list, answer
+events and question payloads. Handlers must not modify those in place. Ours
+only read them and pass them on to json.dumps. Messages
+older than `expiry` are dropped when received, and a member whose queue is
+full of expired messages (a consumer that went away without leaving its
+groups) is removed from its groups.
+
+settings.py picks it when WEB_CONCURRENCY=1 (or CLASSPOINT_CHANNEL_LAYER=local)
+says every consumer and every group_send caller runs in one process;
+`manage.py bench --broadcast` compares it with the other layers.
+"""
+import asyncio
+import random
+import string
+import time
+from collections import deque
+from copy import deepcopy
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+
+class LocalChannelLayer(BaseChannelLayer):
+    extensions = ["groups", "flush"]
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channels = {}  # channel -> deque of (expires, message), oldest first
+        self.waiters = {}   # channel -> future of a receive() waiting for a message
+        self.groups = {}    # group -> {channel: None}, in join order
+
+    def _queue(self, channel):
+        queue = self.channels.get(channel)
+        if queue is None:
+            queue = self.channels[channel] = deque()
+        return queue
+
+    def _put(self, channel, item):
+        """Append to the channel; False if it is at capacity."""
+        queue = self._queue(channel)
+        if len(queue) >= self.get_capacity(channel):
+            return False
+        queue.append(item)
+        waiter = self.waiters.get(channel)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+        return True
+
+    # ------- Channels -------
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        if not self._put(channel, (time.monotonic() + self.expiry, deepcopy(message))):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        while True:
+            queue = self._queue(channel)
+            now = time.monotonic()
+            while queue:
+                expires, message = queue.popleft()
+                if expires >= now:
+                    if not queue:
+                        del self.channels[channel]
+                    return message
+            waiter = self.waiters[channel] = asyncio.get_running_loop().create_future()
+            try:
+                await waiter
+            finally:
+                if self.waiters.get(channel) is waiter:
+                    del self.waiters[channel]
+                queue = self.channels.get(channel)
+                if queue is not None and not queue and channel not in self.waiters:
+                    del self.channels[channel]
+
+    async def new_channel(self, prefix="specific."):
+        return "%s.local!%s" % (prefix, "".join(random.choices(string.ascii_letters, k=12)))
+
+    # ------- Groups -------
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        self.groups.setdefault(group, {})[channel] = None
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        members = self.groups.get(group)
+        if members is not None:
+            members.pop(channel, None)
+            if not members:
+                del self.groups[group]
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_group_name(group)
+        members = self.groups.get(group)
+        if not members:
+            return
+        now = time.monotonic()
+        expires, shared = now + self.expiry, deepcopy(message)
+        for channel in list(members):
+            if not self._put(channel, (expires, dict(shared))):
+                # Like the Redis layer, a full member just misses the message;
+                # one full of expired messages is gone and leaves its groups
+                if self.channels[channel][0][0] < now:
+                    self._forget(channel)
+
+    def _forget(self, channel):
+        self.channels.pop(channel, None)
+        for group in [g for g, members in self.groups.items() if channel in members]:
+            del self.groups[group][channel]
+            if not self.groups[group]:
+                del self.groups[group]
+
+    # ------- Flush -------
+
+    async def flush(self):
+        self.channels = {}
+        self.groups = {}
+
+    async def close(self):
+        pass
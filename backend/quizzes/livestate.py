@@ -0,0 +1,202 @@
+# backend/quizzes/livestate.py
+"""
+Compact live state for session actors.
+
+An actor keeps every participant of its session in memory, and a worker can
+host thousands of sessions. A dict (or object) per participant and per answer
+costs hundreds of bytes each, so the roster is stored column-wise instead:
+
+  - participant ids, scores and answer streaks in parallel `array` columns
+    indexed by row, where a participant's row is their join position (the
+    scoreboard tie-break), and names in a plain list
+  - per question, one unsigned 16-bit slot per row naming the response
+    (0 = not answered; slots index the question's own list of distinct
+    responses: choice ids, choice id tuples or texts, see grading.py),
+    the points the answer earned (16-bit, see scoring.MAX_POINTS) and a
+    bitmap of correct answers
+
+The only per-participant Python objects left are the id -> row entry and the
+name string. `manage.py bench --memory` measures bytes per participant
+against the dict layout this replaced.
+"""
+from array import array
+
+# Row columns grow in steps of this many participants
+GROWTH = 256
+
+
+def _bitmap_size(rows):
+    return (rows + 7) // 8
+
+
+class QuestionAnswers:
+    """Answers of every participant to one question."""
+
+    __slots__ = ("responses", "slot_of", "slots", "points", "correct")
+
+    def __init__(self, rows):
+        self.responses = []                     # slot - 1 -> response
+        self.slot_of = {}                       # response -> slot
+        self.slots = array("H", bytes(2 * rows))
+        self.points = array("H", bytes(2 * rows))
+        self.correct = bytearray(_bitmap_size(rows))
+
+    def grow(self, rows):
+        if rows > len(self.slots):
+            extra = rows - len(self.slots)
+            self.slots.frombytes(bytes(self.slots.itemsize * extra))
+            self.points.frombytes(bytes(self.points.itemsize * extra))
+            self.correct.extend(bytes(_bitmap_size(rows) - len(self.correct)))
+
+    def get(self, row):
+        """(response, is_correct, points), or None if unanswered."""
+        slot = self.slots[row]
+        if not slot:
+            return None
+        return (
+            self.responses[slot - 1],
+            bool(self.correct[row >> 3] & (1 << (row & 7))),
+            self.points[row],
+        )
+
+    def set(self, row, response, is_correct, points):
+        slot = self.slot_of.get(response)
+        if slot is None:
+            self.responses.append(response)
+            slot = self.slot_of[response] = len(self.responses)
+            if slot > 0xFFFF and self.slots.typecode == "H":
+                # More distinct texts than 16 bits can name
+                self.slots = array("I", self.slots)
+        self.slots[row] = slot
+        self.points[row] = points
+        if is_correct:
+            self.correct[row >> 3] |= 1 << (row & 7)
+        else:
+            self.correct[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+
+class LiveRoster:
+    """Participants, scores and answers of one live session, in join order."""
+
+    __slots__ = (
+        "rows", "ids", "scores", "names", "questions", "_capacity",
+        "streaks", "streak_question", "streak_before",
+    )
+
+    def __init__(self):
+        self.rows = {}              # participant_id -> row
+        self.ids = array("q")
+        self.scores = array("l")
+        self.names = []
+        # Consecutive correct answers, the question that last moved the
+        # streak and the streak before it (so re-answering it can redo it)
+        self.streaks = array("H")
+        self.streak_question = array("q")
+        self.streak_before = array("H")
+        self.questions = {}         # question_id -> QuestionAnswers
+        self._capacity = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, participant_id):
+        return participant_id in self.rows
+
+    # ------- Participants -------
+
+    def add(self, participant_id, name, score=0):
+        """Append a participant (no-op if already present); returns the row."""
+        row = self.rows.get(participant_id)
+        if row is not None:
+            return row
+        row = len(self.ids)
+        self.rows[participant_id] = row
+        self.ids.append(participant_id)
+        self.scores.append(max(0, score or 0))
+        self.names.append(name)
+        self.streaks.append(0)
+        self.streak_question.append(0)
+        self.streak_before.append(0)
+        if row >= self._capacity:
+            # Answer columns grow in steps rather than per join
+            self._capacity = row + GROWTH
+            for answers in self.questions.values():
+                answers.grow(self._capacity)
+        return row
+
+    def name(self, participant_id):
+        return self.names[self.rows[participant_id]]
+
+    def score(self, participant_id):
+        return self.scores[self.rows[participant_id]]
+
+    def add_score(self, participant_id, delta):
+        """Adjust a score, never below zero; returns the new score."""
+        row = self.rows[participant_id]
+        score = self.scores[row] = max(0, self.scores[row] + delta)
+        return score
+
+    # ------- Answers -------
+
+    def answer(self, participant_id, question_id):
+        """(response, is_correct, points) of the participant's answer, or None."""
+        answers = self.questions.get(question_id)
+        if answers is None:
+            return None
+        return answers.get(self.rows[participant_id])
+
+    def set_answer(self, participant_id, question_id, response, is_correct, points):
+        answers = self.questions.get(question_id)
+        if answers is None:
+            answers = self.questions[question_id] = QuestionAnswers(self._capacity)
+        answers.set(self.rows[participant_id], response, is_correct, points)
+
+    # ------- Streaks -------
+
+    def advance_streak(self, participant_id, question_id, is_correct):
+        """
+        Move the participant's streak for an answer to `question_id` (call
+        before `set_answer`); returns the streak the answer builds on. A new
+        question extends or resets the streak; re-answering the question
+        that last moved it redoes that step; answers to older questions
+        leave it alone and build on nothing.
+        """
+        row = self.rows[participant_id]
+        if self.streak_question[row] == question_id:
+            before = self.streak_before[row]
+        elif self.answer(participant_id, question_id) is not None:
+            return 0
+        else:
+            before = self.streak_before[row] = self.streaks[row]
+            self.streak_question[row] = question_id
+        self.streaks[row] = min(before + 1, 0xFFFF) if is_correct else 0
+        return before
+
+    def rebuild_streaks(self, question_ids):
+        """Recompute every streak from the stored answers, in `question_ids` order."""
+        for question_id in question_ids:
+            answers = self.questions.get(question_id)
+            if answers is None:
+                continue
+            slots, correct = answers.slots, answers.correct
+            for row in range(len(self.ids)):
+                if slots[row]:
+                    self.streak_before[row] = before = self.streaks[row]
+                    self.streak_question[row] = question_id
+                    hit = correct[row >> 3] & (1 << (row & 7))
+                    self.streaks[row] = min(before + 1, 0xFFFF) if hit else 0
+
+    # ------- Views -------
+
+    def ranking(self):
+        """Rows best first: higher score, then earlier join."""
+        scores = self.scores
+        return sorted(range(len(scores)), key=lambda row: (-scores[row], row))
+
+    def scoreboard(self):
+        """[{participant_id, name, score}] best first (the wire format)."""
+        ids, names, scores = self.ids, self.names, self.scores
+        return [
+            {"participant_id": ids[row], "name": names[row], "score": scores[row]}
+            for row in self.ranking()
+        ]
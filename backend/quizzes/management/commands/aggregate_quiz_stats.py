@@ -0,0 +1,33 @@
+# backend/quizzes/management/commands/aggregate_quiz_stats.py
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.aggregates import aggregate_pending, rebuild_quiz
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Add finalized session results that are not yet in the per-question quiz "
+        "totals (QuestionAggregate), e.g. sessions finalized before the totals "
+        "existed. Run periodically; --rebuild recomputes one quiz from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiz", help="Only this quiz (UUID)")
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Drop and recompute the quiz's totals from all its results (needs --quiz)",
+        )
+
+    def handle(self, *args, **options):
+        quiz_id = options["quiz"]
+        if quiz_id and not Quiz.objects.filter(pk=quiz_id).exists():
+            raise CommandError(f"Quiz {quiz_id} not found")
+        if options["rebuild"]:
+            if not quiz_id:
+                raise CommandError("--rebuild needs --quiz")
+            count = rebuild_quiz(quiz_id)
+            self.stdout.write(f"Rebuilt quiz {quiz_id} from {count} session result(s)")
+            return
+        count = aggregate_pending(quiz_id)
+        self.stdout.write(f"Aggregated {count} session result(s)")
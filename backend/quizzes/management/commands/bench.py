@@ -0,0 +1,556 @@
+# backend/quizzes/management/commands/bench.py
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from itertools import count
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from quizzes.bulk import import_quiz_document
+from quizzes.actors import LiveAnswer, SessionActor
+from quizzes.analytics import session_analytics
+from quizzes.consumers import SessionConsumer
+from quizzes.grading import QuestionKey, bound_participant_context, grade_answer
+from quizzes.layers import LocalChannelLayer
+from quizzes.livestate import LiveRoster
+from quizzes.models import Answer, Choice, Participant, Question, Quiz, Session
+from quizzes.scoreboard import build_scoreboard
+from quizzes.scoring import DEFAULT_POLICY, ScoringPolicy
+from quizzes.serializers import ParticipantJoinSerializer, QuizSerializer
+from quizzes.views import QuizViewSet
+
+User = get_user_model()
+
+QUESTIONS_PER_QUIZ = 10
+CHOICES_PER_QUESTION = 4
+
+# What a daphne worker imports before it binds its socket (the warm-up that
+# `manage.py serve` runs first is not included)
+STARTUP_IMPORT = "classpoint.asgi"
+
+
+class _Rollback(Exception):
+    pass
+
+
+def consumer_sync(name):
+    """The synchronous body of a @database_sync_to_async consumer method."""
+    return SessionConsumer.__dict__[name].func
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the ORM hot paths (scoreboard, grading, question payloads, joins, "
+        "quiz list rendering) at several data sizes and report wall time and "
+        "queries per operation. Data is created in a transaction and rolled back. "
+        "Use --output to save JSON and --compare to diff against a saved run. "
+        "--startup also times a cold worker start with `python -X importtime`; "
+        "--memory measures an actor's live state per participant; --scoring "
+        "times the actor's in-memory answer path under each scoring policy; "
+        "--broadcast times one session broadcast on each channel layer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="100,1000,10000",
+            help="Comma-separated participants per session (default 100,1000,10000)",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case (default 20)")
+        parser.add_argument("--cases", default="", help="Comma-separated subset of cases to run")
+        parser.add_argument("--output", help="Write results as JSON to this file")
+        parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+        parser.add_argument(
+            "--startup", type=int, default=0, metavar="RUNS",
+            help=f"Also import {STARTUP_IMPORT} in RUNS fresh interpreters and report import time "
+                 "(use --sizes= to measure only startup)",
+        )
+        parser.add_argument(
+            "--memory", type=int, default=0, metavar="PARTICIPANTS",
+            help="Also measure in-memory live state for this many participants (e.g. 100000)",
+        )
+        parser.add_argument(
+            "--scoring", type=int, default=0, metavar="ANSWERS",
+            help="Also time this many answers through a session actor per scoring policy (e.g. 100000)",
+        )
+        parser.add_argument(
+            "--broadcast", type=int, default=0, metavar="MEMBERS",
+            help="Also time a score.update broadcast to this many sockets on each channel layer (e.g. 100)",
+        )
+
+    def handle(self, *args, **options):
+        cases = self.cases()
+        selected = [c for c in options["cases"].split(",") if c] or list(cases)
+        unknown = set(selected) - set(cases)
+        if unknown:
+            raise CommandError(f"Unknown case(s): {', '.join(sorted(unknown))}. Known: {', '.join(cases)}")
+        try:
+            sizes = [int(s) for s in options["sizes"].split(",") if s]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+
+        baseline = {}
+        if options["compare"]:
+            previous = json.loads(Path(options["compare"]).read_text())
+            baseline = {(r["case"], r["size"]): r for r in previous["results"]}
+
+        self.stdout.write(
+            f"{connection.vendor}, {options['repeat']} runs per case, sizes {sizes}\n"
+            f"{'case':<30} {'size':>7} {'median ms':>10} {'min ms':>9} {'queries':>8}"
+        )
+        results = []
+        if options["startup"]:
+            result = self.run_startup(options["startup"])
+            results.append(result)
+            self.report(result, baseline.get(("startup", 0)))
+            for module, ms in result["slowest"]:
+                self.stdout.write(f"    {module:<40} {ms:>8.1f} ms")
+        if options["memory"]:
+            for result in self.run_memory(options["memory"]):
+                results.append(result)
+                self.report_memory(result, baseline.get((result["case"], result["size"])))
+        if options["scoring"]:
+            for result in self.run_scoring(options["scoring"], options["repeat"]):
+                results.append(result)
+                self.report_scoring(result, baseline.get((result["case"], result["size"])))
+        if options["broadcast"]:
+            for result in self.run_broadcast(options["broadcast"], options["repeat"]):
+                results.append(result)
+                self.report_broadcast(result, baseline.get((result["case"], result["size"])))
+        for size in sizes:
+            for name in selected:
+                result = self.run_case(name, cases[name], size, options["repeat"])
+                results.append(result)
+                self.report(result, baseline.get((name, size)))
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps({"meta": self.meta(sizes, options), "results": results}, indent=2))
+            self.stdout.write(f"Saved {len(results)} results to {options['output']}")
+
+    # ------- Harness -------
+
+    def run_case(self, name, case, size, repeat):
+        """Seed `size`, then time `repeat` calls of the case's operation."""
+        timings, queries = [], []
+        try:
+            with transaction.atomic():
+                data = self.seed(size)
+                operation = case(data)
+                operation()  # warm-up: caches, prepared statements
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        operation()
+                        timings.append(time.perf_counter() - start)
+                    queries.append(len(ctx.captured_queries))
+                raise _Rollback
+        except _Rollback:
+            pass
+        return {
+            "case": name,
+            "size": size,
+            "median_ms": round(statistics.median(timings) * 1000, 3),
+            "min_ms": round(min(timings) * 1000, 3),
+            "queries": round(statistics.mean(queries), 2),
+        }
+
+    def run_startup(self, runs):
+        """Cold-import the ASGI application `runs` times under -X importtime."""
+        timings, slowest = [], []
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {STARTUP_IMPORT}"],
+                capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+            )
+            if proc.returncode != 0:
+                raise CommandError(f"Importing {STARTUP_IMPORT} failed:\n{proc.stderr[-2000:]}")
+            total, children = self.parse_importtime(proc.stderr)
+            timings.append(total)
+            slowest = children
+        return {
+            "case": "startup",
+            "size": 0,
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "queries": 0,
+            # From the last run: the direct imports that cost the most
+            "slowest": slowest,
+        }
+
+    def parse_importtime(self, stderr, top=8):
+        """
+        Total milliseconds for STARTUP_IMPORT and its slowest direct imports.
+        Lines read `import time: <self us> | <cumulative us> | <indented name>`.
+        """
+        total, children = None, []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|", 2)
+            if not cumulative.strip().isdigit():
+                continue  # header line
+            depth = (len(name) - len(name.lstrip())) // 2
+            if name.strip() == STARTUP_IMPORT and depth == 0:
+                total = int(cumulative) / 1000
+            elif depth == 1:
+                children.append((name.strip(), int(cumulative) / 1000))
+        if total is None:
+            raise CommandError(f"No import time reported for {STARTUP_IMPORT}")
+        children.sort(key=lambda c: c[1], reverse=True)
+        return total, children[:top]
+
+    def run_memory(self, participants, questions=QUESTIONS_PER_QUIZ):
+        """
+        Live state of one session where everyone answered every question, held
+        as the actor's compact roster and as the dict-per-participant layout it
+        replaced, plus the rendered scoreboard. Measured with tracemalloc.
+        """
+        def compact():
+            roster = LiveRoster()
+            for pid in range(participants):
+                roster.add(10_000_000 + pid, f"student {pid}", pid % 7)
+            for qid in range(questions):
+                for pid in range(participants):
+                    roster.set_answer(
+                        10_000_000 + pid, qid, qid * CHOICES_PER_QUESTION + pid % 4, pid % 4 == 0, int(pid % 4 == 0)
+                    )
+            return roster
+
+        def dicts():
+            names, scores, join_order, answers = {}, {}, {}, {}
+            for pid in range(participants):
+                names[10_000_000 + pid] = f"student {pid}"
+                scores[10_000_000 + pid] = pid % 7
+                join_order[10_000_000 + pid] = pid
+            for qid in range(questions):
+                for pid in range(participants):
+                    answers[(10_000_000 + pid, qid)] = LiveAnswer(
+                        qid * CHOICES_PER_QUESTION + pid % 4, pid % 4 == 0, int(pid % 4 == 0), None
+                    )
+            return names, scores, join_order, answers
+
+        roster = compact()
+        layouts = [
+            ("live_state_compact", compact),
+            ("live_state_dicts", dicts),
+            ("live_state_scoreboard", roster.scoreboard),
+        ]
+        results = []
+        for name, build in layouts:
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            state = build()
+            elapsed = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del state
+            results.append({
+                "case": name,
+                "size": participants,
+                "questions": questions,
+                "build_ms": round(elapsed * 1000, 3),
+                "bytes": allocated,
+                "bytes_per_participant": round(allocated / participants, 1),
+            })
+        return results
+
+    def run_scoring(self, answers, repeat, participants=1000):
+        """
+        Answers handled by a session actor entirely in memory (participants
+        known, answer key cached, event log off), i.e. the per-answer cost of
+        grading plus scoring, under the flat and speed/streak policies.
+        """
+        questions = max(1, answers // participants)
+        answer_key = {
+            qid * CHOICES_PER_QUESTION + c: (qid, c == 0)
+            for qid in range(1, questions + 1) for c in range(CHOICES_PER_QUESTION)
+        }
+        question_keys = {qid: QuestionKey(Question.SINGLE) for qid in range(1, questions + 1)}
+        policies = [
+            ("answer_scoring_flat", DEFAULT_POLICY),
+            ("answer_scoring_speed", ScoringPolicy("speed", 1000)),
+            ("answer_scoring_speed_streak", ScoringPolicy("speed", 1000, 100)),
+        ]
+
+        async def answer_all(policy):
+            actor = SessionActor("bench")
+            actor.session_id, actor.is_active, actor.content_version = 0, True, 1
+            actor.policy = policy
+            actor._key, actor._question_keys, actor._key_version = answer_key, question_keys, 1
+            for pid in range(participants):
+                actor.roster.add(pid + 1, f"student {pid}")
+            start = time.perf_counter()
+            for qid in range(1, questions + 1):
+                actor.current_question, actor.question_opened_at = qid, time.monotonic()
+                actor.question_time_limit = 30
+                for pid in range(participants):
+                    await actor._handle_answer(pid + 1, qid * CHOICES_PER_QUESTION + pid % CHOICES_PER_QUESTION)
+            return time.perf_counter() - start
+
+        results = []
+        for name, policy in policies:
+            asyncio.run(answer_all(policy))  # warm-up
+            timings = [asyncio.run(answer_all(policy)) for _ in range(max(1, repeat // 4))]
+            total = questions * participants
+            results.append({
+                "case": name,
+                "size": total,
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+                "queries": 0,
+                "us_per_answer": round(statistics.median(timings) / total * 1e6, 3),
+            })
+        return results
+
+    def run_broadcast(self, members, repeat):
+        """
+        One score.update group_send (a full scoreboard plus an answer event)
+        to `members` channels until every member has received it, on the
+        in-process layer, channels' InMemoryChannelLayer and the Redis layer
+        from settings (skipped when Redis is unreachable).
+        """
+        from channels.layers import InMemoryChannelLayer
+        from channels_redis.core import RedisChannelLayer
+        from redis.exceptions import RedisError
+
+        config = {"capacity": 300, "expiry": 10}
+        layers = [
+            ("broadcast_local", lambda: LocalChannelLayer(**config)),
+            ("broadcast_inmemory", lambda: InMemoryChannelLayer(**config)),
+            ("broadcast_redis", lambda: RedisChannelLayer(**settings.REDIS_CHANNEL_LAYER["CONFIG"])),
+        ]
+        message = {
+            "type": "score.update",
+            "scoreboard": [
+                {"participant_id": pid, "name": f"student {pid}", "score": members - pid}
+                for pid in range(members)
+            ],
+            "answers": [{
+                "id": "0" * 32, "origin": None, "participant_id": 1, "question_id": 1,
+                "choice_id": 1, "choice_ids": None, "value": "", "is_correct": True,
+                "points": 1, "score_delta": 1,
+            }],
+        }
+
+        async def broadcast_all(layer):
+            group = f"bench_{os.getpid()}"
+            channels = [await layer.new_channel() for _ in range(members)]
+            for channel in channels:
+                await layer.group_add(group, channel)
+            timings = []
+            try:
+                for _ in range(repeat + 1):  # the first run warms up
+                    start = time.perf_counter()
+                    await layer.group_send(group, message)
+                    await asyncio.gather(*(layer.receive(channel) for channel in channels))
+                    timings.append(time.perf_counter() - start)
+            finally:
+                for channel in channels:
+                    await layer.group_discard(group, channel)
+                await layer.close()
+            return timings[1:]
+
+        async def run(make_layer):
+            return await asyncio.wait_for(broadcast_all(make_layer()), timeout=60)
+
+        results = []
+        for name, make_layer in layers:
+            try:
+                timings = asyncio.run(run(make_layer))
+            except (OSError, RedisError, asyncio.TimeoutError) as exc:
+                self.stdout.write(f"{name:<30} skipped ({exc.__class__.__name__}: {exc})")
+                continue
+            results.append({
+                "case": name,
+                "size": members,
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+                "queries": 0,
+                "us_per_member": round(statistics.median(timings) / members * 1e6, 3),
+            })
+        return results
+
+    def report_broadcast(self, result, previous):
+        line = (
+            f"{result['case']:<30} {result['size']:>7} {result['median_ms']:>10.3f} "
+            f"{result['min_ms']:>9.3f} {result['queries']:>8g}   {result['us_per_member']:.3f} us/member"
+        )
+        if previous:
+            line += f"   was {previous['median_ms']:.3f} ms"
+        self.stdout.write(line)
+
+    def report_scoring(self, result, previous):
+        line = (
+            f"{result['case']:<30} {result['size']:>7} {result['median_ms']:>10.3f} "
+            f"{result['min_ms']:>9.3f} {result['queries']:>8g}   {result['us_per_answer']:.3f} us/answer"
+        )
+        if previous:
+            line += f"   was {previous['us_per_answer']:.3f} us/answer"
+        self.stdout.write(line)
+
+    def report_memory(self, result, previous):
+        line = (
+            f"{result['case']:<30} {result['size']:>7} {result['bytes'] / 2**20:>8.1f} MiB "
+            f"{result['bytes_per_participant']:>8.1f} B/participant ({result['questions']} answers each)"
+        )
+        if previous:
+            line += f"   was {previous['bytes_per_participant']:.1f} B/participant"
+        self.stdout.write(line)
+
+    def report(self, result, previous):
+        line = (
+            f"{result['case']:<30} {result['size']:>7} {result['median_ms']:>10.3f} "
+            f"{result['min_ms']:>9.3f} {result['queries']:>8g}"
+        )
+        if previous:
+            change = (result["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+            line += f"   {change:+6.1f}% vs {previous['median_ms']:.3f} ms, {previous['queries']:g} queries"
+        self.stdout.write(line)
+
+    def meta(self, sizes, options):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except OSError:
+            commit = ""
+        return {
+            "commit": commit,
+            "vendor": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sizes": sizes,
+            "repeat": options["repeat"],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+
+    def seed(self, size):
+        """
+        One teacher with max(1, size // 100) quizzes of 10 questions x 4 choices,
+        and one live session of the first quiz with `size` participants who
+        answered half of its questions.
+        """
+        teacher = User.objects.create(username="bench-teacher")
+        quizzes = Quiz.objects.bulk_create(
+            [Quiz(title=f"Bench quiz {i}", created_by=teacher) for i in range(max(1, size // 100))]
+        )
+        questions = Question.objects.bulk_create(
+            [
+                Question(quiz=quiz, text=f"Question {i}", order=i)
+                for quiz in quizzes for i in range(QUESTIONS_PER_QUIZ)
+            ]
+        )
+        choices = Choice.objects.bulk_create(
+            [
+                Choice(question=q, text=f"Choice {j}", is_correct=j == 0)
+                for q in questions for j in range(CHOICES_PER_QUESTION)
+            ]
+        )
+        session = Session.objects.create(quiz=quizzes[0], pin="999999")
+        participants = Participant.objects.bulk_create(
+            [Participant(session=session, name=f"student {i}", score=i % 7) for i in range(size)],
+            batch_size=2000,
+        )
+        first_quiz_choices = [choices[i:i + CHOICES_PER_QUESTION] for i in range(0, QUESTIONS_PER_QUIZ * CHOICES_PER_QUESTION, CHOICES_PER_QUESTION)]
+        Answer.objects.bulk_create(
+            [
+                Answer(participant=p, question_id=qc[0].question_id, choice=qc[n % CHOICES_PER_QUESTION],
+                       is_correct=n % CHOICES_PER_QUESTION == 0)
+                for n, p in enumerate(participants)
+                for qc in first_quiz_choices[: QUESTIONS_PER_QUIZ // 2]
+            ],
+            batch_size=2000,
+        )
+        return {
+            "teacher": teacher,
+            "session": session,
+            "participants": participants,
+            "questions": questions[:QUESTIONS_PER_QUIZ],
+            "open_choices": first_quiz_choices[QUESTIONS_PER_QUIZ // 2:],
+        }
+
+    # ------- Cases: each takes the seeded data and returns a zero-arg operation -------
+
+    def cases(self):
+        return {
+            "build_scoreboard": self.case_build_scoreboard,
+            "save_answer_and_update_score": self.case_save_answer,
+            "get_question_payload": self.case_question_payload,
+            "participant_join": self.case_participant_join,
+            "quiz_list_serializer": self.case_quiz_list,
+            "quiz_import_bulk": self.case_quiz_import,
+            "session_analytics": self.case_session_analytics,
+        }
+
+    def case_build_scoreboard(self, data):
+        session_id = data["session"].id
+        return lambda: build_scoreboard(session_id)
+
+    def case_save_answer(self, data):
+        # The consumer's legacy (non-actor) path: bound context + grading core,
+        # alternating choices so every call changes the answer and the score
+        session_id = data["session"].id
+        participant_id = data["participants"][0].id
+        choices = data["open_choices"][0]
+        calls = count()
+
+        def operation():
+            choice = choices[next(calls) % 2]
+            context = bound_participant_context(participant_id, session_id)
+            grade_answer(participant_id, choice.id, context=context)
+        return operation
+
+    def case_question_payload(self, data):
+        get_payload = consumer_sync("get_question_payload")
+        question_id = data["questions"][0].id
+        session_id = data["session"].id
+        return lambda: get_payload(None, question_id, session_id)
+
+    def case_participant_join(self, data):
+        pin = data["session"].pin
+        names = count()
+
+        def operation():
+            serializer = ParticipantJoinSerializer(data={"pin": pin, "name": f"late joiner {next(names)}"})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return operation
+
+    def case_quiz_list(self, data):
+        queryset = QuizViewSet.queryset.filter(created_by=data["teacher"])
+        return lambda: QuizSerializer(queryset.all(), many=True).data
+
+    def case_quiz_import(self, data):
+        # Size-independent; see bench_import for the per-question comparison
+        document = {
+            "title": "Imported bank",
+            "description": "",
+            "questions": [
+                {
+                    "text": f"Question {i}",
+                    "time_limit": 30,
+                    "order": i,
+                    "choices": [{"text": f"Choice {j}", "is_correct": j == 0} for j in range(CHOICES_PER_QUESTION)],
+                }
+                for i in range(100)
+            ],
+        }
+        return lambda: import_quiz_document(document, data["teacher"])
+
+    def case_session_analytics(self, data):
+        # Uncached: one columnar fetch plus the statistics (NumPy if installed)
+        session = data["session"]
+        return lambda: session_analytics(session)
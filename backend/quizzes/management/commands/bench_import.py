@@ -0,0 +1,100 @@
+# backend/quizzes/management/commands/bench_import.py
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from quizzes.bulk import import_quiz_document
+from quizzes.models import Choice, Question, Quiz
+from quizzes.serializers import QuestionSerializer
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare importing a large question bank one row at a time (the original "
+        "QuestionSerializer.create: one INSERT per question and per choice), one "
+        "question at a time (QuestionSerializer, as QuestionViewSet does now) and "
+        "with the bulk importer. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=200)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        document = {
+            "title": "Benchmark bank",
+            "description": "",
+            "questions": [
+                {
+                    "text": f"Question {i}",
+                    "time_limit": 30,
+                    "order": i,
+                    "choices": [
+                        {"text": f"Choice {j}", "is_correct": j == 0}
+                        for j in range(options["choices"])
+                    ],
+                }
+                for i in range(options["questions"])
+            ],
+        }
+
+        self.stdout.write(
+            f"Importing {options['questions']} questions x {options['choices']} choices "
+            f"({connection.vendor}), best of {options['repeat']}"
+        )
+        paths = (
+            ("per-choice", self.import_per_choice),
+            ("per-question", self.import_per_question),
+            ("bulk", self.import_bulk),
+        )
+        for label, fn in paths:
+            best = None
+            for _ in range(options["repeat"]):
+                elapsed, queries = self.measure(fn, document)
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(f"  {label:<14} {best * 1000:9.1f} ms  {queries:6d} queries")
+
+    def measure(self, fn, document):
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username="bench-import-user")
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    fn(document, user)
+                    elapsed = time.perf_counter() - start
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed, len(ctx.captured_queries)
+
+    def import_per_choice(self, document, user):
+        """The baseline: validated as before, then saved row by row."""
+        quiz = Quiz.objects.create(title=document["title"], created_by=user)
+        for q in document["questions"]:
+            serializer = QuestionSerializer(data=q)
+            serializer.is_valid(raise_exception=True)
+            data = dict(serializer.validated_data)
+            choices = data.pop("choices", [])
+            question = Question.objects.create(quiz=quiz, **data)
+            for c in choices:
+                Choice.objects.create(question=question, **c)
+
+    def import_per_question(self, document, user):
+        quiz = Quiz.objects.create(title=document["title"], created_by=user)
+        for q in document["questions"]:
+            serializer = QuestionSerializer(data=q)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(quiz=quiz)
+
+    def import_bulk(self, document, user):
+        import_quiz_document(document, user)
@@ -0,0 +1,38 @@
+# backend/quizzes/management/commands/finalize_sessions.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from quizzes.archive import finalize_session
+from quizzes.models import Session
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot results (and archive answers, per CLASSPOINT_ANSWER_ARCHIVE) for "
+        "ended sessions that were not finalized yet, e.g. sessions that ended "
+        "while no socket, and so no live session actor, was connected. Live "
+        "actors only snapshot results at session end, so this also archives "
+        "their answers once every worker's final checkpoint is in."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age", type=int, default=60,
+            help="Only sessions that ended at least this many seconds ago (default 60)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options["min_age"])
+        pending = Session.objects.filter(is_active=False, ended_at__lte=cutoff).filter(
+            Q(result__isnull=True)
+            | Q(result__answers_archived="") & ~Q(result__answers_archived=settings.CLASSPOINT_ANSWER_ARCHIVE)
+        )
+        count = 0
+        for session in pending.iterator():
+            finalize_session(session, refresh=True)
+            count += 1
+        self.stdout.write(f"Finalized {count} session(s)")
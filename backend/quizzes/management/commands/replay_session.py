@@ -0,0 +1,64 @@
+# backend/quizzes/management/commands/replay_session.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.eventlog import event_log_backend, read_events, replay
+from quizzes.grading import response_columns, response_from_columns
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild a session's live state from its event log (CLASSPOINT_EVENT_LOG) "
+        "and print it as JSON: scoreboard, per-question answer counts (by choice, "
+        "or by value for numeric and text questions) and the question that was "
+        "open. Reads only the log, never the answers table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("session_id", type=int)
+        parser.add_argument("--indent", type=int, default=2)
+
+    def handle(self, *args, **options):
+        if not event_log_backend():
+            raise CommandError("The event log is off (CLASSPOINT_EVENT_LOG is empty)")
+        state = replay(read_events(options["session_id"]))
+        if not state.event_count:
+            raise CommandError(f"No events logged for session {options['session_id']}")
+
+        questions = {}
+        for (_, qid), event in state.answers.items():
+            stats = questions.setdefault(
+                qid, {"question_id": qid, "answers": 0, "correct": 0, "choice_counts": {}, "value_counts": {}}
+            )
+            stats["answers"] += 1
+            stats["correct"] += int(event["is_correct"])
+            # Events logged before choice_ids / value existed only have choice_id
+            columns = response_columns(
+                response_from_columns(event.get("choice_id"), event.get("choice_ids"), event.get("value", ""))
+            )
+            cid, cids = columns["choice_id"], columns["choice_ids"]
+            if cid is not None or cids is not None:
+                # Choices picked, each choice of a multi-select answer once
+                counts = stats["choice_counts"]
+                for key in (cid,) if cid is not None else cids:
+                    counts[str(key)] = counts.get(str(key), 0) + 1
+            else:
+                # Numeric / text answers, by the value given
+                counts = stats["value_counts"]
+                counts[columns["value"]] = counts.get(columns["value"], 0) + 1
+
+        scoreboard = sorted(
+            ({"participant_id": pid, "name": state.names.get(pid, ""), "score": score}
+             for pid, score in state.scores.items()),
+            key=lambda row: -row["score"],
+        )
+        self.stdout.write(json.dumps({
+            "session_id": options["session_id"],
+            "events": state.event_count,
+            "ended": state.ended,
+            "current_question": state.current_question,
+            "closed_questions": sorted(state.closed_questions),
+            "scoreboard": scoreboard,
+            "questions": sorted(questions.values(), key=lambda q: q["question_id"]),
+        }, indent=options["indent"] or None))
@@ -0,0 +1,25 @@
+# backend/quizzes/management/commands/serve.py
+from daphne.cli import CommandLineInterface
+from django.core.management.base import BaseCommand
+
+from quizzes.warmup import warm_up
+
+APPLICATION = "classpoint.asgi:application"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the server: warm this worker's caches (quizzes/warmup.py), then start "
+        "daphne on classpoint.asgi:application. Every argument goes to daphne, "
+        "e.g. `manage.py serve -b 0.0.0.0 -p 8000`."
+    )
+    requires_system_checks = []
+
+    def run_from_argv(self, argv):
+        # Daphne parses the arguments, so Django's parser must not reject them
+        self.execute(*argv[2:], force_color=False, no_color=False)
+
+    def handle(self, *args, **options):
+        # Before daphne binds its socket, so no request meets cold caches
+        warm_up()
+        CommandLineInterface().run([*args, APPLICATION])
@@ -0,0 +1,34 @@
+# backend/quizzes/metrics.py
+"""
+In-process counters for the live path (per worker).
+Cheap enough to bump on every frame; read through /api/metrics/.
+"""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_gauges = {}
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def gauge_max(name, value):
+    """Keep the highest value seen (e.g. queue high-water marks)."""
+    with _lock:
+        if value > _gauges.get(name, 0):
+            _gauges[name] = value
+
+
+def snapshot():
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
@@ -6,8 +6,6 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.tokens import AccessToken
 
 User = get_user_model()
 
@@ -16,6 +14,10 @@ def get_user_from_token(token):
     """
     Decode JWT token using SimpleJWT and return Django user.
     """
+    # Imported on first use: SimpleJWT loads DRF's settings machinery
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+
     try:
         access_token = AccessToken(token)
         user_id = access_token["user_id"]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_session_pin_alter_session_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionResult',
+            fields=[
+                ('session', models.OneToOneField(help_text='Finished session these results belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result', serialize=False, to='quizzes.session')),
+                ('leaderboard', models.JSONField(default=list, help_text='Final leaderboard, best first')),
+                ('question_stats', models.JSONField(default=list, help_text='Per-question statistics in quiz order')),
+                ('answer_vectors', models.JSONField(default=dict, help_text='Participant id -> chosen choice id per question (quiz order, null if unanswered)')),
+                ('participant_count', models.PositiveIntegerField(default=0)),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('answers_archived', models.CharField(blank=True, choices=[('', 'Kept in answers table'), ('table', 'Moved to archive table'), ('file', 'Moved to compressed file')], default='', help_text='Where the raw answers of this session live now', max_length=10)),
+                ('archive_path', models.CharField(blank=True, help_text='Archive file, if any', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('participant_id', models.BigIntegerField()),
+                ('question_id', models.BigIntegerField()),
+                ('choice_id', models.BigIntegerField(null=True)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('answered_at', models.DateTimeField()),
+                ('session', models.ForeignKey(help_text='Session the answer was given in', on_delete=django.db.models.deletion.CASCADE, related_name='archived_answers', to='quizzes.session')),
+            ],
+            options={
+                'ordering': ['answered_at'],
+            },
+        ),
+    ]
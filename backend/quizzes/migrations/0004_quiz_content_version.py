@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_session_results_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, help_text='Bumped on every quiz, question or choice edit (drives ETags)'),
+        ),
+    ]
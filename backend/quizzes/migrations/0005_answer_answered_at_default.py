@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quiz_content_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='answered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:24
+
+import django.db.models.deletion
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL; a plain CREATE INDEX on other test databases."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction; building the
+    # indexes this way does not block writes to these hot tables
+    atomic = False
+
+    dependencies = [
+        ('quizzes', '0005_answer_answered_at_default'),
+    ]
+
+    operations = [
+        # Before dropping the session FK index, which this one covers
+        AddIndexConcurrently(
+            model_name='participant',
+            index=models.Index(fields=['session', '-score', 'joined_at'], name='participant_scoreboard_idx'),
+        ),
+        migrations.AlterField(
+            model_name='participant',
+            name='session',
+            field=models.ForeignKey(db_index=False, help_text='Quiz session joined by this participant', on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='quizzes.session'),
+        ),
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['ended_at'], name='session_ended_at_idx'),
+        ),
+    ]
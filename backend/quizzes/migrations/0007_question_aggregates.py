@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionresult',
+            name='aggregated',
+            field=models.BooleanField(default=False, help_text="question_stats are included in the quiz's QuestionAggregate rows"),
+        ),
+        migrations.CreateModel(
+            name='QuestionAggregate',
+            fields=[
+                ('question', models.OneToOneField(help_text='Question these totals belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='quizzes.question')),
+                ('sessions', models.PositiveIntegerField(default=0, help_text='Finalized sessions included')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('choice_counts', models.JSONField(default=dict, help_text='Choice id -> times chosen')),
+                ('response_seconds', models.FloatField(default=0, help_text='Sum of seconds from session start to answer, over all attempts')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quiz', models.ForeignKey(help_text='Quiz of the question (denormalized for per-quiz reads)', on_delete=django.db.models.deletion.CASCADE, related_name='question_aggregates', to='quizzes.quiz')),
+            ],
+        ),
+    ]
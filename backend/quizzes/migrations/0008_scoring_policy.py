@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:59
+
+from django.db import migrations, models
+
+
+def score_existing_answers(apps, schema_editor):
+    # Before scoring policies every correct answer was worth one point
+    Answer = apps.get_model('quizzes', 'Answer')
+    Answer.objects.filter(is_correct=True).update(points=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_question_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='points',
+            field=models.PositiveIntegerField(default=0, help_text='Points awarded (scoring.py)'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='points',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Points for a correct answer'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='scoring',
+            field=models.CharField(default='flat', help_text="Scorer name: 'flat', 'speed' or a registered one", max_length=20),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='streak_bonus',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Extra points per consecutive correct answer before this one'),
+        ),
+        migrations.RunPython(score_existing_answers, migrations.RunPython.noop),
+    ]
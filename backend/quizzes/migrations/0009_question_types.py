@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0008_scoring_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='choice_ids',
+            field=models.JSONField(blank=True, help_text='Sorted choice ids selected (multi-select questions)', null=True),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='value',
+            field=models.CharField(blank=True, help_text='Submitted number or text', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='archivedanswer',
+            name='choice_ids',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedanswer',
+            name='value',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='accepted_answers',
+            field=models.JSONField(blank=True, default=list, help_text='Accepted answers, compared case- and space-insensitively (text)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='correct_value',
+            field=models.FloatField(blank=True, help_text='Correct number (numeric)', null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='question_type',
+            field=models.CharField(choices=[('single', 'One correct choice'), ('multi', 'Select all correct choices'), ('numeric', 'Number within a tolerance'), ('text', 'Short text answer')], default='single', help_text='How answers are given and graded', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tolerance',
+            field=models.FloatField(default=0, help_text='Allowed distance from correct_value (numeric)'),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='choice',
+            field=models.ForeignKey(blank=True, help_text='Choice selected (single-choice questions)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quizzes.choice'),
+        ),
+        migrations.AlterField(
+            model_name='sessionresult',
+            name='answer_vectors',
+            field=models.JSONField(default=dict, help_text='Participant id -> response per question: choice id, choice ids or text (quiz order, null if unanswered)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_question_types'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='question_type',
+            field=models.CharField(choices=[('single', 'One correct choice'), ('multi', 'Select all correct choices'), ('numeric', 'Number within a tolerance'), ('text', 'Short text answer'), ('wordcloud', 'Word cloud (free text, not graded)')], default='single', help_text='How answers are given and graded', max_length=10),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:34
+
+from django.db import migrations, models
+
+
+def drop_untimed_response_seconds(apps, schema_editor):
+    # Summed from session start, which is not comparable; from now on each
+    # session's snapshot adds time from the question opening instead
+    apps.get_model('quizzes', 'QuestionAggregate').objects.update(response_seconds=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0010_wordcloud_questions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionaggregate',
+            name='timed_attempts',
+            field=models.PositiveIntegerField(default=0, help_text="Attempts whose question's open time is known"),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='question_opened_at',
+            field=models.JSONField(blank=True, default=dict, help_text='Question id -> when the host first pushed it (ISO 8601), for response times'),
+        ),
+        migrations.AlterField(
+            model_name='questionaggregate',
+            name='response_seconds',
+            field=models.FloatField(default=0, help_text='Sum of seconds from the question opening to the answer, over timed attempts'),
+        ),
+        migrations.RunPython(drop_untimed_response_seconds, migrations.RunPython.noop),
+    ]
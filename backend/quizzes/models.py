@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 import uuid
 import random
@@ -19,6 +20,17 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, help_text="Creation timestamp")
     updated_at = models.DateTimeField(auto_now=True, help_text="Last modification timestamp")
     is_public = models.BooleanField(default=False, help_text="Can this quiz be shared publicly")
+    content_version = models.PositiveIntegerField(
+        default=1, help_text="Bumped on every quiz, question or choice edit (drives ETags)"
+    )
+    # Scoring policy (see scoring.py)
+    scoring = models.CharField(
+        max_length=20, default="flat", help_text="Scorer name: 'flat', 'speed' or a registered one"
+    )
+    points = models.PositiveSmallIntegerField(default=1, help_text="Points for a correct answer")
+    streak_bonus = models.PositiveSmallIntegerField(
+        default=0, help_text="Extra points per consecutive correct answer before this one"
+    )
 
     class Meta:
         ordering = ["-created_at"]
@@ -30,22 +42,40 @@ class Quiz(models.Model):
 
 
 class Question(models.Model):
+    SINGLE = "single"
+    MULTI = "multi"
+    NUMERIC = "numeric"
+    TEXT = "text"
+    WORDCLOUD = "wordcloud"
+    TYPE_CHOICES = [
+        (SINGLE, "One correct choice"),
+        (MULTI, "Select all correct choices"),
+        (NUMERIC, "Number within a tolerance"),
+        (TEXT, "Short text answer"),
+        (WORDCLOUD, "Word cloud (free text, not graded)"),
+    ]
+
     quiz = models.ForeignKey(
         Quiz, on_delete=models.CASCADE, related_name="questions", help_text="Parent quiz"
     )
     text = models.CharField(max_length=500, help_text="Question text")
+    question_type = models.CharField(
+        max_length=10, choices=TYPE_CHOICES, default=SINGLE, help_text="How answers are given and graded"
+    )
     time_limit = models.PositiveIntegerField(default=30, help_text="Time limit (in seconds)")
     order = models.PositiveIntegerField(default=0, help_text="Position of question in quiz")
+    # Answer key of numeric and text questions (choice questions use Choice.is_correct)
+    correct_value = models.FloatField(null=True, blank=True, help_text="Correct number (numeric)")
+    tolerance = models.FloatField(default=0, help_text="Allowed distance from correct_value (numeric)")
+    accepted_answers = models.JSONField(
+        default=list, blank=True, help_text="Accepted answers, compared case- and space-insensitively (text)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     # Keep these properties as they don't conflict
     @property
     def marks(self):
-        return 1
-
-    @property
-    def question_type(self):
-        return "single"
+        return self.quiz.points
 
     class Meta:
         ordering = ["order"]
@@ -93,6 +123,16 @@ class Session(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    question_opened_at = models.JSONField(
+        default=dict, blank=True,
+        help_text="Question id -> when the host first pushed it (ISO 8601), for response times",
+    )
+
+    class Meta:
+        indexes = [
+            # finalize_sessions sweeps ended sessions by end time
+            models.Index(fields=["ended_at"], condition=models.Q(is_active=False), name="session_ended_at_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.pin:
@@ -118,6 +158,8 @@ class Participant(models.Model):
         on_delete=models.CASCADE,
         related_name="participants",
         help_text="Quiz session joined by this participant",
+        # Covered by participant_scoreboard_idx, which leads with session
+        db_index=False,
     )
     name = models.CharField(max_length=100, help_text="Name of the participant")
     score = models.IntegerField(default=0)
@@ -131,6 +173,10 @@ class Participant(models.Model):
     class Meta:
         unique_together = ("session", "name")
         ordering = ["-score"]
+        indexes = [
+            # build_scoreboard: one session, best first, ties by join time
+            models.Index(fields=["session", "-score", "joined_at"], name="participant_scoreboard_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.session.pin})"
@@ -152,11 +198,19 @@ class Answer(models.Model):
     choice = models.ForeignKey(
         Choice,
         on_delete=models.CASCADE,
+        null=True,
+        blank=True,
         related_name="answers",
-        help_text="Choice selected",
+        help_text="Choice selected (single-choice questions)",
+    )
+    choice_ids = models.JSONField(
+        null=True, blank=True, help_text="Sorted choice ids selected (multi-select questions)"
     )
+    value = models.CharField(max_length=255, blank=True, help_text="Submitted number or text")
     is_correct = models.BooleanField(default=False)
-    answered_at = models.DateTimeField(auto_now_add=True)
+    points = models.PositiveIntegerField(default=0, help_text="Points awarded (scoring.py)")
+    # default (not auto_now_add) so checkpointed answers keep their real time
+    answered_at = models.DateTimeField(default=timezone.now)
 
     # Keep this property as it doesn't conflict
     @property
@@ -168,4 +222,114 @@ class Answer(models.Model):
         ordering = ["answered_at"]
 
     def __str__(self):
-        return f"{self.participant.name} → {self.question.text[:40]} ({'✓' if self.is_correct else '✗'})"
\ No newline at end of file
+        return f"{self.participant.name} → {self.question.text[:40]} ({'✓' if self.is_correct else '✗'})"
+
+class SessionResult(models.Model):
+    """
+    Compact, denormalized results of a finished session.
+    Written once by `quizzes.archive.finalize_session` so ended sessions can be
+    served without touching the Participant / Answer tables.
+    """
+    ARCHIVE_NONE = ""
+    ARCHIVE_TABLE = "table"
+    ARCHIVE_FILE = "file"
+    ARCHIVE_CHOICES = [
+        (ARCHIVE_NONE, "Kept in answers table"),
+        (ARCHIVE_TABLE, "Moved to archive table"),
+        (ARCHIVE_FILE, "Moved to compressed file"),
+    ]
+
+    session = models.OneToOneField(
+        Session,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="result",
+        help_text="Finished session these results belong to",
+    )
+    leaderboard = models.JSONField(default=list, help_text="Final leaderboard, best first")
+    question_stats = models.JSONField(default=list, help_text="Per-question statistics in quiz order")
+    answer_vectors = models.JSONField(
+        default=dict,
+        help_text="Participant id -> response per question: choice id, choice ids or text "
+        "(quiz order, null if unanswered)",
+    )
+    participant_count = models.PositiveIntegerField(default=0)
+    answer_count = models.PositiveIntegerField(default=0)
+    answers_archived = models.CharField(
+        max_length=10, blank=True, choices=ARCHIVE_CHOICES, default=ARCHIVE_NONE,
+        help_text="Where the raw answers of this session live now",
+    )
+    archive_path = models.CharField(max_length=500, blank=True, help_text="Archive file, if any")
+    aggregated = models.BooleanField(
+        default=False, help_text="question_stats are included in the quiz's QuestionAggregate rows"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Results for session {self.session_id}"
+
+
+class ArchivedAnswer(models.Model):
+    """
+    Cold copy of an Answer row for a finished session.
+    Plain integer columns (no foreign keys) keep inserts cheap and leave the
+    live tables' indexes alone.
+    """
+    session = models.ForeignKey(
+        Session,
+        on_delete=models.CASCADE,
+        related_name="archived_answers",
+        help_text="Session the answer was given in",
+    )
+    participant_id = models.BigIntegerField()
+    question_id = models.BigIntegerField()
+    choice_id = models.BigIntegerField(null=True)
+    choice_ids = models.JSONField(null=True)
+    value = models.CharField(max_length=255, blank=True)
+    is_correct = models.BooleanField(default=False)
+    answered_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["answered_at"]
+
+    def __str__(self):
+        return f"Archived answer {self.participant_id} → {self.question_id}"
+
+
+class QuestionAggregate(models.Model):
+    """
+    Running totals for one question across every finalized session of its quiz.
+    Maintained incrementally from SessionResult snapshots by
+    `quizzes.aggregates`, so quiz-wide analytics never scan the Answer table.
+    """
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="aggregate",
+        help_text="Question these totals belong to",
+    )
+    quiz = models.ForeignKey(
+        Quiz,
+        on_delete=models.CASCADE,
+        related_name="question_aggregates",
+        help_text="Quiz of the question (denormalized for per-quiz reads)",
+    )
+    sessions = models.PositiveIntegerField(default=0, help_text="Finalized sessions included")
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    choice_counts = models.JSONField(default=dict, help_text="Choice id -> times chosen")
+    timed_attempts = models.PositiveIntegerField(
+        default=0, help_text="Attempts whose question's open time is known"
+    )
+    response_seconds = models.FloatField(
+        default=0, help_text="Sum of seconds from the question opening to the answer, over timed attempts"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def mean_response_seconds(self):
+        return self.response_seconds / self.timed_attempts if self.timed_attempts else None
+
+    def __str__(self):
+        return f"Totals for question {self.question_id}"
@@ -0,0 +1,159 @@
+# backend/quizzes/outbound.py
+"""
+Per-connection outbound queues.
+
+Group message handlers only enqueue; a writer task per socket does the actual
+`send`. That keeps the channel layer's receive loop moving even when a
+student's phone is on bad Wi-Fi, so the per-channel capacity never fills up.
+
+Policy:
+  - state frames (scoreboards, presence counts) are droppable and carry a
+    coalesce key: only the newest one per key matters, so a new frame
+    replaces a waiting frame with the same key (counted as "merged");
+    when the queue is full the oldest waiting droppable frame is dropped first
+  - every other frame (questions, acks, errors) is never dropped; if the
+    queue is full of those, or the oldest frame has waited longer than
+    `max_delay`, the client is too slow and gets disconnected
+
+Under daphne `send` only hands the frame to the server's write buffer, so
+it returns at once however slow the client is, and the queue itself never
+backs up. The reliable signal is the client: every `probe_interval` seconds
+a {"type": "probe", "seq": n} frame is queued, and clients answer with a
+"probe_ack" action carrying the seq (see `ack`). Once a client has acked a
+probe, one left unacked for longer than `max_delay` disconnects it; clients
+that never ack probes are only held to the queue limits above.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients we give up on
+SLOW_CLIENT_CLOSE_CODE = 4008
+
+
+class OutboundQueue:
+    def __init__(self, send, close, max_frames=None, max_delay=None, probe_interval=None):
+        self.send = send
+        self.close = close
+        self.max_frames = max_frames or getattr(settings, "CLASSPOINT_WS_QUEUE_MAX_FRAMES", 64)
+        self.max_delay = max_delay or getattr(settings, "CLASSPOINT_WS_SLOW_CLIENT_SECONDS", 10.0)
+        self.probe_interval = probe_interval or getattr(settings, "CLASSPOINT_WS_PROBE_SECONDS", 5.0)
+        self.frames = deque()  # (coalesce_key or None, enqueued_at, text)
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.sending_since = None
+        # Probes not acked yet, oldest first: (seq, queued_at)
+        self.probes = deque()
+        self.probe_seq = 0
+        self.acks_probes = False
+        loop = asyncio.get_running_loop()
+        self.task = loop.create_task(self._drain())
+        self.probe_task = loop.create_task(self._probe())
+
+    def put(self, text, coalesce_key=None):
+        """Queue a frame; frames with a `coalesce_key` are droppable."""
+        if self.closed:
+            return
+        now = time.monotonic()
+        droppable = coalesce_key is not None
+        if droppable:
+            for i, (key, _, _) in enumerate(self.frames):
+                if key == coalesce_key:
+                    del self.frames[i]
+                    metrics.incr(f"ws.{coalesce_key}_merged")
+                    break
+        elif len(self.frames) >= self.max_frames and not self._drop_oldest_droppable():
+            self._give_up("queue_full")
+            return
+
+        oldest = self.sending_since or (self.frames[0][1] if self.frames else None)
+        if oldest is not None and now - oldest > self.max_delay:
+            self._give_up("too_slow")
+            return
+
+        if droppable and len(self.frames) >= self.max_frames and not self._drop_oldest_droppable():
+            metrics.incr(f"ws.{coalesce_key}_dropped")
+            return
+        self.frames.append((coalesce_key, now, text))
+        metrics.gauge_max("ws.queue_high_water", len(self.frames))
+        self.wakeup.set()
+
+    def _drop_oldest_droppable(self):
+        for i, (key, _, _) in enumerate(self.frames):
+            if key is not None:
+                del self.frames[i]
+                metrics.incr(f"ws.{key}_dropped")
+                return True
+        return False
+
+    def ack(self, seq):
+        """Record the client's "probe_ack" for probe `seq` (and every earlier one)."""
+        if not isinstance(seq, int):
+            return
+        self.acks_probes = True
+        while self.probes and self.probes[0][0] <= seq:
+            self.probes.popleft()
+
+    def _give_up(self, reason):
+        metrics.incr("ws.slow_disconnects")
+        metrics.incr(f"ws.slow_disconnects.{reason}")
+        self.stop()
+        asyncio.get_running_loop().create_task(self.close(code=SLOW_CLIENT_CLOSE_CODE))
+
+    async def _probe(self):
+        try:
+            while not self.closed:
+                await asyncio.sleep(self.probe_interval)
+                now = time.monotonic()
+                if self.acks_probes and self.probes and now - self.probes[0][1] > self.max_delay:
+                    self._give_up("probe_timeout")
+                    return
+                if not self.acks_probes:
+                    # Only the newest probe matters until the client acks one
+                    self.probes.clear()
+                self.probe_seq += 1
+                self.probes.append((self.probe_seq, now))
+                self.put(json.dumps({"type": "probe", "seq": self.probe_seq}))
+        except asyncio.CancelledError:
+            pass
+
+    async def _drain(self):
+        try:
+            while True:
+                while not self.frames:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                _, enqueued_at, text = self.frames.popleft()
+                self.sending_since = enqueued_at
+                await self.send(text_data=text)
+                self.sending_since = None
+                metrics.incr("ws.frames_sent")
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # A send that fails leaves the socket unusable; close it rather
+            # than leave a client that silently receives nothing
+            logger.exception("Outbound send failed, closing the socket")
+            metrics.incr("ws.send_errors")
+            self.stop()
+            try:
+                await self.close(code=1011)
+            except Exception:
+                pass
+
+    def stop(self):
+        self.closed = True
+        self.frames.clear()
+        self.probes.clear()
+        current = asyncio.current_task()
+        for task in (self.task, self.probe_task):
+            if task is not current and not task.done():
+                task.cancel()
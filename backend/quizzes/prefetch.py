@@ -0,0 +1,58 @@
+# backend/quizzes/prefetch.py
+"""
+Question pipelining (CLASSPOINT_QUESTION_PREFETCH).
+
+When a question opens, the next question's student payload (text, choices,
+time limit; never correctness) is sent to every socket as an inactive
+`question_prefetch` frame. When the teacher then advances, only a tiny
+`question_activate` frame goes out, so the slide change does not wait for a
+database fetch and a full payload per socket. The full payload is re-read
+right after activation and re-sent as a normal `question` frame only if the
+teacher edited it in the meantime.
+
+Each worker keeps the payloads it has prefetched per PIN, so the host's
+worker can tell whether a pushed question was prefetched and other workers
+can serve sockets that connected after the prefetch went out, and drops
+them when the session ends.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+
+# Prefetched payloads kept per session, and sessions kept per worker
+PAYLOADS_PER_SESSION = 4
+SESSIONS_LIMIT = 1024
+
+_payloads = OrderedDict()  # pin -> OrderedDict(question_id -> payload)
+
+
+def prefetch_enabled():
+    return getattr(settings, "CLASSPOINT_QUESTION_PREFETCH", False)
+
+
+def remember(pin, payload):
+    """Keep a prefetched payload for this worker."""
+    session = _payloads.get(pin)
+    if session is None:
+        session = _payloads[pin] = OrderedDict()
+        if len(_payloads) > SESSIONS_LIMIT:
+            _payloads.popitem(last=False)
+    else:
+        _payloads.move_to_end(pin)
+    session[payload["id"]] = payload
+    session.move_to_end(payload["id"])
+    if len(session) > PAYLOADS_PER_SESSION:
+        session.popitem(last=False)
+
+
+def lookup(pin, question_id):
+    """The prefetched payload for a question, or None."""
+    session = _payloads.get(pin)
+    if session is None:
+        return None
+    return session.get(question_id)
+
+
+def forget(pin):
+    """Drop a session's payloads (when it ends)."""
+    _payloads.pop(pin, None)
@@ -0,0 +1,274 @@
+# backend/quizzes/presence.py
+"""
+Live presence for the host: how many students are connected and how many
+have answered the current question, without polling the database.
+
+Each worker keeps a `SessionPresence` per PIN with its joined student sockets
+and when each was last seen: anything a socket sends counts, including the
+"ping" action and "probe_ack" replies to the outbound queue's probes, so
+clients heartbeat on their own. A socket not seen for
+CLASSPOINT_PRESENCE_TTL_SECONDS stops counting as connected, whether or not
+its disconnect ever arrives. The answered set is built from the `answers`
+events every worker already receives on `score.update`, so it is complete on
+every worker. A student with several tabs open counts once.
+
+Connected counts need every worker's sockets. With CLASSPOINT_PRESENCE_REDIS
+set, every worker mirrors its connected participants into one sorted set per
+session, scored by last seen + TTL and refreshed periodically, so
+participants of a crashed worker age out with a single ZREMRANGEBYSCORE.
+Without it, each worker's frame carries its worker id and participant ids,
+and the host socket reports the union over workers (see `merge_workers`);
+workers re-send periodically, so a vanished worker's entry expires the same
+way.
+
+Changes are pushed to the session's host group as "presence" frames, at most
+once per CLASSPOINT_PRESENCE_INTERVAL_SECONDS per worker.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .latency import WORKER_ID
+from .scoreboard import host_group_name
+
+logger = logging.getLogger(__name__)
+
+# How many answer event ids each session remembers for de-duplication
+SEEN_EVENTS_LIMIT = 4096
+
+
+def presence_ttl():
+    return getattr(settings, "CLASSPOINT_PRESENCE_TTL_SECONDS", 45)
+
+
+class RedisPresenceStore:
+    """Sorted set per session: member = participant id, score = expiry timestamp."""
+
+    def __init__(self, url, prefix="classpoint:presence:"):
+        import redis.asyncio as redis  # optional; installed with channels_redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def refresh(self, pin, last_seen):
+        """Extend the members' expiry; `last_seen` maps member -> time.time() last seen."""
+        if not last_seen:
+            return
+        ttl = presence_ttl()
+        key = self.prefix + pin
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {member: seen + ttl for member, seen in last_seen.items()})
+            pipe.expire(key, ttl * 2)
+            await pipe.execute()
+
+    async def remove(self, pin, member):
+        await self.client.zrem(self.prefix + pin, member)
+
+    async def count(self, pin):
+        key = self.prefix + pin
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            pipe.zcard(key)
+            _, connected = await pipe.execute()
+        return connected
+
+
+_store = None
+
+
+def presence_store():
+    """The shared presence store, or None when presence is per worker."""
+    global _store
+    url = getattr(settings, "CLASSPOINT_PRESENCE_REDIS", None)
+    if url and _store is None:
+        _store = RedisPresenceStore(url)
+    return _store if url else None
+
+
+class SessionPresence:
+    def __init__(self, pin):
+        self.pin = pin
+        self.refcount = 0          # consumers of this session on this worker
+        self.sockets = {}          # channel_name -> participant_id
+        self.last_seen = {}        # channel_name -> time.time() it last sent anything
+        self.question_id = None
+        self.answered = set()      # participant ids that answered question_id
+        self.seen_events = OrderedDict()
+        self.last_sent = 0.0
+        self.flush_handle = None
+        self.refresher = None
+
+    # ------- Updates (called by consumers) -------
+
+    def add(self, channel_name, participant_id):
+        now = time.time()
+        self.sockets[channel_name] = participant_id
+        self.last_seen[channel_name] = now
+        store = presence_store()
+        if store is not None:
+            self._background(store.refresh(self.pin, {participant_id: now}))
+        if self.refresher is None:
+            self.refresher = asyncio.get_running_loop().create_task(self._refresh_loop())
+        self.changed()
+
+    def seen(self, channel_name):
+        """The socket sent something (a heartbeat or any other action)."""
+        if channel_name not in self.sockets:
+            return
+        now = time.time()
+        stale = now - self.last_seen[channel_name] > presence_ttl()
+        self.last_seen[channel_name] = now
+        if stale:
+            self.changed()
+
+    def remove(self, channel_name):
+        participant_id = self.sockets.pop(channel_name, None)
+        self.last_seen.pop(channel_name, None)
+        if participant_id is None:
+            return
+        store = presence_store()
+        if store is not None and participant_id not in self.sockets.values():
+            self._background(store.remove(self.pin, participant_id))
+        self.changed()
+
+    def question_opened(self, question_id):
+        if question_id != self.question_id:
+            self.question_id = question_id
+            self.answered = set()
+            self.changed()
+
+    def answer_seen(self, event):
+        """Record an `answers` event from score.update (each event once)."""
+        event_id = event.get("id")
+        if event_id in self.seen_events:
+            return
+        self.seen_events[event_id] = True
+        if len(self.seen_events) > SEEN_EVENTS_LIMIT:
+            self.seen_events.popitem(last=False)
+        if event.get("question_id") != self.question_id:
+            return
+        if event.get("participant_id") not in self.answered:
+            self.answered.add(event.get("participant_id"))
+            self.changed()
+
+    def connected(self):
+        """participant id -> last seen, for this worker's sockets seen within the TTL."""
+        cutoff = time.time() - presence_ttl()
+        connected = {}
+        for channel_name, participant_id in self.sockets.items():
+            seen = self.last_seen[channel_name]
+            if seen >= cutoff and seen > connected.get(participant_id, 0):
+                connected[participant_id] = seen
+        return connected
+
+    # ------- Host frames -------
+
+    async def counts(self):
+        connected = self.connected()
+        frame = {
+            "type": "presence.update",
+            "connected": len(connected),
+            "answered": len(self.answered),
+            "question_id": self.question_id,
+        }
+        store = presence_store()
+        if store is not None:
+            try:
+                frame["connected"] = await store.count(self.pin)
+                return frame
+            except Exception:
+                logger.warning("Presence store unavailable; merging worker counts instead", exc_info=True)
+        # The host socket merges these over workers
+        frame["worker"] = WORKER_ID
+        frame["participants"] = sorted(connected)
+        return frame
+
+    def changed(self):
+        """Schedule a host frame, at most one per interval (trailing edge)."""
+        if self.flush_handle is not None:
+            return
+        interval = getattr(settings, "CLASSPOINT_PRESENCE_INTERVAL_SECONDS", 1.0)
+        delay = max(0.0, self.last_sent + interval - time.monotonic())
+        loop = asyncio.get_running_loop()
+        self.flush_handle = loop.call_later(delay, lambda: self._background(self.flush()))
+
+    async def flush(self):
+        self.flush_handle = None
+        self.last_sent = time.monotonic()
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            await channel_layer.group_send(host_group_name(self.pin), await self.counts())
+
+    async def _refresh_loop(self):
+        """
+        Keep this worker's live sockets from expiring in the shared store or
+        at the host, and report sockets that went stale.
+        """
+        try:
+            while self.sockets:
+                await asyncio.sleep(presence_ttl() / 3)
+                store = presence_store()
+                if store is not None:
+                    try:
+                        await store.refresh(self.pin, self.connected())
+                    except Exception:
+                        logger.warning("Presence refresh failed for session %s", self.pin, exc_info=True)
+                self.changed()
+        finally:
+            self.refresher = None
+
+    def close(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.refresher is not None:
+            self.refresher.cancel()
+
+    def _background(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        task.add_done_callback(_log_failure)
+
+
+def merge_workers(workers, event):
+    """
+    Fold a per-worker presence frame into `workers` (worker -> (expires,
+    participant ids)), kept by each host socket, and return the number of
+    distinct participants connected across workers.
+    """
+    now = time.time()
+    workers[event["worker"]] = (now + presence_ttl(), set(event.get("participants", ())))
+    connected = set()
+    for worker, (expires, participants) in list(workers.items()):
+        if expires < now:
+            del workers[worker]
+        else:
+            connected |= participants
+    return len(connected)
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Presence update failed", exc_info=task.exception())
+
+
+_sessions = {}
+
+
+def acquire_presence(pin):
+    """Get (or create) this worker's presence for a PIN; pair with release_presence."""
+    presence = _sessions.get(pin)
+    if presence is None:
+        presence = _sessions[pin] = SessionPresence(pin)
+    presence.refcount += 1
+    return presence
+
+
+def release_presence(presence):
+    presence.refcount -= 1
+    if presence.refcount <= 0 and _sessions.get(presence.pin) is presence:
+        del _sessions[presence.pin]
+        presence.close()
@@ -0,0 +1,64 @@
+# backend/quizzes/scoreboard.py
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import Participant
+
+
+def session_group_name(pin):
+    """Channels group every socket of a session joins."""
+    return f"session_{pin}"
+
+
+def host_group_name(pin):
+    """Channels group of the session's host sockets only."""
+    return f"session_{pin}_hosts"
+
+
+def scoreboard_rows(session_id):
+    """(id, name, score) of a session's participants, best first."""
+    # Served by participant_scoreboard_idx (session, -score, joined_at)
+    return (
+        Participant.objects.filter(session_id=session_id)
+        .order_by("-score", "joined_at")
+        .values_list("id", "name", "score")
+    )
+
+
+def build_scoreboard(session_id):
+    """
+    Return [{participant_id, name, score}] for a session, best first.
+    Reads only the three columns it needs.
+    """
+    rows = scoreboard_rows(session_id)
+    return [{"participant_id": pid, "name": name, "score": score or 0} for pid, name, score in rows]
+
+
+def broadcast_scoreboard(pin, session_id, answers=(), origin=None):
+    """
+    Tell every socket of the session about new answers and the scoreboard.
+    For sync callers (REST views); consumers use group_send directly.
+    With session actors enabled the scoreboard is left out: each worker's
+    actor applies `answers` and renders its own (the DB may lag a checkpoint).
+    `origin` is the id of the actor that graded the answers, if one did.
+    """
+    from .actors import actors_enabled, answer_event
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {"type": "score.update", "answers": [answer_event(r, origin) for r in answers]}
+    if answers and not any(r.score_delta for r in answers):
+        # Nobody's score moved (e.g. word cloud answers): no scoreboard to resend
+        message["scores_changed"] = False
+    else:
+        message["scoreboard"] = None if actors_enabled() else build_scoreboard(session_id)
+    async_to_sync(channel_layer.group_send)(session_group_name(pin), message)
+
+
+def broadcast_session_end(pin):
+    """Ask every worker's actor for this session to checkpoint and finalize."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(session_group_name(pin), {"type": "session.end"})
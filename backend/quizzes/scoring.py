@@ -0,0 +1,98 @@
+# backend/quizzes/scoring.py
+"""
+Answer scoring.
+
+A quiz picks a scorer by name (`Quiz.scoring`) and sets its points per
+correct answer (`Quiz.points`) and streak bonus (`Quiz.streak_bonus`). The
+three fields travel with the rows the answer paths already read (the actor's
+session row, the grading context), so scoring an answer is arithmetic on
+values in memory: no query, no lookup beyond the scorer registry.
+
+Built-in scorers:
+
+  - "flat":  `points` for every correct answer (the default; with points=1
+             the score is the number of correct answers, as before)
+  - "speed": `points` for an instant answer, falling linearly to half of it
+             at the question's time limit. Needs the time the question was
+             opened, which only the session actor holds (time.monotonic()
+             on the worker that opened it); without it (the REST fallback,
+             or a question that is not open on this worker) the answer
+             scores as if it came at the time limit, never as instant.
+
+On top of either, a correct answer earns `streak_bonus` for each consecutive
+correct answer before it, up to STREAK_CAP of them. Streaks are kept by the
+actor (`LiveRoster.advance_streak`); the REST fallback grades without one.
+
+Other scorers can be added with `register_scorer`, e.g. from an AppConfig's
+ready(); a scorer is `fn(policy, elapsed, time_limit) -> points` for a
+correct answer.
+"""
+from dataclasses import dataclass
+
+# Consecutive correct answers that still add to the bonus
+STREAK_CAP = 5
+# Share of `points` left for an answer at the time limit ("speed")
+SPEED_FLOOR = 0.5
+# Points per answer are stored in 16-bit live columns
+MAX_POINTS = 0xFFFF
+
+_scorers = {}
+
+
+def register_scorer(name):
+    """Decorator registering a scorer under `name` (the value of Quiz.scoring)."""
+    def decorator(fn):
+        _scorers[name] = fn
+        return fn
+    return decorator
+
+
+def scorer_names():
+    return sorted(_scorers)
+
+
+@register_scorer("flat")
+def flat_points(policy, elapsed, time_limit):
+    return policy.points
+
+
+@register_scorer("speed")
+def speed_points(policy, elapsed, time_limit):
+    if elapsed is None:
+        # Unknown answer time: the floor, so an answer cannot win speed points by
+        # going around the open question (the REST fallback, a question not open)
+        late = 1.0
+    elif not time_limit:
+        return policy.points
+    else:
+        late = min(max(elapsed / time_limit, 0.0), 1.0)
+    return round(policy.points * (1.0 - (1.0 - SPEED_FLOOR) * late))
+
+
+@dataclass(frozen=True)
+class ScoringPolicy:
+    scoring: str = "flat"
+    points: int = 1
+    streak_bonus: int = 0
+
+    def score(self, is_correct, elapsed=None, time_limit=None, streak=0):
+        """
+        Points for one answer. `elapsed` is seconds since the question opened
+        (None if unknown), `streak` the consecutive correct answers before it.
+        """
+        if not is_correct:
+            return 0
+        points = _scorers.get(self.scoring, flat_points)(self, elapsed, time_limit)
+        if self.streak_bonus and streak:
+            points += self.streak_bonus * min(streak, STREAK_CAP)
+        return min(points, MAX_POINTS)
+
+
+DEFAULT_POLICY = ScoringPolicy()
+
+
+def policy_from_row(scoring, points, streak_bonus):
+    """A ScoringPolicy from Quiz (scoring, points, streak_bonus) column values."""
+    if (scoring, points, streak_bonus) == ("flat", 1, 0):
+        return DEFAULT_POLICY
+    return ScoringPolicy(scoring, points, streak_bonus)
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from .models import Quiz, Question, Choice, Session, Participant, Answer
+from .caching import bump_content_version
+from .scoring import scorer_names
 
 User = get_user_model()
 
@@ -40,31 +42,100 @@ class ChoiceSerializer(serializers.ModelSerializer):
         fields = ("id", "text", "is_correct")
 
 
+def validate_answer_key(question_type, correct_value, accepted_answers):
+    """Per-type checks that a question can be graded (editor and bulk import)."""
+    if question_type == Question.NUMERIC and correct_value is None:
+        raise serializers.ValidationError({"correct_value": "Numeric questions need a correct value."})
+    if question_type == Question.TEXT and not any(a.strip() for a in accepted_answers):
+        raise serializers.ValidationError({"accepted_answers": "Text questions need an accepted answer."})
+
+
 class QuestionSerializer(serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True, required=False)
 
     class Meta:
         model = Question
-        fields = ("id", "text", "question_type", "marks", "choices", "order", "time_limit")
+        fields = (
+            "id", "text", "question_type", "marks", "choices", "order", "time_limit",
+            "correct_value", "tolerance", "accepted_answers",
+        )
+
+    def validate_accepted_answers(self, value):
+        if not isinstance(value, list) or not all(isinstance(a, str) for a in value):
+            raise serializers.ValidationError("Must be a list of strings.")
+        return value
+
+    def validate(self, attrs):
+        validate_answer_key(
+            attrs.get("question_type", getattr(self.instance, "question_type", Question.SINGLE)),
+            attrs.get("correct_value", getattr(self.instance, "correct_value", None)),
+            attrs.get("accepted_answers", getattr(self.instance, "accepted_answers", [])),
+        )
+        return attrs
 
     def create(self, validated_data):
         choices_data = validated_data.pop("choices", [])
-        question = Question.objects.create(**validated_data)
         for c in choices_data:
-            Choice.objects.create(question=question, **c)
+            c.pop("id", None)
+        with transaction.atomic():
+            question = Question.objects.create(**validated_data)
+            Choice.objects.bulk_create([Choice(question=question, **c) for c in choices_data])
+            bump_content_version(question.quiz_id)
         return question
 
     def update(self, instance, validated_data):
         choices_data = validated_data.pop("choices", None)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        if choices_data is not None:
-            instance.choices.all().delete()
-            for c in choices_data:
-                Choice.objects.create(question=instance, **c)
+        changed = [attr for attr, value in validated_data.items() if getattr(instance, attr) != value]
+        with transaction.atomic():
+            for attr in changed:
+                setattr(instance, attr, validated_data[attr])
+            if changed:
+                instance.save(update_fields=changed)
+            if choices_data is not None:
+                self.sync_choices(instance, choices_data)
+            bump_content_version(instance.quiz_id)
         return instance
 
+    def sync_choices(self, question, choices_data):
+        """
+        Apply the submitted choice list as a diff against the stored one.
+        Choices are matched by `id`: unchanged ones are left alone (so their
+        answers survive), changed ones go through one bulk_update, new ones
+        through one bulk_create, and only choices missing from the list are deleted.
+        """
+        existing = {c.id: c for c in question.choices.all()}
+        unknown = [c["id"] for c in choices_data if c.get("id") is not None and c["id"] not in existing]
+        if unknown:
+            raise serializers.ValidationError(
+                {"choices": f"Choices {unknown} do not belong to this question."}
+            )
+
+        to_update, to_create, kept = [], [], set()
+        for c in choices_data:
+            cid = c.get("id")
+            if cid is None:
+                to_create.append(
+                    Choice(question=question, text=c["text"], is_correct=c.get("is_correct", False))
+                )
+                continue
+            kept.add(cid)
+            choice = existing[cid]
+            dirty = False
+            for attr in ("text", "is_correct"):
+                if attr in c and getattr(choice, attr) != c[attr]:
+                    setattr(choice, attr, c[attr])
+                    dirty = True
+            if dirty:
+                to_update.append(choice)
+
+        removed = existing.keys() - kept
+        if removed:
+            Choice.objects.filter(id__in=removed).delete()
+        if to_update:
+            Choice.objects.bulk_update(to_update, ["text", "is_correct"])
+        if to_create:
+            Choice.objects.bulk_create(to_create)
+
 
 class QuizSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, required=False, read_only=True)
@@ -72,13 +143,20 @@ class QuizSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Quiz
-        fields = ("id", "title", "created_by", "created_at", "questions")
+        fields = (
+            "id", "title", "created_by", "created_at", "scoring", "points", "streak_bonus", "questions",
+        )
 
 
 class QuizCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quiz
-        fields = ("id", "title")
+        fields = ("id", "title", "scoring", "points", "streak_bonus")
+
+    def validate_scoring(self, value):
+        if value not in scorer_names():
+            raise serializers.ValidationError(f"Unknown scoring; choose one of {', '.join(scorer_names())}")
+        return value
 
 
 # -------------------------
@@ -125,9 +203,9 @@ class ParticipantJoinSerializer(serializers.Serializer):
     def validate(self, attrs):
         pin = attrs.get("pin")
         try:
-            session = Session.objects.get(pin=pin)
+            session = Session.objects.get(pin=pin, is_active=True)
         except Session.DoesNotExist:
-            raise serializers.ValidationError({"pin": "Session with this PIN does not exist."})
+            raise serializers.ValidationError({"pin": "No running session with this PIN."})
         attrs["session_obj"] = session
         return attrs
 
@@ -143,5 +221,5 @@ class ParticipantJoinSerializer(serializers.Serializer):
 class AnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Answer
-        fields = ("id", "participant", "question", "choice", "answered_at", "correct")
+        fields = ("id", "participant", "question", "choice", "choice_ids", "value", "answered_at", "correct")
         read_only_fields = ("answered_at", "correct")
\ No newline at end of file
@@ -1,3 +1,1782 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import ThreadSensitiveContext
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import analytics, eventlog, idempotency, livestate, metrics, throttling, warmup
+from .aggregates import apply_session_stats, quiz_analytics
+from .actors import SessionActor, acquire_actor, live_actor, live_window, release_actor
+from .archive import finalize_session
+from .caching import session_content_key
+from .consumers import SessionConsumer
+from .export import EXPORT_CHUNK_SIZE
+from .grading import get_answer_key, grade_answer
+from .layers import LocalChannelLayer
+from .livestate import LiveRoster
+from .models import Answer, ArchivedAnswer, Choice, Participant, Question, Quiz, Session, SessionResult
+from .outbound import SLOW_CLIENT_CLOSE_CODE, OutboundQueue
+from .presence import acquire_presence, merge_workers, release_presence
+from .routing import websocket_urlpatterns
+from .scoreboard import host_group_name, scoreboard_rows, session_group_name
+from .scoring import ScoringPolicy
+
+User = get_user_model()
+
+# Seed volumes for the plan tests, which only run when asked for, e.g.
+# CLASSPOINT_PLAN_PARTICIPANTS=100000 CLASSPOINT_PLAN_QUESTIONS=50 (5M answers)
+PLAN_PARTICIPANTS = int(os.environ.get("CLASSPOINT_PLAN_PARTICIPANTS") or 0)
+PLAN_QUESTIONS = int(os.environ.get("CLASSPOINT_PLAN_QUESTIONS", 10))
+PLAN_SESSIONS = int(os.environ.get("CLASSPOINT_PLAN_SESSIONS") or max(1, PLAN_PARTICIPANTS // 25))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Query plan tests need PostgreSQL")
+@unittest.skipUnless(PLAN_PARTICIPANTS, "Set CLASSPOINT_PLAN_PARTICIPANTS to run the query plan tests")
+class HotQueryPlanTests(TestCase):
+    """
+    Seed realistic volumes and check the hot queries are served by indexes.
+    Sequential scans on these tables mean a missing or unusable index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create(username="plan-teacher")
+        cls.quiz = Quiz.objects.create(title="Plan quiz", created_by=teacher)
+        questions = Question.objects.bulk_create(
+            [Question(quiz=cls.quiz, text=f"Q{i}", order=i) for i in range(PLAN_QUESTIONS)]
+        )
+        Choice.objects.bulk_create(
+            [Choice(question=q, text=f"C{j}", is_correct=j == 0) for q in questions for j in range(4)]
+        )
+        now = timezone.now()
+        sessions = Session.objects.bulk_create(
+            [
+                Session(
+                    quiz=cls.quiz, pin=f"{i:06d}", is_active=i % 10 == 0,
+                    ended_at=None if i % 10 == 0 else now - timedelta(minutes=i),
+                )
+                for i in range(PLAN_SESSIONS)
+            ]
+        )
+        cls.session = sessions[0]
+        cls.question = questions[PLAN_QUESTIONS // 2]
+
+        # Bulk volumes straight in SQL; the ORM would take minutes here
+        per_session = max(1, PLAN_PARTICIPANTS // PLAN_SESSIONS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Participant._meta.db_table} (session_id, name, score, joined_at)
+                SELECT s.id, 'p' || g, (g * 7919) %% 100, now() - (g || ' seconds')::interval
+                FROM {Session._meta.db_table} s CROSS JOIN generate_series(1, %s) g
+                WHERE s.quiz_id = %s
+                """,
+                [per_session, cls.quiz.pk],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {Answer._meta.db_table}
+                    (participant_id, question_id, choice_id, is_correct, points, value, answered_at)
+                SELECT p.id, c.question_id, c.id, c.is_correct, c.is_correct::int, '', now()
+                FROM {Participant._meta.db_table} p
+                JOIN {Session._meta.db_table} s ON s.id = p.session_id AND s.quiz_id = %s
+                JOIN {Question._meta.db_table} q ON q.quiz_id = s.quiz_id
+                JOIN {Choice._meta.db_table} c ON c.question_id = q.id
+                WHERE c.text = 'C' || ((p.id + q.id) %% 4)
+                """,
+                [cls.quiz.pk],
+            )
+            for model in (Session, Participant, Answer):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def assertUsesIndex(self, queryset, table, index=None):
+        plan = queryset.explain()
+        self.assertNotRegex(plan, rf"Seq Scan on {table}\b", plan)
+        index = re.escape(index) if index else r"\S+"
+        if not re.search(rf"Index (Only )?Scan using {index} on {table}\b", plan):
+            self.assertRegex(plan, rf"Bitmap Index Scan on {index}", plan)
+
+    def test_scoreboard_uses_composite_index(self):
+        self.assertUsesIndex(
+            scoreboard_rows(self.session.pk),
+            Participant._meta.db_table,
+            "participant_scoreboard_idx",
+        )
+
+    def test_active_session_lookup_by_pin(self):
+        self.assertUsesIndex(
+            Session.objects.filter(pin=self.session.pin, is_active=True),
+            Session._meta.db_table,
+        )
+
+    def test_answer_lookup_by_participant_and_question(self):
+        participant_id = Participant.objects.filter(session=self.session).values_list("id", flat=True).first()
+        self.assertUsesIndex(
+            Answer.objects.filter(participant_id=participant_id, question_id=self.question.pk),
+            Answer._meta.db_table,
+        )
+
+    def test_session_answers_join(self):
+        # Actor load / results snapshot: every answer of one session
+        self.assertUsesIndex(
+            Answer.objects.filter(participant__session_id=self.session.pk)
+            .values_list("participant_id", "question_id", "choice_id"),
+            Answer._meta.db_table,
+        )
+
+    def test_ended_sessions_sweep(self):
+        self.assertUsesIndex(
+            Session.objects.filter(is_active=False, ended_at__lte=timezone.now()).order_by("ended_at")[:10],
+            Session._meta.db_table,
+        )
+
+
+class ScoringPolicyTests(SimpleTestCase):
+    def test_speed_points_fall_to_the_floor_at_the_time_limit(self):
+        policy = ScoringPolicy("speed", 1000)
+        self.assertEqual(policy.score(True, 0, 30), 1000)
+        self.assertEqual(policy.score(True, 15, 30), 750)
+        self.assertEqual(policy.score(True, 60, 30), 500)
+        self.assertEqual(policy.score(False, 0, 30), 0)
+
+    def test_unknown_answer_time_scores_the_floor(self):
+        self.assertEqual(ScoringPolicy("speed", 1000).score(True, None, 30), 500)
+        self.assertEqual(ScoringPolicy("flat", 1000).score(True, None, 30), 1000)
+
+
+class LiveRosterTests(SimpleTestCase):
+    def test_participants_keep_their_row_and_answers_as_the_roster_grows(self):
+        roster = LiveRoster()
+        self.assertEqual(roster.add(10, "a", 5), 0)
+        roster.set_answer(10, 1, 7, True, 100)
+        self.assertEqual(roster.add(10, "renamed", 99), 0)
+        for pid in range(11, 11 + livestate.GROWTH + 5):
+            roster.add(pid, f"p{pid}")
+        last = 10 + livestate.GROWTH + 5
+        roster.set_answer(last, 1, 8, False, 0)
+
+        self.assertEqual(len(roster), livestate.GROWTH + 6)
+        self.assertEqual((roster.name(10), roster.score(10)), ("a", 5))
+        self.assertEqual(roster.answer(10, 1), (7, True, 100))
+        self.assertEqual(roster.answer(last, 1), (8, False, 0))
+        self.assertIsNone(roster.answer(11, 1))
+        self.assertIsNone(roster.answer(10, 2))
+
+    def test_answers_can_be_replaced(self):
+        roster = LiveRoster()
+        for pid in range(9):
+            roster.add(pid, str(pid))
+        roster.set_answer(8, 1, (3, 4), True, 50)
+        roster.set_answer(7, 1, (3, 4), True, 50)
+        # Re-answering clears the correct bit of this row only
+        roster.set_answer(8, 1, "text", False, 0)
+        self.assertEqual(roster.answer(8, 1), ("text", False, 0))
+        self.assertEqual(roster.answer(7, 1), ((3, 4), True, 50))
+        self.assertEqual(roster.questions[1].responses, [(3, 4), "text"])
+
+    def test_more_distinct_responses_than_16_bit_slots(self):
+        roster = LiveRoster()
+        roster.add(1, "a")
+        roster.add(2, "b")
+        answers = roster.questions[1] = livestate.QuestionAnswers(livestate.GROWTH)
+        answers.responses = [None] * 0xFFFF
+        roster.set_answer(1, 1, "first", True, 1)
+        roster.set_answer(2, 1, "second", True, 1)
+        self.assertEqual(roster.answer(1, 1), ("first", True, 1))
+        self.assertEqual(roster.answer(2, 1), ("second", True, 1))
+        self.assertEqual(answers.slots.typecode, "I")
+
+    def test_scores_never_drop_below_zero_and_ties_rank_by_join_order(self):
+        roster = LiveRoster()
+        roster.add(5, "first", 10)
+        roster.add(3, "second", 20)
+        roster.add(4, "third", -4)
+        self.assertEqual(roster.add_score(3, -10), 10)
+        self.assertEqual(roster.add_score(4, -1), 0)
+        self.assertEqual(
+            roster.scoreboard(),
+            [
+                {"participant_id": 5, "name": "first", "score": 10},
+                {"participant_id": 3, "name": "second", "score": 10},
+                {"participant_id": 4, "name": "third", "score": 0},
+            ],
+        )
+
+    def test_streaks_follow_answers_and_rebuild_from_them(self):
+        roster = LiveRoster()
+        roster.add(1, "a")
+
+        def answer(question_id, is_correct):
+            before = roster.advance_streak(1, question_id, is_correct)
+            roster.set_answer(1, question_id, "x", is_correct, 0)
+            return before
+
+        self.assertEqual([answer(q, True) for q in (1, 2)], [0, 1])
+        # Re-answering the latest question redoes its step
+        self.assertEqual(answer(2, False), 1)
+        self.assertEqual(answer(2, True), 1)
+        # Answers to older questions build on nothing and leave the streak alone
+        self.assertEqual(answer(1, False), 0)
+        self.assertEqual(roster.streaks[0], 2)
+
+        rebuilt = LiveRoster()
+        rebuilt.add(1, "a")
+        rebuilt.questions = roster.questions
+        rebuilt.rebuild_streaks([1, 2])
+        self.assertEqual(
+            (rebuilt.streaks[0], rebuilt.streak_question[0], rebuilt.streak_before[0]),
+            (1, 2, 0),
+        )
+
+
+class SpeedScoringTests(TransactionTestCase):
+    """
+    Answers whose time is unknown must not score as instant.
+    (Actors reach the database through channels' database_sync_to_async,
+    which closes connections, so not inside TestCase's transaction.)
+    """
+
+    def setUp(self):
+        teacher = User.objects.create(username="speed-teacher")
+        quiz = Quiz.objects.create(title="Speed", created_by=teacher, scoring="speed", points=1000)
+        self.question = Question.objects.create(quiz=quiz, text="Q", time_limit=30)
+        self.correct = Choice.objects.create(question=self.question, text="A", is_correct=True)
+        self.session = Session.objects.create(quiz=quiz)
+        self.early, self.late = (
+            Participant.objects.create(session=self.session, name=name) for name in ("early", "late")
+        )
+
+    async def test_actor_scores_a_question_that_is_not_open_at_the_floor(self):
+        actor = SessionActor(self.session.pin)
+        await actor.start()
+        try:
+            result = await actor.submit_answer(self.late.pk, self.correct.pk)
+            self.assertTrue(result.ok)
+            self.assertEqual(result.points, 500)
+
+            await actor.push_question({"id": self.question.pk, "time_limit": 30})
+            result = await actor.submit_answer(self.early.pk, self.correct.pk)
+            self.assertGreater(result.points, 990)
+        finally:
+            await actor.stop()
+
+    def test_rest_fallback_scores_at_the_floor(self):
+        result = grade_answer(self.late.pk, self.correct.pk)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.points, 500)
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.score, 500)
+
+
+class SessionActorTests(TransactionTestCase):
+    """Answers graded in memory, checkpoints, session end and log recovery."""
+
+    def setUp(self):
+        teacher = User.objects.create(username="actor-teacher")
+        quiz = Quiz.objects.create(title="Actor", created_by=teacher, points=10)
+        self.question = Question.objects.create(quiz=quiz, text="Q")
+        self.correct = Choice.objects.create(question=self.question, text="A", is_correct=True)
+        self.session = Session.objects.create(quiz=quiz)
+        self.first, self.second = (
+            Participant.objects.create(session=self.session, name=name) for name in ("first", "second")
+        )
+
+    async def saved(self):
+        """{participant_id: (score, points of their saved answer or None)}"""
+        answers = Answer.objects.filter(question=self.question).values_list("participant_id", "points")
+        points = {pid: value async for pid, value in answers}
+        return {
+            pid: (score, points.get(pid))
+            async for pid, score in Participant.objects.filter(session=self.session).values_list("id", "score")
+        }
+
+    async def test_answers_are_saved_by_the_checkpoint(self):
+        actor = SessionActor(self.session.pin)
+        await actor.start()
+        try:
+            result = await actor.submit_answer(self.first.pk, self.correct.pk)
+            self.assertTrue(result.ok)
+            self.assertEqual(actor.scoreboard()[0]["score"], 10)
+            self.assertEqual((await self.saved())[self.first.pk], (0, None))
+
+            await actor.checkpoint()
+            self.assertEqual((await self.saved())[self.first.pk], (10, 10))
+        finally:
+            await actor.stop()
+
+    @override_settings(CLASSPOINT_ANSWER_ARCHIVE="table")
+    async def test_end_snapshots_results_and_leaves_archiving_to_the_sweep(self):
+        actor = SessionActor(self.session.pin)
+        await actor.start()
+        try:
+            await actor.submit_answer(self.first.pk, self.correct.pk)
+            await actor.end()
+        finally:
+            await actor.stop()
+        result = await SessionResult.objects.aget(session=self.session)
+        self.assertEqual(result.answers_archived, "")
+        self.assertEqual(result.leaderboard[0]["score"], 10)
+        self.assertEqual((await self.saved())[self.first.pk], (10, 10))
+
+    async def test_checkpoint_after_archiving_writes_nothing(self):
+        actor = SessionActor(self.session.pin)
+        await actor.start()
+        try:
+            await actor.submit_answer(self.first.pk, self.correct.pk)
+            # Another worker's actor ended the session and the sweep archived it
+            session = await Session.objects.aget(pk=self.session.pk)
+            await database_sync_to_async(finalize_session)(session, archive="table")
+            with self.assertLogs("quizzes.actors", "WARNING"):
+                await actor.checkpoint()
+        finally:
+            await actor.stop()
+        self.assertEqual((await self.saved())[self.first.pk], (0, None))
+        self.assertFalse(await ArchivedAnswer.objects.filter(session=self.session).aexists())
+
+    @override_settings(CLASSPOINT_ACTOR_IDLE_SECONDS=0)
+    def test_rest_answers_go_through_the_live_actor(self):
+        # On a loop of its own and with a thread per request, as under daphne:
+        # otherwise the sync view would block the thread the actor's queries need
+        async def answer_over_rest():
+            actor = await acquire_actor(self.session.pin)
+            try:
+                async with ThreadSensitiveContext():
+                    response = await AsyncClient().post(
+                        "/api/answers/create/",
+                        {"participant": self.first.pk, "choice": self.correct.pk},
+                        content_type="application/json",
+                    )
+                self.assertEqual(response.status_code, 201)
+                # Graded by the actor and waiting for its checkpoint
+                self.assertEqual(actor.roster.answer(self.first.pk, self.question.pk)[2], 10)
+                self.assertEqual((await self.saved())[self.first.pk], (0, None))
+            finally:
+                # Stops (and checkpoints) after the idle timeout
+                release_actor(actor)
+                await asyncio.wait_for(actor.task, 5)
+            self.assertEqual((await self.saved())[self.first.pk], (10, 10))
+
+        asyncio.run(answer_over_rest())
+
+    @override_settings(CLASSPOINT_ACTOR_IDLE_SECONDS=0)
+    async def test_a_slow_start_does_not_hold_up_other_sessions(self):
+        other = await Session.objects.acreate(quiz_id=self.session.quiz_id)
+        gate = asyncio.Event()
+        start = SessionActor.start
+
+        async def slow_start(actor):
+            if actor.pin == self.session.pin:
+                await gate.wait()
+            await start(actor)
+
+        with mock.patch.object(SessionActor, "start", slow_start):
+            slow = asyncio.ensure_future(acquire_actor(self.session.pin))
+            joining = asyncio.ensure_future(acquire_actor(self.session.pin))
+            await asyncio.sleep(0)
+            fast = await asyncio.wait_for(acquire_actor(other.pin), 5)
+            self.assertFalse(slow.done() or joining.done())
+            gate.set()
+            # Both sockets of the slow PIN share one actor
+            self.assertIs(await slow, await joining)
+        for actor in (fast, await slow, await joining):
+            release_actor(actor)
+        await asyncio.wait_for(asyncio.gather(fast.task, slow.result().task), 5)
+
+    async def test_crash_without_the_event_log_loses_answers_since_the_checkpoint(self):
+        crashed = SessionActor(self.session.pin)
+        await crashed.start()
+        await crashed.submit_answer(self.first.pk, self.correct.pk)
+        await crashed.checkpoint()
+        result = await crashed.submit_answer(self.second.pk, self.correct.pk)
+        self.assertTrue(result.ok)  # acknowledged, not saved yet
+        crashed.task.cancel()
+
+        actor = SessionActor(self.session.pin)
+        await actor.start()
+        try:
+            self.assertIsNotNone(actor.roster.answer(self.first.pk, self.question.pk))
+            self.assertIsNone(actor.roster.answer(self.second.pk, self.question.pk))
+        finally:
+            await actor.stop()
+        self.assertEqual(await self.saved(), {self.first.pk: (10, 10), self.second.pk: (0, None)})
+
+    async def test_restart_recovers_unsaved_answers_from_the_event_log(self):
+        with tempfile.TemporaryDirectory() as log_dir, override_settings(
+            CLASSPOINT_EVENT_LOG="file", CLASSPOINT_EVENT_LOG_DIR=log_dir, CLASSPOINT_ACTOR_CHECKPOINT_SECONDS=0.05,
+        ), mock.patch.object(eventlog, "_store", None):
+            crashed = SessionActor(self.session.pin)
+            await crashed.start()
+            await crashed.submit_answer(self.first.pk, self.correct.pk)
+            await crashed.checkpoint()
+            await crashed.submit_answer(self.second.pk, self.correct.pk)
+            # The answer reaches the log but the worker dies before saving it
+            await crashed.events.flush()
+            crashed.task.cancel()
+
+            actor = SessionActor(self.session.pin)
+            await actor.start()
+            try:
+                # Applied at once; saved once the dead actor has been quiet for live_window()
+                self.assertEqual(actor.roster.answer(self.second.pk, self.question.pk)[2], 10)
+                await asyncio.sleep(live_window() * 3)
+            finally:
+                await actor.stop()
+        self.assertEqual(await self.saved(), {self.first.pk: (10, 10), self.second.pk: (10, 10)})
+
+
+class QuestionTypeGradingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create(username="types-teacher")
+        quiz = Quiz.objects.create(title="Types", created_by=teacher, points=10)
+        cls.multi = Question.objects.create(quiz=quiz, text="Primes?", question_type=Question.MULTI)
+        cls.two, cls.three, cls.four = Choice.objects.bulk_create(
+            [Choice(question=cls.multi, text=str(n), is_correct=n != 4) for n in (2, 3, 4)]
+        )
+        cls.numeric = Question.objects.create(
+            quiz=quiz, text="0.1 + 0.2?", question_type=Question.NUMERIC, correct_value=0.3
+        )
+        cls.text = Question.objects.create(
+            quiz=quiz, text="Capital of France?", question_type=Question.TEXT, accepted_answers=["Paris"]
+        )
+        cls.session = Session.objects.create(quiz=quiz)
+        cls.first, cls.second = (
+            Participant.objects.create(session=cls.session, name=name) for name in ("first", "second")
+        )
+
+    def grade(self, participant, question, **response):
+        return grade_answer(participant.pk, question_id=question.pk, **response)
+
+    def test_multi_select_needs_exactly_the_correct_choices(self):
+        result = self.grade(self.first, self.multi, choice_ids=[self.three.pk, self.two.pk])
+        self.assertEqual((result.is_correct, result.response), (True, tuple(sorted((self.two.pk, self.three.pk)))))
+        # Re-answering with only some of them takes the points back
+        result = self.grade(self.first, self.multi, choice_ids=[self.two.pk])
+        self.assertEqual((result.is_correct, result.score_delta), (False, -10))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.score, 0)
+
+        self.assertEqual(self.grade(self.second, self.multi, value="2").error, "invalid_response")
+
+    def test_numeric_answers_match_within_tolerance(self):
+        self.assertTrue(self.grade(self.first, self.numeric, value="0,30").is_correct)
+        self.assertFalse(self.grade(self.second, self.numeric, value="0.31").is_correct)
+        self.assertEqual(self.grade(self.second, self.numeric, value="abc").error, "invalid_response")
+
+    def test_text_answers_ignore_case_spacing_and_end_punctuation(self):
+        self.assertTrue(self.grade(self.first, self.text, value="  PARIS!").is_correct)
+        self.assertFalse(self.grade(self.second, self.text, value="Lyon").is_correct)
+
+    def test_replay_tallies_choice_sets_and_values(self):
+        with tempfile.TemporaryDirectory() as log_dir, override_settings(
+            CLASSPOINT_EVENT_LOG="file", CLASSPOINT_EVENT_LOG_DIR=log_dir,
+        ), mock.patch.object(eventlog, "_store", None):
+            eventlog.log_answers([
+                self.grade(self.first, self.multi, choice_ids=[self.two.pk, self.three.pk]),
+                self.grade(self.second, self.multi, choice_ids=[self.two.pk]),
+                self.grade(self.first, self.text, value="Paris"),
+                self.grade(self.second, self.text, value="Paris"),
+            ])
+            out = io.StringIO()
+            call_command("replay_session", self.session.pk, stdout=out)
+        questions = {q["question_id"]: q for q in json.loads(out.getvalue())["questions"]}
+        self.assertEqual(
+            questions[self.multi.pk]["choice_counts"], {str(self.two.pk): 2, str(self.three.pk): 1}
+        )
+        self.assertEqual(questions[self.text.pk]["value_counts"], {"Paris": 2})
+        self.assertEqual(questions[self.text.pk]["choice_counts"], {})
+
+
+@override_settings(
+    CLASSPOINT_SESSION_ACTORS=False,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class DuplicateAnswerTests(TransactionTestCase):
+    """Resent answers (same msg_id) get the original reply without regrading."""
+
+    def setUp(self):
+        teacher = User.objects.create(username="dedupe-teacher")
+        quiz = Quiz.objects.create(title="Dedupe", created_by=teacher, points=10)
+        question = Question.objects.create(quiz=quiz, text="Q")
+        self.correct, self.wrong = Choice.objects.bulk_create(
+            [Choice(question=question, text="A", is_correct=True), Choice(question=question, text="B")]
+        )
+        self.session = Session.objects.create(quiz=quiz)
+        self.participant = Participant.objects.create(session=self.session, name="p")
+
+    async def connect(self):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        connected, _ = await socket.connect()
+        self.assertTrue(connected)
+        await socket.send_json_to({"action": "join", "participant_id": self.participant.pk})
+        self.assertEqual((await self.reply(socket))["type"], "join_success")
+        return socket
+
+    async def reply(self, socket):
+        """The next frame that is not a scoreboard."""
+        while True:
+            frame = await socket.receive_json_from()
+            if frame.get("type") != "score_update":
+                return frame
+
+    async def answer(self, socket, choice, msg_id):
+        await socket.send_json_to({"action": "answer", "choice_id": choice.pk, "msg_id": msg_id})
+        return await self.reply(socket)
+
+    async def test_resent_answers_are_replayed_until_the_session_ends(self):
+        socket = await self.connect()
+        first = await self.answer(socket, self.correct, "m1")
+        self.assertEqual((first["type"], first["msg_id"]), ("answer_ack", "m1"))
+        self.assertEqual(await self.answer(socket, self.correct, "m1"), {**first, "duplicate": True})
+        await socket.disconnect()
+
+        # After a reconnect; a different response under the same msg_id is still the resend
+        socket = await self.connect()
+        self.assertEqual(await self.answer(socket, self.wrong, "m1"), {**first, "duplicate": True})
+        participant = await Participant.objects.aget(pk=self.participant.pk)
+        self.assertEqual(participant.score, 10)
+        self.assertEqual(await Answer.objects.filter(participant=participant).acount(), 1)
+
+        await get_channel_layer().group_send(session_group_name(self.session.pin), {"type": "session.end"})
+        self.assertEqual((await self.reply(socket))["type"], "end")
+        self.assertNotIn(self.session.pin, idempotency._sessions)
+        await socket.disconnect()
+
+
+@override_settings(
+    CLASSPOINT_ACTOR_IDLE_SECONDS=0,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class SocketIdentityTests(TransactionTestCase):
+    """Answers are recorded for the participant a socket joined as, and nobody else."""
+
+    def setUp(self):
+        self.teacher = User.objects.create(username="identity-teacher")
+        quiz = Quiz.objects.create(title="Identity", created_by=self.teacher, points=10)
+        self.correct = Choice.objects.create(
+            question=Question.objects.create(quiz=quiz, text="Q"), text="A", is_correct=True
+        )
+        self.session = Session.objects.create(quiz=quiz)
+        self.participant, self.other = Participant.objects.bulk_create(
+            [Participant(session=self.session, name="me"), Participant(session=self.session, name="other")]
+        )
+        self.stranger = Participant.objects.create(session=Session.objects.create(quiz=quiz), name="stranger")
+
+    async def connect(self):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        return socket
+
+    async def send(self, socket, message):
+        await socket.send_json_to(message)
+        while True:
+            frame = await asyncio.wait_for(socket.receive_json_from(), 2)
+            if frame.get("type") not in ("score_update", "presence", "latency"):
+                return frame
+
+    async def joined(self, participant):
+        socket = await self.connect()
+        self.assertEqual(
+            await self.send(socket, {"action": "join", "participant_id": participant.pk}), {"type": "join_success"}
+        )
+        return socket
+
+    async def close(self, socket):
+        """Disconnect, and let the session actor (if any) save and stop."""
+        actor = live_actor(self.session.pin)
+        await socket.disconnect()
+        if actor is not None:
+            await asyncio.wait_for(actor.task, 5)
+
+    async def scores(self):
+        return {
+            participant.name: participant.score
+            async for participant in Participant.objects.filter(session=self.session)
+        }
+
+    async def check_answers_are_bound_to_the_joined_participant(self):
+        socket = await self.connect()
+        answer = {"action": "answer", "choice_id": self.correct.pk}
+        self.assertEqual(await self.send(socket, answer), {"error": "not_joined"})
+        # Claiming a participant_id does not stand in for a join
+        self.assertEqual(
+            await self.send(socket, {**answer, "participant_id": self.participant.pk}), {"error": "not_joined"}
+        )
+        await self.close(socket)
+
+        socket = await self.joined(self.participant)
+        self.assertEqual(
+            await self.send(socket, {**answer, "participant_id": self.other.pk}), {"error": "participant_mismatch"}
+        )
+        self.assertEqual((await self.send(socket, answer))["type"], "answer_ack")
+        await self.close(socket)
+        self.assertEqual(await self.scores(), {"me": 10, "other": 0})
+
+    async def check_joins_are_checked_against_the_socket_session(self):
+        socket = await self.connect()
+        failed = await self.send(socket, {"action": "join", "participant_id": self.stranger.pk})
+        self.assertEqual(failed["error"], "join_failed")
+        answer = {"action": "answer", "choice_id": self.correct.pk}
+        self.assertEqual(await self.send(socket, answer), {"error": "not_joined"})
+
+        # A host socket cannot also answer as a student
+        token = str(AccessToken.for_user(self.teacher))
+        host = {"action": "host_join", "token": token, "session_pin": self.session.pin}
+        self.assertEqual((await self.send(socket, host))["type"], "host_join_success")
+        failed = await self.send(socket, {"action": "join", "participant_id": self.participant.pk})
+        self.assertEqual(failed["error"], "join_failed")
+        self.assertEqual(await self.send(socket, answer), {"error": "not_joined"})
+        await self.close(socket)
+
+    async def test_answers_are_bound_to_the_joined_participant(self):
+        await self.check_answers_are_bound_to_the_joined_participant()
+
+    async def test_joins_are_checked_against_the_socket_session(self):
+        await self.check_joins_are_checked_against_the_socket_session()
+
+    @override_settings(CLASSPOINT_SESSION_ACTORS=False)
+    async def test_database_path_answers_are_bound_to_the_joined_participant(self):
+        await self.check_answers_are_bound_to_the_joined_participant()
+
+    @override_settings(CLASSPOINT_SESSION_ACTORS=False)
+    async def test_database_path_joins_are_checked_against_the_socket_session(self):
+        await self.check_joins_are_checked_against_the_socket_session()
+
+
+class SocketThrottleTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(throttling, "_shared_store", throttling.LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(CLASSPOINT_WS_RATE_LIMITS={"answer": (0.01, 2), "default": (0.01, 3)})
+    async def test_bursts_pass_then_each_action_is_limited_separately(self):
+        throttle = throttling.SocketThrottle()
+        self.assertEqual([await throttle.check("answer") for _ in range(2)], [None, None])
+        self.assertGreater(await throttle.check("answer"), 1)
+        # Unknown actions share the default bucket, which answers did not touch
+        self.assertIsNone(await throttle.check("typo"))
+        self.assertIsNone(await throttle.check(None))
+        self.assertEqual(throttle.strikes, 0)
+
+    @override_settings(CLASSPOINT_WS_RATE_LIMITS={"answer": (0.01, 2), "default": (0.01, 3)})
+    async def test_a_participant_has_one_bucket_across_sockets(self):
+        first, second = throttling.SocketThrottle(), throttling.SocketThrottle()
+        self.assertIsNone(await first.check("answer", participant_id=7))
+        self.assertIsNone(await second.check("answer", participant_id=7))
+        self.assertIsNotNone(await second.check("answer", participant_id=7))
+        # Another participant on the same worker is unaffected
+        self.assertIsNone(await first.check("answer", participant_id=8))
+
+    @override_settings(CLASSPOINT_WS_RATE_LIMITS={"default": (0.01, 1)})
+    async def test_rejections_in_a_row_mark_the_socket_abusive(self):
+        throttle = throttling.SocketThrottle(max_strikes=3)
+        await throttle.check("ping")
+        for _ in range(2):
+            await throttle.check("ping")
+        self.assertFalse(throttle.abusive)
+        await throttle.check("ping")
+        self.assertTrue(throttle.abusive)
+
+
+@override_settings(
+    CLASSPOINT_SESSION_ACTORS=False,
+    CLASSPOINT_WS_RATE_LIMITS={"join": (0.01, 5), "answer": (0.01, 5), "ping": (0.01, 2), "default": (0.01, 5)},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class SocketRateLimitTests(TransactionTestCase):
+    """Throttling and role checks as a client sees them."""
+
+    def setUp(self):
+        patcher = mock.patch.object(throttling, "_shared_store", throttling.LocalBucketStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        teacher = User.objects.create(username="throttle-teacher")
+        quiz = Quiz.objects.create(title="Throttle", created_by=teacher)
+        self.question = Question.objects.create(quiz=quiz, text="Q")
+        self.session = Session.objects.create(quiz=quiz)
+        self.participant = Participant.objects.create(session=self.session, name="p")
+
+    async def connect(self):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        return socket
+
+    async def reply(self, socket):
+        while True:
+            frame = await asyncio.wait_for(socket.receive_json_from(), 2)
+            if frame.get("type") != "score_update":
+                return frame
+
+    async def test_a_flood_is_told_to_retry_later(self):
+        socket = await self.connect()
+        for _ in range(2):
+            await socket.send_json_to({"action": "ping"})
+            self.assertEqual(await self.reply(socket), {"action": "pong"})
+        await socket.send_json_to({"action": "ping"})
+        frame = await self.reply(socket)
+        self.assertEqual((frame["error"], frame["action"]), ("rate_limited", "ping"))
+        self.assertGreater(frame["retry_after"], 0)
+        await socket.disconnect()
+
+    async def test_students_cannot_push_questions(self):
+        socket = await self.connect()
+        await socket.send_json_to({"action": "join", "participant_id": self.participant.pk})
+        self.assertEqual((await self.reply(socket))["type"], "join_success")
+        with mock.patch.object(SessionConsumer, "get_question_payload") as payload, mock.patch.object(
+            SessionConsumer, "record_question_opened"
+        ) as opened:
+            await socket.send_json_to({"action": "host_push_question", "question_id": self.question.pk})
+            self.assertEqual(await self.reply(socket), {"error": "forbidden", "action": "host_push_question"})
+        payload.assert_not_called()
+        opened.assert_not_called()
+        await socket.disconnect()
+
+    async def test_answers_of_one_participant_share_a_bucket_across_sockets(self):
+        sockets = [await self.connect() for _ in range(2)]
+        for socket in sockets:
+            await socket.send_json_to({"action": "join", "participant_id": self.participant.pk})
+            self.assertEqual((await self.reply(socket))["type"], "join_success")
+        # Two joins drew from the participant's join bucket; answers have their own
+        replies = []
+        for n in range(6):
+            socket = sockets[n % 2]
+            await socket.send_json_to({"action": "answer", "question_id": self.question.pk, "value": "x"})
+            replies.append(await self.reply(socket))
+        self.assertNotIn("rate_limited", [frame.get("error") for frame in replies[:5]])
+        self.assertEqual(replies[5]["error"], "rate_limited")
+        for socket in sockets:
+            await socket.disconnect()
+
+    @override_settings(CLASSPOINT_WS_ABUSE_STRIKES=3)
+    async def test_sockets_that_keep_flooding_are_closed(self):
+        socket = await self.connect()
+        for _ in range(2):
+            await socket.send_json_to({"action": "ping"})
+            await self.reply(socket)
+        errors = 0
+        for _ in range(3):
+            await socket.send_json_to({"action": "ping"})
+        while True:
+            output = await asyncio.wait_for(socket.receive_output(), 2)
+            if output["type"] == "websocket.close":
+                break
+            errors += 1
+        self.assertEqual((errors, output["code"]), (2, throttling.ABUSE_CLOSE_CODE))
+
+
+@override_settings(
+    CLASSPOINT_ACTOR_IDLE_SECONDS=0,
+    CLASSPOINT_ACTOR_CHECKPOINT_SECONDS=0.1,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class AnswerAckTests(TransactionTestCase):
+    """answer_ack timestamps on both grading paths, and the actor's persist ack."""
+
+    def setUp(self):
+        teacher = User.objects.create(username="ack-teacher")
+        quiz = Quiz.objects.create(title="Ack", created_by=teacher)
+        self.correct = Choice.objects.create(
+            question=Question.objects.create(quiz=quiz, text="Q"), text="A", is_correct=True
+        )
+        self.session = Session.objects.create(quiz=quiz)
+        self.participant = Participant.objects.create(session=self.session, name="p")
+
+    async def reply(self, socket):
+        while True:
+            frame = await asyncio.wait_for(socket.receive_json_from(), 2)
+            if frame.get("type") != "score_update":
+                return frame
+
+    async def answer(self, msg_id="m1"):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        await socket.send_json_to({"action": "join", "participant_id": self.participant.pk})
+        self.assertEqual((await self.reply(socket))["type"], "join_success")
+        await socket.send_json_to({"action": "answer", "choice_id": self.correct.pk, "msg_id": msg_id})
+        ack = await self.reply(socket)
+        self.assertEqual(
+            (ack["type"], ack["question_id"], ack["msg_id"]), ("answer_ack", self.correct.question_id, msg_id)
+        )
+        self.assertLessEqual(ack["received_at"], ack["graded_at"])
+        return socket, ack
+
+    async def test_actor_acks_are_followed_by_a_persist_ack(self):
+        socket, ack = await self.answer()
+        actor = live_actor(self.session.pin)
+        try:
+            self.assertIsNone(ack["persisted_at"])
+            persisted = await self.reply(socket)
+            self.assertEqual(
+                (persisted["type"], persisted["question_id"], persisted["msg_id"]),
+                ("answer_persisted", self.correct.question_id, "m1"),
+            )
+            self.assertGreaterEqual(persisted["persisted_at"], ack["graded_at"])
+            self.assertTrue(await Answer.objects.filter(participant=self.participant).aexists())
+
+            # A resend gets the ack with the persist time filled in
+            await socket.send_json_to({"action": "answer", "choice_id": self.correct.pk, "msg_id": "m1"})
+            self.assertEqual(
+                await self.reply(socket),
+                {**ack, "persisted_at": persisted["persisted_at"], "duplicate": True},
+            )
+        finally:
+            await socket.disconnect()
+            await asyncio.wait_for(actor.task, 5)
+
+    @override_settings(CLASSPOINT_SESSION_ACTORS=False)
+    async def test_database_path_acks_are_persisted_when_graded(self):
+        socket, ack = await self.answer()
+        self.assertEqual(ack["persisted_at"], ack["graded_at"])
+        while not await socket.receive_nothing(0.3):
+            self.assertEqual((await socket.receive_json_from())["type"], "score_update")
+        await socket.disconnect()
+
+
+@override_settings(
+    CLASSPOINT_ACTOR_IDLE_SECONDS=0,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class WordCloudBroadcastTests(TransactionTestCase):
+    """Answers that move no score are not followed by a scoreboard for everyone."""
+
+    def setUp(self):
+        teacher = User.objects.create(username="cloud-teacher")
+        quiz = Quiz.objects.create(title="Cloud", created_by=teacher, points=10)
+        self.cloud = Question.objects.create(quiz=quiz, text="One word?", question_type=Question.WORDCLOUD)
+        self.correct = Choice.objects.create(
+            question=Question.objects.create(quiz=quiz, text="Q"), text="A", is_correct=True
+        )
+        self.session = Session.objects.create(quiz=quiz)
+        self.participants = [Participant.objects.create(session=self.session, name=name) for name in ("a", "b")]
+
+    async def join(self, participant):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        await socket.send_json_to({"action": "join", "participant_id": participant.pk})
+        while (await socket.receive_json_from()).get("type") != "join_success":
+            pass
+        return socket
+
+    async def test_word_cloud_answers_send_no_scoreboard(self):
+        writer, reader = [await self.join(p) for p in self.participants]
+        actor = live_actor(self.session.pin)
+        try:
+            await writer.send_json_to({"action": "answer", "question_id": self.cloud.pk, "value": "Fractions"})
+            self.assertEqual((await writer.receive_json_from())["type"], "answer_ack")
+            self.assertTrue(await reader.receive_nothing(0.2))
+
+            await writer.send_json_to({"action": "answer", "choice_id": self.correct.pk})
+            frame = await reader.receive_json_from()
+            self.assertEqual((frame["type"], frame["scoreboard"][0]["score"]), ("score_update", 10))
+        finally:
+            await writer.disconnect()
+            await reader.disconnect()
+            # Released by the sockets; stops after the idle timeout
+            await asyncio.wait_for(actor.task, 5)
+
+
+@override_settings(
+    CLASSPOINT_ACTOR_IDLE_SECONDS=0,
+    CLASSPOINT_QUESTION_PREFETCH=True,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class PrefetchedPushTests(TransactionTestCase):
+    def setUp(self):
+        self.teacher = User.objects.create(username="prefetch-teacher")
+        quiz = Quiz.objects.create(title="Prefetch", created_by=self.teacher)
+        self.questions = [Question.objects.create(quiz=quiz, text=f"Q{n}", order=n) for n in range(2)]
+        for question in self.questions:
+            Choice.objects.create(question=question, text="A", is_correct=True)
+        self.session = Session.objects.create(quiz=quiz)
+        self.participant = Participant.objects.create(session=self.session, name="a")
+
+    async def connect(self, join):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        await socket.send_json_to(join)
+        while (await socket.receive_json_from()).get("type") not in ("join_success", "host_join_success"):
+            pass
+        return socket
+
+    async def frame(self, socket):
+        """Next frame that is not a scoreboard, presence or latency update."""
+        while True:
+            frame = await socket.receive_json_from()
+            if frame.get("type") not in ("score_update", "presence", "latency"):
+                return frame
+
+    async def test_a_prefetched_push_sends_only_the_activate_frame_before_the_actor_push(self):
+        first, second = [question.pk for question in self.questions]
+        host = await self.connect(
+            {"action": "host_join", "token": str(AccessToken.for_user(self.teacher)), "session_pin": self.session.pin}
+        )
+        student = await self.connect({"action": "join", "participant_id": self.participant.pk})
+        actor = live_actor(self.session.pin)
+        try:
+            await host.send_json_to({"action": "host_push_question", "question_id": first})
+            self.assertEqual((await self.frame(student))["type"], "question")
+            frame = await self.frame(student)
+            self.assertEqual((frame["type"], frame["question"]["id"]), ("question_prefetch", second))
+
+            # The actor's push reads the DB; the activate frame must not wait for it
+            gate = asyncio.Event()
+            push_question = SessionActor.push_question
+
+            async def slow_push(actor, payload):
+                await gate.wait()
+                return await push_question(actor, payload)
+
+            with mock.patch.object(SessionActor, "push_question", slow_push):
+                await host.send_json_to({"action": "host_push_question", "question_id": second})
+                self.assertEqual(
+                    await asyncio.wait_for(self.frame(student), 2), {"type": "question_activate", "question_id": second}
+                )
+                gate.set()
+                await asyncio.sleep(0.05)
+                await actor.sync()
+            self.assertEqual(actor.current_question, second)
+            self.assertTrue(await student.receive_nothing(0.2))
+        finally:
+            await host.disconnect()
+            await student.disconnect()
+            await asyncio.wait_for(actor.task, 5)
+
+
+@override_settings(CLASSPOINT_PRESENCE_TTL_SECONDS=0.2)
+class PresenceTests(SimpleTestCase):
+    async def test_sockets_not_seen_within_the_ttl_stop_counting(self):
+        presence = acquire_presence("presence-ttl")
+        try:
+            presence.add("socket-a", 1)
+            presence.add("socket-b", 1)  # a second tab
+            presence.add("socket-c", 2)
+            self.assertEqual((await presence.counts())["connected"], 2)
+
+            await asyncio.sleep(0.15)
+            presence.seen("socket-b")
+            await asyncio.sleep(0.1)
+            self.assertEqual(presence.connected().keys(), {1})
+
+            presence.seen("socket-c")
+            self.assertEqual((await presence.counts())["participants"], [1, 2])
+        finally:
+            release_presence(presence)
+
+    def test_host_merges_worker_counts_and_forgets_silent_workers(self):
+        workers = {}
+        self.assertEqual(merge_workers(workers, {"worker": "w1", "participants": [1, 2]}), 2)
+        self.assertEqual(merge_workers(workers, {"worker": "w2", "participants": [2, 3]}), 3)
+        # A worker's new frame replaces its old one
+        self.assertEqual(merge_workers(workers, {"worker": "w1", "participants": [1]}), 3)
+
+        workers["w2"] = (0, workers["w2"][1])  # expired
+        self.assertEqual(merge_workers(workers, {"worker": "w1", "participants": [1]}), 1)
+        self.assertEqual(list(workers), ["w1"])
+
+
+@override_settings(
+    CLASSPOINT_SESSION_ACTORS=False,
+    CLASSPOINT_PRESENCE_INTERVAL_SECONDS=0,
+    CLASSPOINT_PRESENCE_TTL_SECONDS=0.3,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class PresenceHostTests(TransactionTestCase):
+    def setUp(self):
+        self.teacher = User.objects.create(username="presence-teacher")
+        self.session = Session.objects.create(quiz=Quiz.objects.create(title="Presence", created_by=self.teacher))
+        self.participant = Participant.objects.create(session=self.session, name="a")
+
+    async def connect(self, join):
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{self.session.pin}/")
+        self.assertTrue((await socket.connect())[0])
+        await socket.send_json_to(join)
+        while (await socket.receive_json_from()).get("type") not in ("join_success", "host_join_success"):
+            pass
+        return socket
+
+    async def connected(self, host, expected):
+        """Wait for the host to be told `expected` students are connected."""
+        while True:
+            frame = await asyncio.wait_for(host.receive_json_from(), 2)
+            if frame.get("type") == "presence" and frame["connected"] == expected:
+                return
+
+    async def test_host_sees_merged_workers_and_heartbeats(self):
+        host = await self.connect(
+            {"action": "host_join", "token": str(AccessToken.for_user(self.teacher)), "session_pin": self.session.pin}
+        )
+        student = await self.connect({"action": "join", "participant_id": self.participant.pk})
+        try:
+            await self.connected(host, 1)
+            # Another worker reports its students: added to this worker's, not replacing them
+            await get_channel_layer().group_send(
+                host_group_name(self.session.pin),
+                {"type": "presence.update", "worker": "other", "participants": [self.participant.pk + 1]},
+            )
+            await self.connected(host, 2)
+
+            # The student keeps counting while it heartbeats, and stops when it goes quiet
+            for _ in range(4):
+                await asyncio.sleep(0.1)
+                await student.send_json_to({"action": "ping"})
+                self.assertEqual(await student.receive_json_from(), {"action": "pong"})
+            while not await host.receive_nothing(0.01):
+                frame = await host.receive_json_from()
+                self.assertNotEqual(frame.get("connected"), 0)
+            await self.connected(host, 0)
+            await student.send_json_to({"action": "ping"})
+            await self.connected(host, 1)
+        finally:
+            await student.disconnect()
+            await host.disconnect()
+
+
+class FakeSocket:
+    """send/close for an OutboundQueue; sends wait while `gate` is clear."""
+
+    def __init__(self, acks=None):
+        self.sent = []
+        self.close_codes = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.queue = None
+        # Probes the socket acks, like a client would; None acks none
+        self.acks = acks
+
+    async def send(self, text_data):
+        await self.gate.wait()
+        frame = json.loads(text_data)
+        self.sent.append(frame)
+        if frame.get("type") == "probe" and self.acks is not None and frame["seq"] <= self.acks:
+            self.queue.ack(frame["seq"])
+
+    async def close(self, code=None):
+        self.close_codes.append(code)
+
+    def open(self, **kwargs):
+        self.queue = OutboundQueue(self.send, self.close, **kwargs)
+        return self.queue
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def sent(self, socket):
+        return [frame["n"] for frame in socket.sent if "n" in frame]
+
+    async def test_question_frames_are_never_dropped(self):
+        socket = FakeSocket()
+        socket.gate.clear()
+        queue = socket.open(max_frames=3, max_delay=60)
+        queue.put(json.dumps({"n": "q1"}))
+        await asyncio.sleep(0)  # q1 is now being sent
+        queue.put(json.dumps({"n": "s1"}), coalesce_key="scoreboard")
+        queue.put(json.dumps({"n": "p1"}), coalesce_key="presence")
+        queue.put(json.dumps({"n": "q2"}))
+        queue.put(json.dumps({"n": "q3"}))  # full: the oldest droppable frame (s1) goes
+        queue.put(json.dumps({"n": "q4"}))  # full: p1 goes
+        socket.gate.set()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.sent(socket), ["q1", "q2", "q3", "q4"])
+        self.assertEqual(socket.close_codes, [])
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["ws.scoreboard_dropped"], 1)
+        self.assertEqual(counters["ws.presence_dropped"], 1)
+        queue.stop()
+
+    async def test_leaderboards_keep_only_the_newest_and_drop_oldest_first(self):
+        socket = FakeSocket()
+        socket.gate.clear()
+        queue = socket.open(max_frames=3, max_delay=60)
+        queue.put(json.dumps({"n": "q1"}))
+        await asyncio.sleep(0)
+        queue.put(json.dumps({"n": "s1"}), coalesce_key="scoreboard")
+        queue.put(json.dumps({"n": "s2"}), coalesce_key="scoreboard")  # replaces s1
+        queue.put(json.dumps({"n": "w1"}), coalesce_key="wordcloud")
+        queue.put(json.dumps({"n": "q2"}))
+        queue.put(json.dumps({"n": "p1"}), coalesce_key="presence")  # full: s2 is the oldest droppable
+        socket.gate.set()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(self.sent(socket), ["q1", "w1", "q2", "p1"])
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["ws.scoreboard_merged"], 1)
+        self.assertEqual(counters["ws.scoreboard_dropped"], 1)
+        self.assertNotIn("ws.leaderboard_merged", counters)
+        queue.stop()
+
+    async def test_a_queue_full_of_critical_frames_disconnects(self):
+        socket = FakeSocket()
+        socket.gate.clear()
+        queue = socket.open(max_frames=2, max_delay=60)
+        for n in range(4):
+            queue.put(json.dumps({"n": n}))
+            await asyncio.sleep(0)
+
+        self.assertTrue(queue.closed)
+        self.assertEqual(socket.close_codes, [SLOW_CLIENT_CLOSE_CODE])
+        self.assertEqual(metrics.snapshot()["counters"]["ws.slow_disconnects.queue_full"], 1)
+
+    async def test_a_frame_waiting_past_the_delay_disconnects(self):
+        socket = FakeSocket()
+        socket.gate.clear()
+        queue = socket.open(max_frames=10, max_delay=0.05)
+        queue.put(json.dumps({"n": "q1"}))
+        await asyncio.sleep(0.1)
+        queue.put(json.dumps({"n": "q2"}))
+        await asyncio.sleep(0)
+
+        self.assertEqual(socket.close_codes, [SLOW_CLIENT_CLOSE_CODE])
+        self.assertEqual(metrics.snapshot()["counters"]["ws.slow_disconnects.too_slow"], 1)
+
+    async def test_a_client_that_stops_acking_probes_is_disconnected(self):
+        socket = FakeSocket(acks=1)
+        queue = socket.open(max_delay=0.1, probe_interval=0.02)
+        await asyncio.sleep(0.4)
+
+        self.assertEqual(socket.close_codes, [SLOW_CLIENT_CLOSE_CODE])
+        self.assertEqual(metrics.snapshot()["counters"]["ws.slow_disconnects.probe_timeout"], 1)
+        self.assertTrue(queue.closed)
+
+    async def test_clients_that_ack_probes_or_never_do_stay_connected(self):
+        acking = FakeSocket(acks=10**6)
+        silent = FakeSocket()
+        queues = [acking.open(max_delay=0.1, probe_interval=0.02), silent.open(max_delay=0.1, probe_interval=0.02)]
+        await asyncio.sleep(0.4)
+
+        self.assertEqual(acking.close_codes + silent.close_codes, [])
+        self.assertGreater(len(silent.sent), 5)
+        self.assertLessEqual(len(queues[1].probes), 1)
+        for queue in queues:
+            queue.stop()
+
+    async def test_a_failing_send_closes_the_socket(self):
+        socket = FakeSocket()
+
+        async def send(text_data):
+            raise RuntimeError("socket gone")
+
+        queue = OutboundQueue(send, socket.close, max_delay=60)
+        with self.assertLogs("quizzes.outbound", "ERROR"):
+            queue.put(json.dumps({"n": "q1"}))
+            await asyncio.sleep(0.05)
+
+        self.assertTrue(queue.closed)
+        self.assertEqual(socket.close_codes, [1011])
+        self.assertTrue(queue.task.done())
+        self.assertEqual(metrics.snapshot()["counters"]["ws.send_errors"], 1)
+
+
+class LocalChannelLayerTests(SimpleTestCase):
+    async def receive(self, layer, channel, timeout=0.1):
+        try:
+            return await asyncio.wait_for(layer.receive(channel), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def test_group_members_get_their_own_copy_until_discarded(self):
+        layer = LocalChannelLayer()
+        a, b = await layer.new_channel(), await layer.new_channel()
+        await layer.group_add("session_1", a)
+        await layer.group_add("session_1", b)
+        message = {"type": "score.update", "scoreboard": [{"score": 1}]}
+        await layer.group_send("session_1", message)
+        message["type"] = "changed by the sender"
+
+        received = await self.receive(layer, a)
+        received["type"] = "changed by a"
+        self.assertEqual(await self.receive(layer, b), {"type": "score.update", "scoreboard": [{"score": 1}]})
+
+        await layer.group_discard("session_1", a)
+        await layer.group_send("session_1", {"type": "session.end"})
+        self.assertIsNone(await self.receive(layer, a))
+        self.assertEqual(await self.receive(layer, b), {"type": "session.end"})
+        await layer.group_discard("session_1", b)
+        self.assertEqual(layer.groups, {})
+
+    async def test_expired_messages_are_not_delivered(self):
+        layer = LocalChannelLayer(expiry=0.05)
+        channel = await layer.new_channel()
+        await layer.send(channel, {"type": "stale"})
+        await asyncio.sleep(0.1)
+        await layer.send(channel, {"type": "fresh"})
+        self.assertEqual(await self.receive(layer, channel), {"type": "fresh"})
+        self.assertIsNone(await self.receive(layer, channel))
+
+    async def test_a_full_channel_rejects_sends_and_misses_group_sends(self):
+        layer = LocalChannelLayer(capacity=2, expiry=0.05)
+        full, other = await layer.new_channel(), await layer.new_channel()
+        for channel in (full, other):
+            await layer.group_add("session_1", channel)
+        await layer.send(full, {"type": "m1"})
+        await layer.send(full, {"type": "m2"})
+        with self.assertRaises(ChannelFull):
+            await layer.send(full, {"type": "m3"})
+
+        await layer.group_send("session_1", {"type": "g1"})
+        self.assertEqual(await self.receive(layer, other), {"type": "g1"})
+        self.assertIn(full, layer.groups["session_1"])
+
+        # Full of expired messages: the member went away and leaves the group
+        await asyncio.sleep(0.1)
+        await layer.group_send("session_1", {"type": "g2"})
+        self.assertEqual(list(layer.groups["session_1"]), [other])
+        self.assertIsNone(await self.receive(layer, full))
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "quizzes.layers.LocalChannelLayer"}},
+    CLASSPOINT_SESSION_ACTORS=False,
+)
+class LocalChannelLayerDeliveryTests(TransactionTestCase):
+    async def test_group_send_reaches_connected_consumers(self):
+        teacher = await User.objects.acreate(username="layer-teacher")
+        quiz = await Quiz.objects.acreate(title="Layer", created_by=teacher)
+        session = await Session.objects.acreate(quiz=quiz)
+        sockets = []
+        for _ in range(2):
+            socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{session.pin}/")
+            self.assertTrue((await socket.connect())[0])
+            self.assertEqual((await socket.receive_json_from())["type"], "score_update")  # current state
+            sockets.append(socket)
+        layer = get_channel_layer()
+        self.assertIsInstance(layer, LocalChannelLayer)
+        try:
+            scoreboard = [{"participant_id": 1, "name": "a", "score": 10}]
+            await layer.group_send(session_group_name(session.pin), {"type": "score.update", "scoreboard": scoreboard})
+            for socket in sockets:
+                self.assertEqual(
+                    await socket.receive_json_from(), {"type": "score_update", "scoreboard": scoreboard}
+                )
+
+            await sockets[0].disconnect()
+            await layer.group_send(session_group_name(session.pin), {"type": "session.end"})
+            self.assertEqual((await sockets[1].receive_json_from())["type"], "end")
+        finally:
+            await sockets[1].disconnect()
+        self.assertEqual(layer.groups, {})
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="export-teacher", is_staff=True)
+        quiz = Quiz.objects.create(title="Export", created_by=cls.teacher)
+        questions = Question.objects.bulk_create(
+            [Question(quiz=quiz, text=f"Q{i}", order=i) for i in range(3)]
+        )
+        choices = Choice.objects.bulk_create(
+            [Choice(question=q, text="A", is_correct=True) for q in questions]
+        )
+        cls.session = Session.objects.create(quiz=quiz)
+        participants = Participant.objects.bulk_create(
+            [Participant(session=cls.session, name=f"p{i}") for i in range(EXPORT_CHUNK_SIZE // 2 + 1)]
+        )
+        Answer.objects.bulk_create(
+            [
+                Answer(participant=p, question=c.question, choice=c, is_correct=True)
+                for p in participants for c in choices
+            ]
+        )
+        cls.answers = len(participants) * len(choices)
+
+    async def test_asgi_export_streams_chunks_asynchronously(self):
+        response = await AsyncClient().get(
+            f"/api/sessions/{self.session.pk}/export/",
+            headers={"authorization": f"Bearer {AccessToken.for_user(self.teacher)}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        # An async iterator: Django sends each chunk as it comes instead of
+        # reading the whole export into memory first
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), -(-self.answers // EXPORT_CHUNK_SIZE))
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), self.answers + 1)
+        self.assertTrue(lines[0].startswith("session_id,session_pin,"))
+
+
+class QuizImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="import-teacher", is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def post_questions(self, *questions):
+        return self.client.post("/api/quizzes/import/", {"title": "Bank", "questions": list(questions)}, format="json")
+
+    def test_questions_that_cannot_be_graded_are_rejected(self):
+        response = self.post_questions({"text": "2 + 2 = ?", "question_type": "numeric"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("correct_value", response.data["questions"][0])
+
+        response = self.post_questions(
+            {"text": "Capital of France?", "question_type": "text", "accepted_answers": [" "]}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("accepted_answers", response.data["questions"][0])
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_uploads_that_are_not_utf8_are_rejected(self):
+        upload = SimpleUploadedFile("bank.csv", "Qu\u00e9stion,Choix\n".encode("latin-1"))
+        response = self.client.post("/api/quizzes/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", response.data["file"])
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_numeric_and_text_questions_import(self):
+        response = self.post_questions(
+            {"text": "2 + 2 = ?", "question_type": "numeric", "correct_value": 4},
+            {"text": "Capital of France?", "question_type": "text", "accepted_answers": ["Paris"]},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["questions"], 2)
+
+
+class WarmUpTests(TransactionTestCase):
+    """warm_up() closes its connections, as it runs before the server starts."""
+
+    def setUp(self):
+        teacher = User.objects.create(username="warmup-teacher")
+        self.quiz = Quiz.objects.create(title="Warm", created_by=teacher)
+        Choice.objects.create(question=Question.objects.create(quiz=self.quiz, text="Q"), text="A", is_correct=True)
+        Session.objects.create(quiz=self.quiz)
+        cache.clear()
+        get_answer_key.cache_clear()
+
+    def session_key(self):
+        session = Session.objects.get()
+        return f"content:session:{session_content_key(session.pk, self.quiz.content_version, None)}"
+
+    def test_running_sessions_are_warmed(self):
+        with self.assertLogs("quizzes.warmup", "INFO") as logs:
+            warmup.warm_up()
+        self.assertIn("Warmed 1 active session(s)", logs.output[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_answer_key(self.quiz.pk, self.quiz.content_version)), 1)
+        self.assertIsNotNone(cache.get(self.session_key()))
+
+    def test_failures_are_logged_and_the_worker_starts_anyway(self):
+        with mock.patch.object(warmup, "warm_sessions", side_effect=Exception("db down")), self.assertLogs(
+            "quizzes.warmup", "WARNING"
+        ) as logs:
+            warmup.warm_up()
+        self.assertIn("Warm-up failed", logs.output[0])
+        self.assertIsNone(cache.get(self.session_key()))
+
+    def test_serve_warms_up_before_daphne_binds(self):
+        calls = []
+        with mock.patch("quizzes.management.commands.serve.warm_up", lambda: calls.append("warm_up")), mock.patch(
+            "daphne.cli.CommandLineInterface.run", lambda cli, args: calls.append(args)
+        ):
+            call_command("serve")
+        self.assertEqual(calls, ["warm_up", ["classpoint.asgi:application"]])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class SessionEndTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="end-teacher", is_staff=True)
+        cls.session = Session.objects.create(quiz=Quiz.objects.create(title="End", created_by=cls.teacher))
+
+    def test_end_is_logged_without_a_live_actor(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        with tempfile.TemporaryDirectory() as log_dir, override_settings(
+            CLASSPOINT_EVENT_LOG="file", CLASSPOINT_EVENT_LOG_DIR=log_dir,
+        ), mock.patch.object(eventlog, "_store", None):
+            response = client.post(f"/api/sessions/{self.session.pk}/action/end/")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(eventlog.replay(eventlog.read_events(self.session.pk)).ended)
+
+
+class ResponseTimeTests(TestCase):
+    """Mean response time counts from when each question was opened."""
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create(username="timing-teacher")
+        cls.quiz = Quiz.objects.create(title="Timing", created_by=teacher)
+        cls.timed, cls.untimed = [Question.objects.create(quiz=cls.quiz, text=t, order=n) for n, t in enumerate("AB")]
+        choices = [Choice.objects.create(question=q, text="A", is_correct=True) for q in (cls.timed, cls.untimed)]
+        cls.session = Session.objects.create(quiz=cls.quiz)
+        opened = cls.session.started_at + timedelta(seconds=60)
+        cls.session.question_opened_at = {str(cls.timed.pk): opened.isoformat()}
+        cls.session.save()
+        for seconds, name in ((5, "a"), (15, "b")):
+            participant = Participant.objects.create(session=cls.session, name=name)
+            Answer.objects.create(
+                participant=participant, question=cls.timed, choice=choices[0],
+                answered_at=opened + timedelta(seconds=seconds),
+            )
+        Answer.objects.create(
+            participant=participant, question=cls.untimed, choice=choices[1],
+            answered_at=cls.session.started_at + timedelta(seconds=100),
+        )
+
+    def test_response_time_counts_from_the_question_opening(self):
+        finalize_session(self.session, archive="")
+        timed, untimed = quiz_analytics(self.quiz)["questions"]
+        self.assertEqual((timed["attempts"], timed["mean_response_seconds"]), (2, 10.0))
+        # No recorded open time: counted as an attempt, but not timed
+        self.assertEqual((untimed["attempts"], untimed["mean_response_seconds"]), (1, None))
+
+    def test_snapshots_timed_from_session_start_add_no_response_time(self):
+        apply_session_stats(
+            self.quiz.pk, [{"question_id": self.timed.pk, "attempts": 3, "correct": 1, "response_seconds": 500.0}]
+        )
+        timed = quiz_analytics(self.quiz)["questions"][0]
+        self.assertEqual((timed["attempts"], timed["mean_response_seconds"]), (3, None))
+
+
+@override_settings(
+    CLASSPOINT_SESSION_ACTORS=False,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class QuestionOpenTimeTests(TransactionTestCase):
+    async def test_pushing_a_question_records_when_it_first_opened(self):
+        teacher = await User.objects.acreate(username="open-teacher")
+        quiz = await Quiz.objects.acreate(title="Open", created_by=teacher)
+        question = await Question.objects.acreate(quiz=quiz, text="Q")
+        session = await Session.objects.acreate(quiz=quiz)
+        host = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/session/{session.pin}/")
+        self.assertTrue((await host.connect())[0])
+        await host.send_json_to(
+            {"action": "host_join", "token": str(AccessToken.for_user(teacher)), "session_pin": session.pin}
+        )
+        try:
+            opened = []
+            before = timezone.now()
+            for _ in range(2):
+                await host.send_json_to({"action": "host_push_question", "question_id": question.pk})
+                while (await asyncio.wait_for(host.receive_json_from(), 2)).get("type") != "question":
+                    pass
+                # The question frame goes out before the open time is saved
+                for _ in range(50):
+                    await session.arefresh_from_db()
+                    if str(question.pk) in session.question_opened_at:
+                        break
+                    await asyncio.sleep(0.02)
+                opened.append(session.question_opened_at[str(question.pk)])
+            self.assertGreaterEqual(datetime.fromisoformat(opened[0]), before)
+            self.assertEqual(opened[1], opened[0])
+        finally:
+            await host.disconnect()
+
+
+class ChoiceSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="sync-teacher", is_staff=True)
+        quiz = Quiz.objects.create(title="Sync", created_by=cls.teacher)
+        cls.question = Question.objects.create(quiz=quiz, text="Q")
+        cls.kept, cls.removed = Choice.objects.bulk_create(
+            [Choice(question=cls.question, text="A", is_correct=True), Choice(question=cls.question, text="B")]
+        )
+        participant = Participant.objects.create(session=Session.objects.create(quiz=quiz), name="p")
+        cls.answer = Answer.objects.create(participant=participant, question=cls.question, choice=cls.kept)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def patch_choices(self, choices):
+        return self.client.patch(f"/api/questions/{self.question.pk}/", {"choices": choices}, format="json")
+
+    def test_choices_are_diffed_so_answers_survive(self):
+        response = self.patch_choices([
+            {"id": self.kept.pk, "text": "A, reworded", "is_correct": True},
+            {"text": "C"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(self.question.choices.order_by("id").values_list("text", flat=True)), ["A, reworded", "C"]
+        )
+        self.assertTrue(Answer.objects.filter(pk=self.answer.pk, choice=self.kept).exists())
+
+    def test_choices_of_another_question_are_rejected(self):
+        other_question = Question.objects.create(quiz=self.question.quiz, text="Other")
+        other = Choice.objects.create(question=other_question, text="X")
+        response = self.patch_choices([{"id": self.kept.pk, "text": "A"}, {"id": other.pk, "text": "X"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("choices", response.data)
+        self.assertEqual(self.question.choices.count(), 2)
+
+
+class ContentCachingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="cache-teacher", is_staff=True)
+        cls.quiz = Quiz.objects.create(title="Cached", created_by=cls.teacher)
+        cls.question = Question.objects.create(quiz=cls.quiz, text="Q")
+        cls.choice = Choice.objects.create(question=cls.question, text="A", is_correct=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def version(self):
+        return Quiz.objects.values_list("content_version", flat=True).get(pk=self.quiz.pk)
+
+    def test_conditional_gets_answer_304(self):
+        url = f"/api/quizzes/{self.quiz.pk}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"quiz-{self.quiz.pk}-v{self.version()}"')
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"quiz-stale"').status_code, 200)
+
+        question_url = f"/api/questions/{self.question.pk}/"
+        etag = self.client.get(question_url)["ETag"]
+        self.assertEqual(etag, f'"question-{self.question.pk}-v{self.version()}"')
+        self.assertEqual(self.client.get(question_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_every_write_path_bumps_the_content_version(self):
+        url = f"/api/quizzes/{self.quiz.pk}/"
+        question_url = f"/api/questions/{self.question.pk}/"
+        etag = self.client.get(url)["ETag"]
+        writes = [
+            ("quiz", lambda: self.client.patch(url, {"title": "Renamed"}, format="json")),
+            ("question", lambda: self.client.patch(question_url, {"text": "Q, reworded"}, format="json")),
+            ("choice", lambda: self.client.patch(
+                question_url, {"choices": [{"id": self.choice.pk, "text": "B", "is_correct": True}]}, format="json"
+            )),
+            ("new question", lambda: self.client.post(
+                "/api/questions/", {"quiz": str(self.quiz.pk), "text": "Q2", "choices": [{"text": "A"}]}, format="json"
+            )),
+            ("deleted question", lambda: self.client.delete(question_url)),
+        ]
+        for name, write in writes:
+            with self.subTest(name):
+                version = self.version()
+                self.assertLess(write().status_code, 300)
+                self.assertEqual(self.version(), version + 1)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                etag = response["ETag"]
+
+    def test_quiz_list_etag_follows_the_listed_quizzes(self):
+        other = Quiz.objects.create(title="Other", created_by=self.teacher)
+        response = self.client.get("/api/quizzes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get("/api/quizzes/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        other.delete()
+        self.assertEqual(self.client.get("/api/quizzes/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+    def test_question_create_is_atomic(self):
+        with mock.patch.object(Choice.objects, "bulk_create", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(
+                    "/api/questions/", {"quiz": str(self.quiz.pk), "text": "Half", "choices": [{"text": "A"}]},
+                    format="json",
+                )
+        self.assertFalse(Question.objects.filter(text="Half").exists())
+
+
+class SessionAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create(username="analytics-teacher", is_staff=True)
+        quiz = Quiz.objects.create(title="Analytics", created_by=cls.teacher)
+        cls.questions = [Question.objects.create(quiz=quiz, text=f"Q{n}", order=n) for n in range(2)]
+        cls.choices = [
+            Choice.objects.bulk_create(
+                [Choice(question=question, text="A", is_correct=True), Choice(question=question, text="B")]
+            )
+            for question in cls.questions
+        ]
+        cls.session = Session.objects.create(quiz=quiz)
+        # Whole seconds: SQLite's julianday() keeps milliseconds only
+        cls.started = (timezone.now() - timedelta(hours=1)).replace(microsecond=0)
+        Session.objects.filter(pk=cls.session.pk).update(started_at=cls.started)
+        cls.session.started_at = cls.started
+        cls.participants = Participant.objects.bulk_create(
+            [Participant(session=cls.session, name=f"p{n}") for n in range(4)]
+        )
+        # (participant, question, correct, seconds after the session started);
+        # totals correct: p0 2, p1 1, p2 0, p3 0
+        Answer.objects.bulk_create(
+            Answer(
+                participant=cls.participants[p],
+                question=cls.questions[q],
+                choice=cls.choices[q][0 if correct else 1],
+                is_correct=correct,
+                answered_at=cls.started + timedelta(seconds=seconds),
+            )
+            for p, q, correct, seconds in [
+                (0, 0, True, 2), (1, 0, True, 4), (2, 0, False, 6), (3, 0, False, 8),
+                (0, 1, True, 10), (1, 1, False, 20), (2, 1, False, 30),
+            ]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def fetch(self):
+        response = self.client.get(f"/api/sessions/{self.session.pk}/analytics/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def check_statistics(self, data):
+        self.assertEqual((data["participants"], data["answers"], data["percent_correct"]), (4, 7, 42.857))
+        first, second = data["questions"]
+        self.assertEqual(
+            (first["attempts"], first["correct"], first["percent_correct"], first["discrimination"]), (4, 2, 50.0, 1.0)
+        )
+        self.assertEqual((second["attempts"], second["percent_correct"], second["discrimination"]), (3, 33.333, 1.0))
+        times = first["time_to_answer"]
+        self.assertEqual(
+            [times[key] for key in ("mean", "median", "p25", "p75", "p90", "min", "max")],
+            [5.0, 5.0, 3.5, 6.5, 7.4, 2.0, 8.0],
+        )
+        self.assertEqual(sum(times["histogram"]["counts"]), 4)
+        self.assertEqual(second["time_to_answer"]["median"], 20.0)
+
+    @unittest.skipUnless(analytics.numpy_module(), "NumPy is not installed")
+    def test_numpy_statistics(self):
+        data = self.fetch()
+        self.assertEqual(data["engine"], "numpy")
+        self.check_statistics(data)
+
+    def test_pure_python_statistics(self):
+        with mock.patch.object(analytics, "_numpy", False):
+            data = self.fetch()
+        self.assertEqual(data["engine"], "python")
+        self.check_statistics(data)
+
+    def test_archived_sessions_read_the_archive(self):
+        finalize_session(self.session, archive="table")
+        self.assertFalse(Answer.objects.filter(participant__session=self.session).exists())
+        self.check_statistics(self.fetch())
+
+    def test_cached_until_the_next_saved_answer(self):
+        self.assertEqual(self.fetch()["answers"], 7)
+        # Written behind the write paths' back: the cached result stays
+        Answer.objects.create(participant=self.participants[3], question=self.questions[1], choice=self.choices[1][1])
+        self.assertEqual(self.fetch()["answers"], 7)
+        Answer.objects.filter(participant=self.participants[3], question=self.questions[1]).delete()
+        self.assertTrue(grade_answer(self.participants[3].pk, self.choices[1][0].pk).ok)
+        self.assertEqual(self.fetch()["answers"], 8)
+
+    def test_only_teachers_see_analytics(self):
+        self.client.force_authenticate(User.objects.create(username="analytics-student"))
+        self.assertEqual(self.client.get(f"/api/sessions/{self.session.pk}/analytics/").status_code, 403)
+
+    @unittest.skipUnless(analytics.numpy_module(), "NumPy is not installed")
+    def test_numpy_and_pure_python_agree(self):
+        rng = random.Random(43)
+        question_ids, participant_ids = list(range(1, 21)), list(range(100, 400))
+        rows = [
+            # Ids outside the quiz / session (deleted questions or participants) are skipped
+            (rng.choice(participant_ids + [999]), rng.choice(question_ids + [99]), rng.random() < 0.6,
+             rng.uniform(0, 120))
+            for _ in range(5000)
+        ]
+        columns = [list(column) for column in zip(*rows)]
+        self.assertEqual(
+            analytics._compute_numpy(question_ids, participant_ids, *columns),
+            analytics._compute_python(question_ids, participant_ids, *columns),
+        )
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class RestAnswerTests(TestCase):
+    """The REST fallback grades with the same core as the socket path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create(username="rest-teacher")
+        quiz = Quiz.objects.create(title="REST", created_by=teacher, points=10)
+        cls.question = Question.objects.create(quiz=quiz, text="Q")
+        cls.correct, cls.wrong = Choice.objects.bulk_create(
+            [Choice(question=cls.question, text="A", is_correct=True), Choice(question=cls.question, text="B")]
+        )
+        cls.numeric = Question.objects.create(
+            quiz=quiz, text="N", question_type=Question.NUMERIC, correct_value=2, tolerance=0.5
+        )
+        cls.session = Session.objects.create(quiz=quiz)
+        cls.participant = Participant.objects.create(session=cls.session, name="p")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def answer(self, **data):
+        return self.client.post("/api/answers/create/", {"participant": self.participant.pk, **data}, format="json")
+
+    def score(self):
+        self.participant.refresh_from_db()
+        return self.participant.score
+
+    def test_reanswering_moves_the_score_by_the_difference(self):
+        response = self.answer(choice=self.correct.pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data["correct"])
+        self.assertEqual(self.score(), 10)
+
+        self.answer(choice=self.correct.pk)
+        self.assertEqual(self.score(), 10)
+        response = self.answer(choice=self.wrong.pk)
+        self.assertFalse(response.data["correct"])
+        self.assertEqual(self.score(), 0)
+        answer = Answer.objects.get(participant=self.participant, question=self.question)
+        self.assertEqual(answer.choice_id, self.wrong.pk)
+
+    def test_batch_grades_each_answer_on_its_own(self):
+        response = self.client.post("/api/answers/batch/", {
+            "participant": self.participant.pk,
+            "answers": [
+                {"choice": self.correct.pk},
+                {"question": self.numeric.pk, "value": "2.4"},
+                {"choice": 999999},
+            ],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([r.get("correct") for r in results[:2]], [True, True])
+        self.assertEqual(results[2]["error"], "choice_not_found")
+        self.assertEqual(self.score(), 20)
+
+    def test_refusals(self):
+        self.assertEqual(self.answer(choice=999999).status_code, 404)
+        self.assertEqual(
+            self.client.post("/api/answers/create/", {"participant": 999999, "choice": self.correct.pk}).status_code,
+            404,
+        )
+        Session.objects.filter(pk=self.session.pk).update(is_active=False)
+        self.assertEqual(self.answer(choice=self.correct.pk).status_code, 409)
+        self.assertEqual(self.score(), 0)
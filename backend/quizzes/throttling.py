@@ -0,0 +1,179 @@
+# backend/quizzes/throttling.py
+"""
+Token-bucket rate limiting for WebSocket actions.
+
+Every socket gets its own buckets (one per action), and the join / answer
+actions of a socket bound to a participant also draw from that participant's
+bucket, so opening more tabs does not buy more answers. Only the verified
+identity picks that bucket, never an id the client sends, so nobody can
+drain another student's budget. Per-socket buckets always live in the consumer;
+per-participant buckets live in this process, or in Redis when
+CLASSPOINT_WS_RATE_LIMIT_REDIS is set so every worker shares them.
+
+Limits are `(tokens per second, burst)` per action in
+CLASSPOINT_WS_RATE_LIMITS (settings.py); actions without an entry use the
+"default" one.
+Checks run before any database work, so a flooding client only costs a dict
+lookup (or one Redis round trip) per message.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Actions a socket may only send after a successful host_join
+HOST_ONLY_ACTIONS = frozenset({"host_push_question"})
+
+# Close code for sockets that keep flooding after being told to slow down
+ABUSE_CLOSE_CODE = 4029
+
+# Upper bound on per-participant buckets kept in this process
+LOCAL_BUCKETS_LIMIT = 50_000
+
+
+def rate_limits():
+    return settings.CLASSPOINT_WS_RATE_LIMITS
+
+
+def limit_key(action):
+    """Bucket name for an action; unknown actions share the "default" bucket."""
+    return action if action in rate_limits() else "default"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token. Returns 0.0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class LocalBucketStore:
+    """Per-process buckets, least recently used evicted first."""
+
+    def __init__(self, limit=LOCAL_BUCKETS_LIMIT):
+        self.limit = limit
+        self.buckets = OrderedDict()
+
+    async def take(self, key, rate, burst):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+            if len(self.buckets) > self.limit:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.take()
+
+
+# KEYS[1] = bucket key; ARGV = rate, burst. Uses the server clock so workers
+# with skewed clocks agree. Returns {allowed, retry_after_ms}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_ms = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  retry_ms = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, retry_ms}
+"""
+
+
+class RedisBucketStore:
+    """
+    Buckets shared by all workers, one Redis hash per key updated atomically
+    by a Lua script. Falls back to the local store if Redis is unreachable,
+    so a Redis hiccup degrades to per-worker limits instead of dropping play.
+    """
+
+    def __init__(self, url, prefix="classpoint:rl:"):
+        import redis.asyncio as redis  # optional; installed with channels_redis
+
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TOKEN_BUCKET_LUA)
+        self.prefix = prefix
+        self.fallback = LocalBucketStore()
+
+    async def take(self, key, rate, burst):
+        try:
+            allowed, retry_ms = await self.script(keys=[self.prefix + key], args=[rate, burst])
+        except Exception:
+            logger.warning("Rate limit store unavailable; using per-worker buckets", exc_info=True)
+            return await self.fallback.take(key, rate, burst)
+        return 0.0 if allowed else retry_ms / 1000
+
+
+_shared_store = None
+
+
+def shared_store():
+    """The per-participant bucket store for this process."""
+    global _shared_store
+    if _shared_store is None:
+        url = getattr(settings, "CLASSPOINT_WS_RATE_LIMIT_REDIS", None)
+        _shared_store = RedisBucketStore(url) if url else LocalBucketStore()
+    return _shared_store
+
+
+class SocketThrottle:
+    """
+    Rate limiter owned by one consumer. `check()` returns None when the
+    action may proceed, otherwise the seconds the client should wait.
+    """
+
+    def __init__(self, max_strikes=None):
+        self.buckets = {}
+        self.strikes = 0
+        self.max_strikes = max_strikes or getattr(settings, "CLASSPOINT_WS_ABUSE_STRIKES", 50)
+
+    async def check(self, action, participant_id=None):
+        """`participant_id`: the participant the socket is bound to, if any."""
+        action = limit_key(action)
+        rate, burst = rate_limits()[action]
+        bucket = self.buckets.get(action)
+        if bucket is None:
+            bucket = self.buckets[action] = TokenBucket(rate, burst)
+        retry_after = bucket.take()
+        if not retry_after and participant_id is not None:
+            retry_after = await shared_store().take(f"p:{participant_id}:{action}", rate, burst)
+        if retry_after:
+            self.strikes += 1
+            metrics.incr("ws.rate_limited")
+            metrics.incr(f"ws.rate_limited.{action}")
+            return retry_after
+        self.strikes = 0
+        return None
+
+    @property
+    def abusive(self):
+        """True once the socket has been rejected `max_strikes` times in a row."""
+        return self.strikes >= self.max_strikes
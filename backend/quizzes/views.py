@@ -1,14 +1,21 @@
+import hashlib
+import json
+
+from asgiref.sync import async_to_sync
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.decorators import action, api_view, permission_classes
 from django.utils.crypto import get_random_string
 from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from django.db import IntegrityError
+from django.db.models import Count, Max
+from django.core.handlers.asgi import ASGIRequest
 
-from .models import Quiz, Question, Choice, Session, Participant, Answer
+from .models import Quiz, Question, Choice, Session, Participant, Answer, SessionResult
 from .serializers import (
     RegisterSerializer, UserSerializer,
     QuizSerializer, QuizCreateUpdateSerializer,
@@ -16,6 +23,20 @@ from .serializers import (
     ParticipantJoinSerializer, ParticipantSerializer, AnswerSerializer
 )
 from .permissions import IsTeacher
+from .aggregates import quiz_analytics
+from .analytics import cached_session_analytics
+from .archive import finalize_session
+from .caching import ConditionalContentMixin, bump_content_version, session_content_key
+from .eventlog import log_answers, log_event
+from .grading import grade_answers, load_participant_context
+from .scoreboard import broadcast_scoreboard, broadcast_session_end
+from .actors import actors_enabled, live_actor
+from . import latency, metrics
+from .export import EXPORT_FORMATS, aiter_chunks, available_formats, stream_export
+from .bulk import (
+    QuizDocumentSerializer, parse_quiz_csv, import_quiz_document,
+    export_quiz_document, export_quiz_csv,
+)
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -32,12 +53,17 @@ class RegisterView(generics.CreateAPIView):
 # -------------------------
 # Quiz ViewSet
 # -------------------------
-class QuizViewSet(viewsets.ModelViewSet):
+class QuizViewSet(ConditionalContentMixin, viewsets.ModelViewSet):
     """
     /api/quizzes/  (GET list, POST create)
     /api/quizzes/{id}/
+    GETs support ETag / If-None-Match and If-Modified-Since.
     """
-    queryset = Quiz.objects.all().order_by("-created_at")
+    queryset = (
+        Quiz.objects.select_related("created_by")
+        .prefetch_related("questions__choices")
+        .order_by("-created_at")
+    )
     serializer_class = QuizSerializer
     permission_classes = (IsAuthenticated,)
 
@@ -46,17 +72,90 @@ class QuizViewSet(viewsets.ModelViewSet):
             return QuizCreateUpdateSerializer
         return QuizSerializer
 
+    def get_content_validators(self):
+        if self.action != "list":
+            return super().get_content_validators()
+        # Over exactly the quizzes the list shows; the scope (its SQL) is part
+        # of the key so differently filtered lists never share an entry.
+        # No Last-Modified: deleting a quiz does not move Max(updated_at)
+        queryset = self.filter_queryset(self.get_queryset())
+        agg = queryset.aggregate(count=Count("id"), last=Max("updated_at"))
+        stamp = agg["last"].timestamp() if agg["last"] else 0
+        scope = hashlib.sha1(str(queryset.query).encode()).hexdigest()[:12]
+        key = f"{scope}-{agg['count']}-{stamp}"
+        return f"quizzes-{key}", None, f"content:quizzes:{key}"
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_content_response(
+            lambda: super(QuizViewSet, self).list(request, *args, **kwargs).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.cached_content_response(
+            lambda: super(QuizViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+        return response or super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def perform_update(self, serializer):
+        quiz = serializer.save()
+        bump_content_version(quiz.pk)
+
     def get_permissions(self):
         # Only teachers can create/update/delete
-        if self.action in ("create", "update", "partial_update", "destroy"):
+        if self.action in ("create", "update", "partial_update", "destroy", "import_document"):
             permission_classes = (IsAuthenticated, IsTeacher)
         else:
             permission_classes = (IsAuthenticated,)
         return [p() for p in permission_classes]
 
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_document(self, request):
+        """
+        POST /api/quizzes/import/
+        Body is a quiz document (JSON), or a multipart upload in `file`
+        (JSON, or CSV when the file name ends in .csv or ?fmt=csv).
+        """
+        upload = request.FILES.get("file")
+        if upload is not None:
+            try:
+                text = upload.read().decode("utf-8-sig")
+            except UnicodeDecodeError:
+                return Response({"file": "File must be UTF-8 encoded"}, status=status.HTTP_400_BAD_REQUEST)
+            if upload.name.lower().endswith(".csv") or request.query_params.get("fmt") == "csv":
+                title = request.data.get("title") or upload.name.rsplit(".", 1)[0]
+                data = parse_quiz_csv(text, title)
+            else:
+                try:
+                    data = json.loads(text)
+                except ValueError:
+                    return Response({"file": "Invalid JSON document"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            data = request.data
+
+        serializer = QuizDocumentSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        quiz = import_quiz_document(serializer.validated_data, request.user)
+        return Response(
+            {"id": quiz.id, "title": quiz.title, "questions": len(serializer.validated_data["questions"])},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["get"], url_path="document")
+    def export_document(self, request, pk=None):
+        """
+        GET /api/quizzes/{id}/document/?fmt=json|csv
+        Whole quiz in the import format.
+        """
+        quiz = self.get_object()
+        if request.query_params.get("fmt") == "csv":
+            response = HttpResponse(export_quiz_csv(quiz), content_type="text/csv")
+            response["Content-Disposition"] = f'attachment; filename="quiz_{quiz.id}.csv"'
+            return response
+        return Response(export_quiz_document(quiz))
+
 
 # -------------------------
 # Question creation
@@ -100,12 +199,31 @@ class SessionCreateView(generics.CreateAPIView):
         serializer.save(pin=pin)
 
 
-class SessionDetailView(generics.RetrieveAPIView):
+class SessionDetailView(ConditionalContentMixin, generics.RetrieveAPIView):
     permission_classes = (IsAuthenticated,)
     serializer_class = SessionSerializer
-    queryset = Session.objects.all()
+    queryset = Session.objects.select_related("quiz__created_by").prefetch_related(
+        "quiz__questions__choices"
+    )
     lookup_field = "id"
 
+    def get_content_validators(self):
+        row = Session.objects.filter(id=self.kwargs["id"]).values_list(
+            "quiz__content_version", "quiz__updated_at", "ended_at"
+        ).first()
+        if row is None:
+            return None
+        version, updated_at, ended_at = row
+        last_modified = max(updated_at, ended_at) if ended_at else updated_at
+        key = session_content_key(self.kwargs["id"], version, ended_at)
+        return f"session-{key}", last_modified, f"content:session:{key}"
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.cached_content_response(
+            lambda: super(SessionDetailView, self).retrieve(request, *args, **kwargs).data
+        )
+        return response or super().retrieve(request, *args, **kwargs)
+
 
 # -------------------------
 # Participant join
@@ -179,39 +297,121 @@ class ParticipantJoinView(generics.CreateAPIView):
 # Answer submission (non-socket fallback)
 # -------------------------
 class AnswerCreateView(generics.CreateAPIView):
+    """
+    POST {participant, choice[, question]}, or {participant, question,
+    choice_ids | value} for multi-select, numeric and text questions.
+    Same grading core as the WebSocket path; broadcasts the new scoreboard.
+    """
     permission_classes = (AllowAny,)
     serializer_class = AnswerSerializer
 
     def create(self, request, *args, **kwargs):
         data = request.data
         participant_id = data.get("participant")
-        question_id = data.get("question")
-        choice_id = data.get("choice")
-
-        participant = get_object_or_404(Participant, pk=participant_id)
-        question = get_object_or_404(Question, pk=question_id)
-        choice = get_object_or_404(Choice, pk=choice_id) if choice_id else None
-
-        # Create answer
-        answer = Answer.objects.create(
-            participant=participant,
-            question=question,
-            choice=choice
+        if participant_id is None or (data.get("choice") is None and data.get("question") is None):
+            return Response(
+                {"detail": "participant and choice (or question) are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        [result], actor_id = _grade(request, participant_id, [_submission(data)])
+        if not result.ok:
+            return _grade_error_response(result)
+
+        if result.score_delta or result.created:
+            if actor_id is None:
+                log_answers([result])
+            broadcast_scoreboard(result.pin, result.session_id, answers=[result], origin=actor_id)
+        return Response(
+            {"answer_id": result.answer_id, "correct": result.is_correct},
+            status=status.HTTP_201_CREATED
         )
 
-        correct = bool(choice and choice.is_correct)
-        answer.correct = correct
-        answer.save()
-
-        # Update participant score
-        if correct:
-            participant.score += int(question.marks or 1)
-            participant.save()
 
-        return Response(
-            {"answer_id": answer.id, "correct": correct},
-            status=status.HTTP_201_CREATED
+class AnswerBatchView(APIView):
+    """
+    POST {participant, answers: [{choice} or {question, choice_ids | value}, ...]}
+    Flush answers a student client queued while offline. Each answer is graded
+    on its own; the scoreboard is broadcast once at the end.
+    """
+    permission_classes = (AllowAny,)
+    max_batch_size = 100
+
+    def post(self, request):
+        participant_id = request.data.get("participant")
+        answers = request.data.get("answers")
+        if participant_id is None or not isinstance(answers, list):
+            return Response({"detail": "participant and answers[] are required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(answers) > self.max_batch_size:
+            return Response(
+                {"detail": f"At most {self.max_batch_size} answers per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results, actor_id = _grade(
+            request, participant_id, [_submission(a) if isinstance(a, dict) else {} for a in answers]
         )
+        if results and results[0].error == "participant_not_found":
+            return Response({"detail": "Participant not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        changed = [r for r in results if r.ok and (r.score_delta or r.created)]
+        if changed:
+            if actor_id is None:
+                log_answers(changed)
+            broadcast_scoreboard(changed[0].pin, changed[0].session_id, answers=changed, origin=actor_id)
+        return Response({
+            "results": [
+                {"choice": r.choice_id, "answer_id": r.answer_id, "correct": r.is_correct}
+                if r.ok else {"choice": r.choice_id, "error": r.error}
+                for r in results
+            ]
+        })
+
+
+def _grade(request, participant_id, submissions):
+    """
+    Grade a participant's submissions; returns (results, actor id or None).
+    While this worker has a live actor for the session (ASGI only: it runs on
+    the server's event loop), answers go through it like socket answers, so
+    its pending checkpoint and a direct write can't both move the score.
+    """
+    context = None
+    if actors_enabled() and isinstance(request._request, ASGIRequest):
+        try:
+            context = load_participant_context(int(participant_id))
+        except (TypeError, ValueError):
+            pass
+        actor = live_actor(context.pin) if context is not None and context.is_active else None
+        if actor is not None:
+            async def submit_all():
+                return [await actor.submit_answer(participant_id, **submission) for submission in submissions]
+
+            return async_to_sync(submit_all)(), actor.actor_id
+    return grade_answers(participant_id, submissions, context=context), None
+
+
+def _submission(data):
+    """grade_answer keyword arguments from an answer's request fields."""
+    return {
+        "choice_id": data.get("choice"),
+        "question_id": data.get("question"),
+        "choice_ids": data.get("choice_ids"),
+        "value": data.get("value"),
+    }
+
+
+def _grade_error_response(result):
+    if result.error == "participant_not_found":
+        return Response({"detail": "Participant not found"}, status=status.HTTP_404_NOT_FOUND)
+    if result.error == "choice_not_found":
+        return Response({"detail": "Choice not found"}, status=status.HTTP_404_NOT_FOUND)
+    if result.error == "question_not_found":
+        return Response({"detail": "Question not found"}, status=status.HTTP_404_NOT_FOUND)
+    if result.error == "session_ended":
+        return Response({"detail": "Session has ended"}, status=status.HTTP_409_CONFLICT)
+    if result.error == "question_mismatch":
+        return Response({"detail": "Choice does not belong to this question"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"detail": result.error}, status=status.HTTP_400_BAD_REQUEST)
 
 
 # -------------------------
@@ -223,7 +423,7 @@ class SessionActionView(APIView):
     def post(self, request, session_id, action):
         session = get_object_or_404(Session, pk=session_id)
 
-        if session.host != request.user and not request.user.is_staff:
+        if session.quiz.created_by_id != request.user.id and not request.user.is_staff:
             return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
 
         if action == "start":
@@ -232,9 +432,17 @@ class SessionActionView(APIView):
             return Response({"status": "started", "started_at": session.started_at})
 
         elif action == "end":
-            session.finished_at = timezone.now()
-            session.save()
-            return Response({"status": "ended", "finished_at": session.finished_at})
+            if session.is_active:
+                session.ended_at = timezone.now()
+                session.is_active = False
+                session.save(update_fields=["ended_at", "is_active"])
+                # Logged here too for sessions that end with no live actor to log it
+                log_event(session.id, "end")
+            # Live actors checkpoint, then refresh the snapshot
+            broadcast_session_end(session.pin)
+            # Snapshot results now (archiving waits for the actors when they are on)
+            finalize_session(session, archive="" if actors_enabled() else None)
+            return Response({"status": "ended", "finished_at": session.ended_at})
 
         elif action == "next":
             from .serializers import QuestionSerializer
@@ -251,6 +459,39 @@ class SessionActionView(APIView):
         return Response({"detail": "unknown action"}, status=status.HTTP_400_BAD_REQUEST)
 
 
+# -------------------------
+# Session & quiz analytics
+# -------------------------
+class SessionAnalyticsView(APIView):
+    """
+    GET /api/sessions/{id}/analytics/
+    Percent correct, time-to-answer distribution and discrimination index per
+    question. Cached until the session's next answer is saved.
+    """
+    permission_classes = (IsAuthenticated, IsTeacher)
+
+    def get(self, request, session_id):
+        session = get_object_or_404(Session.objects.select_related("quiz"), pk=session_id)
+        if session.quiz.created_by_id != request.user.id and not request.user.is_staff:
+            return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(cached_session_analytics(session))
+
+
+class QuizAnalyticsView(APIView):
+    """
+    GET /api/quizzes/{id}/analytics/
+    Per-question totals across every finalized session of the quiz, read from
+    the QuestionAggregate summary rows.
+    """
+    permission_classes = (IsAuthenticated, IsTeacher)
+
+    def get(self, request, quiz_id):
+        quiz = get_object_or_404(Quiz, pk=quiz_id)
+        if quiz.created_by_id != request.user.id and not request.user.is_staff:
+            return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(quiz_analytics(quiz))
+
+
 # -------------------------
 # Session leaderboard / scores
 # -------------------------
@@ -262,16 +503,105 @@ class SessionScoresView(generics.ListAPIView):
         session_id = self.kwargs.get("session_id")
         return Participant.objects.filter(session__id=session_id).order_by("-score")
 
+    def list(self, request, *args, **kwargs):
+        # Ended sessions are served from their results snapshot
+        result = SessionResult.objects.filter(
+            session_id=self.kwargs.get("session_id"), session__is_active=False
+        ).only("leaderboard").first()
+        if result is not None:
+            return Response(result.leaderboard)
+        return super().list(request, *args, **kwargs)
+
+
+
+# -------------------------
+# Results export (streaming)
+# -------------------------
+class ExportMixin:
+    """
+    Shared helpers for the streaming export endpoints.
+    Format is picked with ?fmt=csv|parquet (not ?format=, which DRF reserves).
+    """
+
+    def get_export_format(self, request):
+        fmt = request.query_params.get("fmt", "csv")
+        if fmt not in available_formats():
+            return None
+        return fmt
+
+    def export_response(self, request, sessions, fmt, basename):
+        content_type, extension = EXPORT_FORMATS[fmt]
+        chunks = stream_export(sessions, fmt)
+        if isinstance(request._request, ASGIRequest):
+            # A sync iterator would be read into memory whole before sending
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{basename}.{extension}"'
+        return response
+
+    def format_error(self):
+        return Response(
+            {"detail": "Unsupported export format", "available": available_formats()},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class SessionExportView(ExportMixin, APIView):
+    """
+    GET /api/sessions/{id}/export/?fmt=csv
+    Stream every answer of one session.
+    """
+    permission_classes = (IsAuthenticated, IsTeacher)
+
+    def get(self, request, session_id):
+        session = get_object_or_404(Session.objects.select_related("quiz"), pk=session_id)
+        if session.quiz.created_by_id != request.user.id and not request.user.is_staff:
+            return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        fmt = self.get_export_format(request)
+        if fmt is None:
+            return self.format_error()
+        return self.export_response(request, [session], fmt, f"session_{session.pin}_results")
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuizExportView(ExportMixin, APIView):
+    """
+    GET /api/quizzes/{id}/export/?fmt=csv
+    Stream every answer of every session of a quiz.
+    """
+    permission_classes = (IsAuthenticated, IsTeacher)
+
+    def get(self, request, quiz_id):
+        quiz = get_object_or_404(Quiz, pk=quiz_id)
+        if quiz.created_by_id != request.user.id and not request.user.is_staff:
+            return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        fmt = self.get_export_format(request)
+        if fmt is None:
+            return self.format_error()
+        sessions = Session.objects.filter(quiz=quiz).order_by("started_at").iterator()
+        return self.export_response(request, sessions, fmt, f"quiz_{quiz.id}_results")
+
+
+class QuestionViewSet(ConditionalContentMixin, viewsets.ModelViewSet):
     """
     API for managing questions
     """
-    queryset = Question.objects.all().order_by("order")
+    queryset = Question.objects.select_related("quiz").prefetch_related("choices").order_by("order")
     serializer_class = QuestionSerializer
     permission_classes = (IsAuthenticated, IsTeacher)
 
+    content_fields = ("quiz__content_version", "quiz__updated_at")
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.cached_content_response(
+            lambda: super(QuestionViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+        return response or super().retrieve(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        quiz_id = instance.quiz_id
+        instance.delete()
+        bump_content_version(quiz_id)
+
     def perform_create(self, serializer):
         # Automatically set the quiz if not provided
         quiz_id = self.request.data.get("quiz")
@@ -288,4 +618,20 @@ class QuestionViewSet(viewsets.ModelViewSet):
                     title=f"{self.request.user.username}'s Quiz",
                     created_by=self.request.user
                 )
-            serializer.save(quiz=quiz)
\ No newline at end of file
+            serializer.save(quiz=quiz)
+
+
+# -------------------------
+# Live-path metrics (per worker)
+# -------------------------
+class MetricsView(APIView):
+    """
+    GET /api/metrics/
+    Counters of this worker process: frames sent / merged / dropped,
+    slow-client disconnects, queue high-water marks, and the answer latency
+    breakdown per stage, overall and per session.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({**metrics.snapshot(), "latency": latency.snapshot()})
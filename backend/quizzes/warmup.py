@@ -0,0 +1,76 @@
+# backend/quizzes/warmup.py
+"""
+Worker warm-up (CLASSPOINT_WARMUP).
+
+Workers are scaled up right as classes start, so the first students on a
+fresh worker would otherwise pay for cold per-process caches: the answer key
+of their quiz (`grading.get_answer_key` / `get_question_keys`) and the rendered session payload
+they fetch on join. `warm_up()` is called by `manage.py serve` before daphne
+binds its socket (not when classpoint.asgi is imported, so tests, scripts and
+other servers importing the application never hit the database), and fills
+both for every running session. Optionally (CLASSPOINT_WARMUP_URLCONF) it also imports
+the URLconf, so the first HTTP request does not load DRF, SimpleJWT and the
+admin.
+
+Warm-up never stops a worker from starting: failures (e.g. the database
+being unreachable) are logged and the caches fill on demand as before.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .grading import get_answer_key, get_question_keys
+from .models import Session
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    if not getattr(settings, "CLASSPOINT_WARMUP", True):
+        return
+    start = time.perf_counter()
+    try:
+        sessions = warm_sessions(getattr(settings, "CLASSPOINT_WARMUP_SESSIONS", 500))
+        if getattr(settings, "CLASSPOINT_WARMUP_URLCONF", False):
+            load_urlconf()
+    except Exception:
+        logger.warning("Warm-up failed; caches will fill on demand", exc_info=True)
+        return
+    finally:
+        # The server handles requests on other threads; don't keep this one's connection
+        connections.close_all()
+    logger.info("Warmed %d active session(s) in %.0f ms", sessions, (time.perf_counter() - start) * 1000)
+
+
+def warm_sessions(limit):
+    """Preload answer keys and session payloads of up to `limit` running sessions."""
+    from .caching import content_cache_timeout, session_content_key
+    from .serializers import SessionSerializer
+
+    sessions = list(
+        Session.objects.filter(is_active=True)
+        .select_related("quiz__created_by")
+        .prefetch_related("quiz__questions__choices")
+        .order_by("-started_at")[:limit]
+    )
+    for quiz_id, version in {(s.quiz_id, s.quiz.content_version) for s in sessions}:
+        get_answer_key(quiz_id, version)
+        get_question_keys(quiz_id, version)
+    cache.set_many(
+        {
+            f"content:session:{session_content_key(s.id, s.quiz.content_version, s.ended_at)}":
+                SessionSerializer(s).data
+            for s in sessions
+        },
+        content_cache_timeout(),
+    )
+    return len(sessions)
+
+
+def load_urlconf():
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
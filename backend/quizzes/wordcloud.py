@@ -0,0 +1,214 @@
+# backend/quizzes/wordcloud.py
+"""
+Live word clouds for free-text questions (Question.WORDCLOUD).
+
+Students submit short free text; the host sees the most frequent terms
+while answers stream in. Each submission counts as one term: the answer
+normalized like a text answer (grading.normalize_text), cut to
+MAX_TERM_LENGTH characters.
+
+Counting is incremental and bounded: each worker keeps a `SessionWordCloud`
+per PIN whose `SpaceSaving` sketch tracks at most
+CLASSPOINT_WORDCLOUD_CAPACITY distinct terms however many are submitted.
+Frequent terms are counted exactly; a term that pushes out the least frequent
+one inherits its count, so a count is over by at most its `error` (reported
+to the host as "approximate"). It is fed from the `answers` events every
+worker already receives on `score.update`, the same way as presence, so no
+answer text is read back from the database to refresh a cloud. A student
+who changes their answer moves their vote to the new term.
+
+The top CLASSPOINT_WORDCLOUD_TOP terms go straight to the host sockets on
+this worker as "wordcloud" frames, at most once per
+CLASSPOINT_WORDCLOUD_INTERVAL_SECONDS.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .grading import normalize_text
+from .models import Question
+
+logger = logging.getLogger(__name__)
+
+# How many answer event ids each session remembers for de-duplication
+SEEN_EVENTS_LIMIT = 4096
+# Longest term kept (longer answers are cut)
+MAX_TERM_LENGTH = 40
+
+
+def cloud_term(text):
+    """The term a submission counts as, or "" for nothing countable."""
+    return normalize_text(text)[:MAX_TERM_LENGTH].rstrip()
+
+
+class SpaceSaving:
+    """
+    Approximate top-k counter in bounded memory (Metwally et al., "Efficient
+    computation of frequent and top-k elements in data streams").
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "total")
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.counts = {}  # term -> count (over by at most errors[term])
+        self.errors = {}
+        self.total = 0
+
+    def add(self, term):
+        self.total += 1
+        count = self.counts.get(term)
+        if count is not None:
+            self.counts[term] = count + 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[term] = 1
+            self.errors[term] = 0
+            return
+        # Take over the least frequent term's counter
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[term] = floor + 1
+        self.errors[term] = floor
+
+    def discard(self, term):
+        """Take back one occurrence of `term` (a changed answer)."""
+        self.total = max(0, self.total - 1)
+        count = self.counts.get(term)
+        if count is None:
+            return
+        if count <= 1:
+            del self.counts[term]
+            del self.errors[term]
+        else:
+            self.counts[term] = count - 1
+            self.errors[term] = min(self.errors[term], count - 1)
+
+    def top(self, k):
+        """[(term, count, error)] most frequent first."""
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(term, count, self.errors[term]) for term, count in ranked]
+
+
+class SessionWordCloud:
+    def __init__(self, pin):
+        self.pin = pin
+        self.refcount = 0          # consumers of this session on this worker
+        self.hosts = {}            # channel_name -> async send(frame)
+        self.question_id = None
+        self.sketch = None         # SpaceSaving while a word cloud question is open
+        self.terms = {}            # participant id -> their current term
+        self.seen_events = OrderedDict()
+        self.last_sent = 0.0
+        self.flush_handle = None
+
+    # ------- Updates (called by consumers) -------
+
+    def subscribe(self, channel_name, send):
+        """Send this worker's frames for the session to a host socket."""
+        self.hosts[channel_name] = send
+        if self.sketch is not None:
+            self.changed()
+
+    def unsubscribe(self, channel_name):
+        self.hosts.pop(channel_name, None)
+
+    def question_opened(self, question_id, question_type):
+        if question_id == self.question_id:
+            return
+        self.question_id = question_id
+        self.terms = {}
+        if question_type == Question.WORDCLOUD:
+            self.sketch = SpaceSaving(getattr(settings, "CLASSPOINT_WORDCLOUD_CAPACITY", 500))
+            self.changed()
+        else:
+            self.sketch = None
+
+    def answer_seen(self, event):
+        """Count an `answers` event from score.update (each event once)."""
+        if self.sketch is None or event.get("question_id") != self.question_id:
+            return
+        event_id = event.get("id")
+        if event_id in self.seen_events:
+            return
+        self.seen_events[event_id] = True
+        if len(self.seen_events) > SEEN_EVENTS_LIMIT:
+            self.seen_events.popitem(last=False)
+
+        term = cloud_term(event.get("value") or "")
+        participant_id = event.get("participant_id")
+        previous = self.terms.get(participant_id)
+        if not term or term == previous:
+            return
+        if previous is not None:
+            self.sketch.discard(previous)
+        self.sketch.add(term)
+        self.terms[participant_id] = term
+        self.changed()
+
+    # ------- Host frames -------
+
+    def frame(self):
+        top = self.sketch.top(getattr(settings, "CLASSPOINT_WORDCLOUD_TOP", 50))
+        return {
+            "type": "wordcloud",
+            "question_id": self.question_id,
+            "responses": self.sketch.total,
+            "terms": [{"term": term, "count": count} for term, count, _ in top],
+            "approximate": any(error for _, _, error in top),
+        }
+
+    def changed(self):
+        """Schedule a host frame, at most one per interval (trailing edge)."""
+        if self.flush_handle is not None or not self.hosts:
+            return
+        interval = getattr(settings, "CLASSPOINT_WORDCLOUD_INTERVAL_SECONDS", 1.0)
+        delay = max(0.0, self.last_sent + interval - time.monotonic())
+        loop = asyncio.get_running_loop()
+        self.flush_handle = loop.call_later(delay, lambda: self._background(self.flush()))
+
+    async def flush(self):
+        self.flush_handle = None
+        self.last_sent = time.monotonic()
+        if self.sketch is None:
+            return
+        frame = self.frame()
+        for send in list(self.hosts.values()):
+            await send(frame)
+
+    def close(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+    def _background(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        task.add_done_callback(_log_failure)
+
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Word cloud update failed", exc_info=task.exception())
+
+
+_sessions = {}
+
+
+def acquire_wordcloud(pin):
+    """Get (or create) this worker's word cloud for a PIN; pair with release_wordcloud."""
+    cloud = _sessions.get(pin)
+    if cloud is None:
+        cloud = _sessions[pin] = SessionWordCloud(pin)
+    cloud.refcount += 1
+    return cloud
+
+
+def release_wordcloud(cloud):
+    cloud.refcount -= 1
+    if cloud.refcount <= 0 and _sessions.get(cloud.pin) is cloud:
+        del _sessions[cloud.pin]
+        cloud.close()
@@ -10,6 +10,7 @@ interface Choice {
 interface Question {
   id: number;
   text: string;
+  question_type?: "single" | "multi" | "numeric" | "text" | "wordcloud";
   choices: Choice[];
   time_limit: number;
 }
@@ -22,8 +23,15 @@ const QuizPage: React.FC = () => {
   const [hasAnswered, setHasAnswered] = useState<boolean>(false);
   const [timeLeft, setTimeLeft] = useState<number>(0);
   const [leaderboard, setLeaderboard] = useState<LeaderboardEntry[]>([]); // ADD THIS LINE
+  const [selected, setSelected] = useState<number[]>([]); // multi-select
+  const [typedAnswer, setTypedAnswer] = useState<string>(""); // numeric / text / word cloud
   const socketRef = useRef<QuizSocket | null>(null);
   const timerRef = useRef<NodeJS.Timeout | null>(null);
+  const prefetchedRef = useRef<Record<number, Question>>({});
+  // Answers sent but not acknowledged yet, by msg_id (resent after a rejoin)
+  const pendingAnswersRef = useRef<Map<string, Record<string, unknown>>>(new Map());
+  // When each pending answer was first sent (Date.now()), for round-trip times
+  const sentAtRef = useRef<Map<string, number>>(new Map());
 
   // Timer effect
   useEffect(() => {
@@ -65,6 +73,8 @@ const QuizPage: React.FC = () => {
   useEffect(() => {
     if (currentQuestion) {
       setHasAnswered(false);
+      setSelected([]);
+      setTypedAnswer("");
       setStatus("Question received! Choose your answer.");
       setTimeLeft(currentQuestion.time_limit || 30);
       setLeaderboard([]); // Reset leaderboard for new question
@@ -114,6 +124,18 @@ const QuizPage: React.FC = () => {
               setStatus("Question received! Choose your answer.");
               break;
 
+            case "question_prefetch":
+              // Next question sent ahead; shown when the host activates it
+              prefetchedRef.current[msg.question.id] = msg.question;
+              break;
+
+            case "question_activate":
+              if (prefetchedRef.current[msg.question_id]) {
+                setCurrentQuestion(prefetchedRef.current[msg.question_id]);
+                setStatus("Question received! Choose your answer.");
+              }
+              break;
+
             case "score_update":
               console.log("📊 Score update:", msg.scoreboard);
               const participantId = localStorage.getItem("participant_id");
@@ -144,6 +166,31 @@ const QuizPage: React.FC = () => {
             case "join_success":
               console.log("✅ Join successful");
               setStatus("Connected. Waiting for question...");
+              // The server replies to answers it already graded without grading them again
+              pendingAnswersRef.current.forEach((message) => quizSocket.send(message));
+              break;
+
+            case "answer_ack": {
+              pendingAnswersRef.current.delete(msg.msg_id);
+              const sentAt = sentAtRef.current.get(msg.msg_id);
+              sentAtRef.current.delete(msg.msg_id);
+              if (sentAt !== undefined && !msg.duplicate) {
+                // Server time vs the rest of the round trip (network, queues)
+                const serverMs = msg.graded_at - msg.received_at;
+                console.log("⏱️ Answer ack:", { roundTripMs: Date.now() - sentAt, serverMs });
+              }
+              setStatus("Answer received! Waiting for results...");
+              break;
+            }
+
+            case "answer_persisted":
+              // Session actors save answers in batches, after the ack
+              console.log("💾 Answer saved:", msg.msg_id, msg.persisted_at);
+              break;
+
+            case "probe":
+              // The server disconnects clients that stop acking these
+              quizSocket.send({ action: "probe_ack", seq: msg.seq });
               break;
 
             case "error":
@@ -154,6 +201,9 @@ const QuizPage: React.FC = () => {
             default:
               console.warn("Unknown message type:", msg.type, "Full message:", msg);
           }
+        } else if (msg && msg.error && msg.msg_id) {
+          pendingAnswersRef.current.delete(msg.msg_id);
+          setStatus(`Error: ${msg.detail || msg.error}`);
         } else {
           console.warn("Received message without type:", msg);
         }
@@ -185,13 +235,14 @@ const QuizPage: React.FC = () => {
     };
   }, []);
 
-  const submitAnswer = (choiceId: number) => {
+  // response: { choice_id } for single choice, { question_id, choice_ids | value } otherwise
+  const sendAnswer = (response: Record<string, unknown>) => {
     const participantId = localStorage.getItem("participant_id");
     if (!socket || !participantId || hasAnswered || timeLeft <= 0) {
       return;
     }
 
-    console.log("📤 Submitting answer:", { participant_id: participantId, choice_id: choiceId });
+    console.log("📤 Submitting answer:", { participant_id: participantId, ...response });
     
     if (timerRef.current) {
       clearInterval(timerRef.current);
@@ -200,11 +251,34 @@ const QuizPage: React.FC = () => {
     setHasAnswered(true);
     setStatus("Answer submitted! Waiting for results...");
     
-    socket.send({
+    const message = {
       action: "answer",
+      // Lets the server recognize a resend of this answer
+      msg_id: `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`,
       participant_id: participantId,
-      choice_id: choiceId,
-    });
+      ...response,
+    };
+    pendingAnswersRef.current.set(message.msg_id, message);
+    sentAtRef.current.set(message.msg_id, Date.now());
+    socket.send(message);
+  };
+
+  const submitAnswer = (choiceId: number) => sendAnswer({ choice_id: choiceId });
+
+  const toggleChoice = (choiceId: number) => {
+    setSelected(prev => prev.includes(choiceId) ? prev.filter(id => id !== choiceId) : [...prev, choiceId]);
+  };
+
+  const submitSelection = () => {
+    if (currentQuestion && selected.length > 0) {
+      sendAnswer({ question_id: currentQuestion.id, choice_ids: selected });
+    }
+  };
+
+  const submitTyped = () => {
+    if (currentQuestion && typedAnswer.trim()) {
+      sendAnswer({ question_id: currentQuestion.id, value: typedAnswer.trim() });
+    }
   };
 
   if (!currentQuestion)
@@ -225,6 +299,11 @@ const QuizPage: React.FC = () => {
       </div>
     );
 
+  const questionType = currentQuestion.question_type || "single";
+  const isMulti = questionType === "multi";
+  const isTyped = questionType === "numeric" || questionType === "text" || questionType === "wordcloud";
+  const answersClosed = hasAnswered || timeLeft <= 0;
+
   return (
     <div style={{ padding: "2rem", textAlign: "center" }}>
       {/* Timer Display */}
@@ -274,18 +353,49 @@ const QuizPage: React.FC = () => {
         }} />
       </div>
 
+      {isTyped && (
+        <form
+          onSubmit={(e) => {
+            e.preventDefault();
+            submitTyped();
+          }}
+          style={{ margin: "20px auto", maxWidth: "400px" }}
+        >
+          <input
+            type={questionType === "numeric" ? "number" : "text"}
+            step="any"
+            value={typedAnswer}
+            onChange={(e) => setTypedAnswer(e.target.value)}
+            disabled={answersClosed}
+            placeholder={questionType === "numeric" ? "Your number" : questionType === "wordcloud" ? "A word or short phrase" : "Your answer"}
+            maxLength={questionType === "wordcloud" ? 40 : 255}
+            style={{ padding: "12px", fontSize: "16px", width: "100%", borderRadius: "8px", border: "1px solid #ced4da" }}
+          />
+          <button
+            type="submit"
+            disabled={answersClosed || !typedAnswer.trim()}
+            style={{ marginTop: "10px", padding: "12px 25px", fontSize: "16px", borderRadius: "8px", border: "none", color: "white", backgroundColor: answersClosed ? "#6c757d" : "#28a745" }}
+          >
+            Submit
+          </button>
+        </form>
+      )}
+
+      {(questionType === "single" || isMulti) && (
       <ul style={{ listStyle: "none", padding: 0 }}>
+        {isMulti && <li style={{ color: "#6c757d" }}>Select all that apply</li>}
         {currentQuestion.choices.map((choice) => (
           <li key={choice.id} style={{ margin: "10px 0" }}>
             <button
-              onClick={() => submitAnswer(choice.id)}
+              onClick={() => (isMulti ? toggleChoice(choice.id) : submitAnswer(choice.id))}
               disabled={hasAnswered || timeLeft <= 0}
               style={{
                 padding: "15px 25px",
                 fontSize: "16px",
                 borderRadius: "8px",
                 cursor: (hasAnswered || timeLeft <= 0) ? "not-allowed" : "pointer",
-                backgroundColor: (hasAnswered || timeLeft <= 0) ? "#6c757d" : "#007bff",
+                backgroundColor: (hasAnswered || timeLeft <= 0) ? "#6c757d" : selected.includes(choice.id) ? "#0056b3" : "#007bff",
+                outline: selected.includes(choice.id) ? "3px solid #ffc107" : "none",
                 color: "white",
                 border: "none",
                 opacity: (hasAnswered || timeLeft <= 0) ? 0.6 : 1,
@@ -308,7 +418,19 @@ const QuizPage: React.FC = () => {
             </button>
           </li>
         ))}
+        {isMulti && (
+          <li style={{ margin: "10px 0" }}>
+            <button
+              onClick={submitSelection}
+              disabled={answersClosed || selected.length === 0}
+              style={{ padding: "12px 25px", fontSize: "16px", borderRadius: "8px", border: "none", color: "white", backgroundColor: answersClosed ? "#6c757d" : "#28a745" }}
+            >
+              Submit
+            </button>
+          </li>
+        )}
       </ul>
+      )}
       
       <p style={{ marginTop: "20px", fontSize: "1.2rem" }}>
         Score: <strong>{score}</strong>
@@ -1,9 +1,17 @@
 // Simple WS wrapper with auto-reconnect
+
+// Client-generated id the server uses to recognize a resent answer
+export function newMessageId() {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
 export class WSClient {
   constructor(url) {
     this.url = url;
-    this.connect();
     this.listeners = [];
+    // Answers sent but not acknowledged yet: msg_id -> message
+    this.pendingAnswers = new Map();
+    this.connect();
   }
 
   connect() {
@@ -15,6 +23,14 @@ export class WSClient {
 
     this.socket.onmessage = (event) => {
       const data = JSON.parse(event.data);
+      if (data.msg_id && (data.type === 'answer_ack' || data.error)) {
+        this.pendingAnswers.delete(data.msg_id);
+      }
+      if (data.type === 'join_success') {
+        // Answers lost with the previous connection; the server replies to
+        // ones it already graded without grading them again
+        this.pendingAnswers.forEach((message) => this.send(message));
+      }
       this.listeners.forEach((cb) => cb(data));
     };
 
@@ -32,7 +48,15 @@ export class WSClient {
     }
   }
 
+  // Send an answer with a msg_id; it is resent after a reconnect until acknowledged
+  sendAnswer(data) {
+    const message = { msg_id: newMessageId(), ...data, action: 'answer' };
+    this.pendingAnswers.set(message.msg_id, message);
+    this.send(message);
+    return message.msg_id;
+  }
+
   onMessage(callback) {
     this.listeners.push(callback);
   }
-}
\ No newline at end of file
+}